@@ -10,12 +10,12 @@ from qgis.core import QgsDataItem, QgsRasterLayer, QgsMapLayerStyle, \
     QgsMapBoxGlStyleConversionContext, QgsUnitTypes, QgsHillshadeRenderer, \
     Qgis, QgsRasterDataProvider, QgsLayerTreeGroup
 from qgis.PyQt.QtGui import QIcon
-from qgis.PyQt.QtWidgets import QMessageBox, QPushButton, QAction
+from qgis.PyQt.QtWidgets import QMessageBox, QPushButton, QAction, QMenu
 from qgis.gui import QgsMessageViewer
 from qgis.utils import iface
 from qgis.PyQt.QtCore import Qt
 
-from .gl2qgis import converter
+from .gl2qgis import converter, profiles, sprites
 
 from .configure_dialog import ConfigureDialog
 from .edit_connection_dialog import EditConnectionDialog
@@ -27,8 +27,6 @@ DATA_PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)), "data")
 BG_VECTOR_PATH = os.path.join(DATA_PATH, "background.geojson")
 TERRAIN_COLOR_RAMP_PATH = os.path.join(DATA_PATH, "terrain-color-ramp.txt")
 OCEAN_COLOR_RAMP_PATH = os.path.join(DATA_PATH, "ocean-color-ramp.txt")
-SPRITES_PATH = os.path.join(
-    os.path.dirname(os.path.realpath(__file__)), "gl2qgis", "sprites")
 
 
 class MapDataItem(QgsDataItem):
@@ -75,6 +73,9 @@ class MapDataItem(QgsDataItem):
                 lambda: self._add_custom_to_canvas())
             actions.append(add_custom_action)
 
+            if utils.is_qgs_vectortile_api_enable():
+                actions.append(self._profile_action(parent))
+
             edit_action = QAction(QIcon(), 'Edit', parent)
             edit_action.triggered.connect(self._edit)
             actions.append(edit_action)
@@ -107,6 +108,7 @@ class MapDataItem(QgsDataItem):
                 add_vector_action.triggered.connect(
                     lambda: self._add_vector_to_canvas())
                 actions.append(add_vector_action)
+                actions.append(self._profile_action(parent))
 
             remove_action = QAction(QIcon(), 'Remove', parent)
             remove_action.triggered.connect(self._remove)
@@ -125,6 +127,30 @@ class MapDataItem(QgsDataItem):
 
         return actions
 
+    def _profile_action(self, parent):
+        profile_action = QAction(QIcon(), 'Performance Profile', parent)
+        menu = QMenu(parent)
+        current_profile = self._get_profile()
+        for profile in (profiles.FULL, profiles.BALANCED, profiles.FAST):
+            action = QAction(QIcon(), profile.capitalize(), menu)
+            action.setCheckable(True)
+            action.setChecked(profile == current_profile)
+            action.triggered.connect(
+                lambda checked, p=profile: self._set_profile(p))
+            menu.addAction(action)
+        profile_action.setMenu(menu)
+        return profile_action
+
+    def _get_profile(self) -> str:
+        smanager = SettingsManager()
+        return smanager.get_setting('profiles').get(self._name, profiles.FULL)
+
+    def _set_profile(self, profile: str):
+        smanager = SettingsManager()
+        map_profiles = dict(smanager.get_setting('profiles'))
+        map_profiles[self._name] = profile
+        smanager.store_setting('profiles', map_profiles)
+
     def _are_credentials_valid(self):
         # credentials validation
         if not utils.validate_credentials():
@@ -390,9 +416,22 @@ class MapDataItem(QgsDataItem):
                                      attribution_text: str):
         proj = QgsProject().instance()
         smanager = SettingsManager()
-        os.makedirs(SPRITES_PATH, exist_ok=True)
-        converter.write_sprite_imgs_from_style_json(
-            style_json_data, SPRITES_PATH)
+        canvas = iface.mapCanvas()
+        sprite_scale = sprites.sprite_scale(
+            canvas.devicePixelRatioF(), canvas.mapSettings().outputDpi())
+        try:
+            converter.write_sprite_imgs_from_style_json(
+                style_json_data, scale=sprite_scale)
+        except ImportError:
+            import_error_message = (
+                "You do not have PIL/Pillow library installed on your system. "
+                "Sprites will not be supported.\n"
+                "MacOS users: To install Pillow library, run following code "
+                "in terminal:\n"
+                "/Applications/QGIS.app/Contents/MacOS/bin/pip3 install "
+                "pillow -U")
+            QMessageBox.warning(None, 'Missing PIL/Pillow library',
+                                import_error_message)
         auth_cfg_id = smanager.get_setting('auth_cfg_id')
 
         # Context
@@ -425,7 +464,11 @@ class MapDataItem(QgsDataItem):
             if source_data["type"] == "vector":
                 vector = QgsVectorTileLayer(uri, name)
                 renderer, labeling, candidate_warnings = converter.convert(
-                    source_id, style_json_data, context)
+                    source_id, style_json_data, context,
+                    options=converter.ConversionOptions(
+                        profile=self._get_profile(),
+                        sprite_scale=sprite_scale),
+                    vector_layers=source_data.get("vector_layers"))
                 vector.setLabeling(labeling)
                 vector.setRenderer(renderer)
                 vector.setAttribution(attribution_text)
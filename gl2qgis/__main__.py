@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ gl2qgis library
+
+ Converts a GL style from the command line, without the QGIS GUI.
+                              -------------------
+        begin                : 2026-10-19
+        copyright            : (C) 2026 by MapTiler AG.
+        author               : MapTiler Team
+ ***************************************************************************/
+
+ With PyQGIS importable and the directory holding the plugin on PYTHONPATH:
+
+     python -m MapTiler.gl2qgis style.json output_dir [--profile fast]
+
+ The style is a file path or a URL. Written to output_dir are a QML style
+ of every vector source, the sprite atlas (sprite.png, sprite.json), the
+ conversion warnings (warnings.txt) and the seconds taken by every stage
+ (timings.json). The exit status is 1 if the style can not be loaded or a
+ file can not be written, with --strict also if there are warnings.
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+from . import profiles
+
+
+def _timed(timings: dict, stage: str, function, *args, **kwargs):
+    """Calls function, adding the seconds it takes to timings[stage]"""
+    start = time.perf_counter()
+    try:
+        return function(*args, **kwargs)
+    finally:
+        timings[stage] = (timings.get(stage, 0)
+                          + time.perf_counter() - start)
+
+
+def _file_name(name: str) -> str:
+    return re.sub(r"[^\w.-]+", "_", name)
+
+
+class StyleError(Exception):
+    """The style can not be read or is no JSON"""
+
+
+def _load_style(style: str) -> dict:
+    from .. import net
+
+    try:
+        if style.startswith(("http://", "https://")):
+            return net.qgis_request_json(style)
+        with open(style, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError, net.MapTilerApiException) as e:
+        raise StyleError(f"Could not load {style}: {e}") from e
+
+
+def _write_sprites(style_json_data: dict, output_dir: str,
+                   scale: int) -> bool:
+    """Writes sprite.png and sprite.json, False if the image can not be
+    written"""
+    from .gl2qgis import get_sprites_from_style_json
+
+    sprite_json_dict, sprite_img = get_sprites_from_style_json(
+        style_json_data, scale)
+    if sprite_img is None:
+        return True
+    if not sprite_img.save(os.path.join(output_dir, "sprite.png"), "PNG"):
+        return False
+    with open(os.path.join(output_dir, "sprite.json"), "w",
+              encoding="utf-8") as f:
+        json.dump(sprite_json_dict, f, indent=1)
+    return True
+
+
+def convert_style(style: str, output_dir: str, options,
+                  cost_table: bool = False) -> tuple:
+    """Converts every vector source of style into output_dir, returns the
+    number of (warnings, files which could not be written). Raises
+    StyleError if style can not be loaded."""
+    from qgis.core import (
+        QgsMapBoxGlStyleConversionContext,
+        QgsUnitTypes,
+        QgsVectorTileLayer,
+    )
+
+    from . import converter
+    from .cost import estimate_costs, format_cost_table
+    from .sprites import sprite_scale
+
+    # stage name -> seconds taken
+    timings = {}
+    style_json_data = _timed(timings, "load style", _load_style, style)
+    sources = _timed(timings, "load sources",
+                     converter.get_sources_dict_from_style_json,
+                     style_json_data)
+    os.makedirs(output_dir, exist_ok=True)
+
+    warnings = []
+    errors = []
+    cost_rows = []
+    for source_id, source_data in sorted(
+            sources.items(), key=lambda item: item[1]["order"]):
+        if source_data["type"] != "vector":
+            continue
+        context = QgsMapBoxGlStyleConversionContext()
+        context.setTargetUnit(QgsUnitTypes.RenderMillimeters)
+        context.setPixelSizeConversionFactor(0.264583)  # 25.4 / 96.0
+        renderer, labeling, source_warnings = _timed(
+            timings, f"convert {source_id}", converter.convert,
+            source_id, style_json_data, context, options=options,
+            vector_layers=source_data.get("vector_layers"))
+        warnings.extend(f"{source_id}: {w}" for w in source_warnings)
+        if cost_table:
+            cost_rows.extend(estimate_costs(renderer, labeling))
+
+        layer = QgsVectorTileLayer(
+            f"type=xyz&url={source_data.get('zxy_url')}",
+            source_data.get("name"))
+        layer.setRenderer(renderer)
+        layer.setLabeling(labeling)
+        qml_path = os.path.join(output_dir, f"{_file_name(source_id)}.qml")
+        message, ok = _timed(timings, f"write {source_id}",
+                             layer.saveNamedStyle, qml_path)
+        if not ok:
+            errors.append(f"{source_id}: Could not write {qml_path}: "
+                          f"{message}")
+
+    if not _timed(timings, "sprites", _write_sprites, style_json_data,
+                  output_dir, options.sprite_scale or sprite_scale()):
+        errors.append(f"Could not write {output_dir}/sprite.png")
+    warnings.extend(errors)
+
+    with open(os.path.join(output_dir, "warnings.txt"), "w",
+              encoding="utf-8") as f:
+        f.writelines(f"{w}\n" for w in warnings)
+    with open(os.path.join(output_dir, "timings.json"), "w",
+              encoding="utf-8") as f:
+        json.dump(timings, f, indent=1)
+
+    if cost_table:
+        cost_rows.sort(key=lambda row: row["score"], reverse=True)
+        print(format_cost_table(cost_rows))
+    for stage, seconds in timings.items():
+        print(f"{stage}: {seconds:.3f} s")
+    for error in errors:
+        print(error, file=sys.stderr)
+    print(f"{len(warnings)} warnings, {len(errors)} files not written")
+    return len(warnings), len(errors)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog=f"python -m {__package__}",
+        description="Converts a GL style to QGIS vector tile styles.")
+    parser.add_argument("style", help="path or URL of style.json")
+    parser.add_argument("output_dir")
+    parser.add_argument("--profile", default=profiles.FULL,
+                        choices=list(profiles.PROFILES))
+    parser.add_argument("--sprite-scale", type=int, choices=(1, 2),
+                        help="sprite resolution, of the screen if not set")
+    parser.add_argument("--zoom-bands", action="store_true")
+    parser.add_argument("--expression-functions", action="store_true")
+    parser.add_argument("--cost", action="store_true",
+                        help="print the estimated render cost of styles")
+    parser.add_argument("--strict", action="store_true",
+                        help="exit with status 1 on conversion warnings too")
+    args = parser.parse_args(argv)
+
+    # no display needed for fonts and images
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from qgis.core import QgsApplication
+
+    from . import expression_functions
+    from .gl2qgis import ConversionOptions
+
+    app = QgsApplication([], False)
+    app.initQgis()
+    expression_functions.register_functions()
+    try:
+        options = ConversionOptions(
+            zoom_bands=args.zoom_bands,
+            expression_functions=args.expression_functions,
+            profile=args.profile,
+            sprite_scale=args.sprite_scale,
+            # written styles are used without the profile of this session
+            embed_patterns=True)
+        warning_count, error_count = convert_style(
+            args.style, args.output_dir, options, args.cost)
+    except (StyleError, OSError) as e:
+        print(f"{parser.prog}: error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        expression_functions.unregister_functions()
+        app.exitQgis()
+    if error_count or (args.strict and warning_count):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ gl2qgis library
+
+ Static analysis of GL layers and converted expressions.
+                              -------------------
+        begin                : 2026-10-19
+        copyright            : (C) 2026 by MapTiler AG.
+        author               : MapTiler Team
+ ***************************************************************************/
+"""
+
+import math
+
+from qgis.core import QgsExpression, QgsFeatureRequest, QgsRenderContext
+
+from .expressions import (
+    BinaryOp,
+    Field,
+    InList,
+    Literal,
+    Variable,
+    ZOOM_VARIABLE,
+    transform,
+)
+
+# Attribute with the GL geometry type (Point, LineString or Polygon) of
+# vector tile features
+GEOMETRY_TYPE_FIELD = "_geom_type"
+
+# Properties which hide a style where they evaluate to zero
+VISIBILITY_PROPERTIES = {
+    "fill": (("paint", "fill-opacity"),),
+    "line": (("paint", "line-opacity"), ("paint", "line-width")),
+    "symbol": (("paint", "icon-opacity"), ("layout", "icon-size")),
+}
+LABEL_VISIBILITY_PROPERTIES = (
+    ("paint", "text-opacity"),
+    ("layout", "text-size"),
+)
+
+_EQUALITY = {"IS": True, "=": True, "IS NOT": False, "!=": False, "<>": False}
+_FLIPPED = {">=": "<=", ">": "<", "<=": ">=", "<": ">", "IS": "IS", "=": "="}
+
+
+def _zoom_stops(json_value):
+    """Returns (stops, is_step) of a zoom function, None for other values"""
+    if isinstance(json_value, dict):
+        stops = json_value.get("stops")
+        if not stops or "property" in json_value:
+            return None
+        if any(not isinstance(z, (int, float)) for z, _ in stops):
+            return None
+        return stops, json_value.get("type") == "interval"
+    if isinstance(json_value, list) and len(json_value) > 3:
+        if json_value[0] == "interpolate" and json_value[2] == ["zoom"]:
+            it = iter(json_value[3:])
+            return list(zip(it, it)), False
+        if json_value[0] == "step" and json_value[1] == ["zoom"]:
+            # the first output applies below the first stop
+            it = iter(json_value[3:])
+            stops = list(zip(it, it))
+            return [(-math.inf, json_value[2])] + stops, True
+    return None
+
+
+def _is_zero(value) -> bool:
+    return (isinstance(value, (int, float)) and not isinstance(value, bool)
+            and value <= 0)
+
+
+def property_visible_range(json_value):
+    """Zoom interval (low, high) outside of which the property is zero.
+
+    Values given by expressions are assumed to be non-zero, so the interval is
+    never narrower than the real one. None means the property is always zero.
+    """
+    if _is_zero(json_value):
+        return None
+    zoom_stops = _zoom_stops(json_value)
+    if zoom_stops is None:
+        return -math.inf, math.inf
+    stops, is_step = zoom_stops
+    values = [v for _, v in stops]
+    if all(_is_zero(v) for v in values):
+        return None
+
+    low = -math.inf
+    leading = 0
+    while _is_zero(values[leading]):
+        leading += 1
+    if leading:
+        # interpolation becomes non-zero right after the last zero stop,
+        # a step function exactly at the first non-zero stop
+        low = stops[leading][0] if is_step else stops[leading - 1][0]
+
+    high = math.inf
+    trailing = len(values)
+    while _is_zero(values[trailing - 1]):
+        trailing -= 1
+    if trailing < len(values):
+        high = stops[trailing][0]
+    return low, high
+
+
+def filter_zoom_range(filter_node):
+    """Zoom interval implied by the top level zoom comparisons of a filter"""
+    low, high = -math.inf, math.inf
+    for node in conjuncts(filter_node):
+        if not isinstance(node, BinaryOp) or node.op not in _FLIPPED:
+            continue
+        op, left, right = node.op, node.left, node.right
+        if isinstance(right, Variable):
+            op, left, right = _FLIPPED[op], right, left
+        if not (isinstance(left, Variable) and left.name == ZOOM_VARIABLE
+                and isinstance(right, Literal)
+                and isinstance(right.value, (int, float))):
+            continue
+        z = right.value
+        if op in (">=", ">"):
+            low = max(low, z)
+        elif op in ("<=", "<"):
+            high = min(high, z)
+        else:
+            low, high = max(low, z), min(high, z)
+    return low, high
+
+
+def conjuncts(node):
+    """Operands of a chain of ANDs, [] for no node"""
+    if node is None:
+        return []
+    if isinstance(node, BinaryOp) and node.op == "AND":
+        return conjuncts(node.left) + conjuncts(node.right)
+    return [node]
+
+
+def visible_zoom_range(json_layer: dict, filter_node=None,
+                       labels: bool = False):
+    """Zoom interval (low, high) in which the layer can draw anything.
+
+    labels selects the text properties of symbol layers instead of icon ones.
+    None means the layer is never visible.
+    """
+    if labels:
+        properties = LABEL_VISIBILITY_PROPERTIES
+    else:
+        properties = VISIBILITY_PROPERTIES.get(json_layer.get("type"), ())
+    low, high = filter_zoom_range(filter_node)
+    for group, name in properties:
+        json_value = (json_layer.get(group) or {}).get(name)
+        if json_value is None:
+            continue
+        visible = property_visible_range(json_value)
+        if visible is None:
+            return None
+        low, high = max(low, visible[0]), min(high, visible[1])
+    if low > high:
+        return None
+    return low, high
+
+
+def tighten_zoom_levels(visible_range, min_zoom: int, max_zoom: int):
+    """Narrows style zoom levels (-1 is unbounded) to the visible range.
+
+    QGIS picks the tile zoom level by rounding or flooring the map zoom, so a
+    tile zoom level t may render map zooms from t - 0.5 up to t + 1. Returns
+    None when no zoom level remains.
+    """
+    if visible_range is None:
+        return None
+    low, high = visible_range
+    if low > 0:
+        level = int(math.floor(low))
+        min_zoom = level if min_zoom == -1 else max(min_zoom, level)
+    if high < math.inf:
+        level = int(math.floor(high + 0.5))
+        if level < 0:
+            return None
+        max_zoom = level if max_zoom == -1 else min(max_zoom, level)
+    if min_zoom != -1 and max_zoom != -1 and min_zoom > max_zoom:
+        return None
+    return min_zoom, max_zoom
+
+
+def _is_geometry_type(node) -> bool:
+    return isinstance(node, Field) and node.name == GEOMETRY_TYPE_FIELD
+
+
+def _decide_geometry_type(node, geometry_names):
+    if (isinstance(node, BinaryOp) and node.op in _EQUALITY
+            and _is_geometry_type(node.left)
+            and isinstance(node.right, Literal)):
+        results = {(node.right.value == name) == _EQUALITY[node.op]
+                   for name in geometry_names}
+    elif (isinstance(node, InList) and _is_geometry_type(node.operand)
+            and all(isinstance(v, Literal) for v in node.values)):
+        results = {any(v.value == name for v in node.values) != node.negate
+                   for name in geometry_names}
+    else:
+        return node
+    if len(results) != 1:
+        # depends on the geometry type of the feature
+        return node
+    return Literal(results.pop())
+
+
+def specialize_geometry_type(node, geometry_names):
+    """Replaces geometry type tests in node which have the same result for
+    all of geometry_names, the GL geometry types of the features a style
+    receives"""
+    return transform(node, lambda n: _decide_geometry_type(n, geometry_names))
+
+
+# Referenced fields, QgsFeatureRequest.ALL_ATTRIBUTES in a set means the
+# fields can not be determined statically
+
+ALL_FIELDS = QgsFeatureRequest.ALL_ATTRIBUTES
+
+
+def expression_fields(expression: str) -> set:
+    if not expression:
+        return set()
+    return set(QgsExpression(expression).referencedColumns())
+
+
+def renderer_style_fields(style) -> set:
+    """Fields used by filter and symbol of a vector tile renderer style"""
+    fields = expression_fields(style.filterExpression())
+    if style.symbol() is not None:
+        fields.update(style.symbol().usedAttributes(QgsRenderContext()))
+    return fields
+
+
+def labeling_style_fields(style) -> set:
+    """Fields used by filter and label settings of a vector tile labeling
+    style"""
+    fields = expression_fields(style.filterExpression())
+    fields.update(style.labelSettings().referencedFields(QgsRenderContext()))
+    return fields
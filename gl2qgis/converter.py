@@ -11,15 +11,26 @@
  ***************************************************************************/
 """
 
-import json
-import requests
-import io
 import os
 
-from .gl2qgis import parse_layers, parse_background
-from qgis.PyQt.QtWidgets import QMessageBox
+from .gl2qgis import (
+    ConversionOptions,
+    ConversionReport,
+    parse_layers,
+    parse_background,
+)
+from .sprites import (
+    PNG_COMPRESS_LEVEL,
+    ICON_CACHE_MAX_AGE,
+    collect_unused,
+    extract_icons,
+    write_icons,
+    get_sprite_sources,
+    icon_cache_dir,
+    sprite_store,
+)
 from qgis.core import QgsMapBoxGlStyleConversionContext
-from .. import utils
+from .. import net
 
 
 def get_sources_dict_from_style_json(style_json_data: dict) -> dict:
@@ -47,17 +58,21 @@ def get_sources_dict_from_style_json(style_json_data: dict) -> dict:
         layer_zxy_url = ""
         min_zoom = None
         max_zoom = None
+        vector_layers = None
         tile_json_url = None
         if "url" in source_data:
             tile_json_url = source_data.get("url")
         if tile_json_url:
-            tile_json_data = utils.qgis_request_json(tile_json_url)
+            tile_json_data = net.qgis_request_json(tile_json_url)
             if "tiles" in tile_json_data:
                 layer_zxy_url = tile_json_data.get("tiles")[0]
             if "minzoom" in tile_json_data:
                 min_zoom = tile_json_data.get("minzoom")
             if "maxzoom" in tile_json_data:
                 max_zoom = tile_json_data.get("maxzoom")
+            if "vector_layers" in tile_json_data:
+                vector_layers = get_vector_layers_dict(
+                    tile_json_data.get("vector_layers"), max_zoom)
             if "name" in tile_json_data:
                 if not tile_json_data.get("name") or tile_json_data.get(
                         "name").isspace():
@@ -77,12 +92,33 @@ def get_sources_dict_from_style_json(style_json_data: dict) -> dict:
         source_zxy_dict[source_id] = {
             "name": source_name, "zxy_url": layer_zxy_url,
             "type": source_type, "order": source_order.index(source_id),
-            "maxzoom": max_zoom, "minzoom": min_zoom
+            "maxzoom": max_zoom, "minzoom": min_zoom,
+            "vector_layers": vector_layers
         }
 
     return source_zxy_dict
 
 
+def get_vector_layers_dict(vector_layers: list, source_max_zoom: int) -> dict:
+    """Source layers of tiles.json vector_layers by id, with the zoom levels
+    (-1 is unbounded) styles of the layer can draw and its fields"""
+    vector_layers_dict = {}
+    for vector_layer in vector_layers or []:
+        min_zoom = vector_layer.get("minzoom")
+        max_zoom = vector_layer.get("maxzoom")
+        # tiles of the source max zoom are overzoomed, layers ending there
+        # stay visible above it
+        if max_zoom is None or (source_max_zoom is not None
+                                and max_zoom >= source_max_zoom):
+            max_zoom = -1
+        vector_layers_dict[vector_layer.get("id")] = {
+            "minzoom": int(min_zoom) if min_zoom else -1,
+            "maxzoom": int(max_zoom),
+            "fields": set(vector_layer.get("fields") or {}),
+        }
+    return vector_layers_dict
+
+
 def get_sources_dict_from_terrain_group(group_sources: list) -> dict:
     source_zxy_dict = {}
     for tile_json_url in group_sources:
@@ -91,7 +127,7 @@ def get_sources_dict_from_terrain_group(group_sources: list) -> dict:
         max_zoom = None
         attribution = None
 
-        tile_json_data = utils.qgis_request_json(tile_json_url)
+        tile_json_data = net.qgis_request_json(tile_json_url)
         if "tiles" in tile_json_data:
             layer_zxy_url = tile_json_data.get("tiles")[0]
         if "minzoom" in tile_json_data:
@@ -115,7 +151,7 @@ def get_sources_dict_from_terrain_group(group_sources: list) -> dict:
 def get_style_json(style_json_url: str) -> dict:
     url_endpoint = style_json_url.split("?")[0]
     if url_endpoint.endswith(".json"):
-        style_json_data = utils.qgis_request_json(style_json_url)
+        style_json_data = net.qgis_request_json(style_json_url)
         return style_json_data
     elif url_endpoint.endswith(".pbf"):
         print(f"Url to tiles, not to style supplied: {style_json_url}")
@@ -125,9 +161,13 @@ def get_style_json(style_json_url: str) -> dict:
 
 
 def convert(source_name: str, style_json_data: dict,
-            context: QgsMapBoxGlStyleConversionContext):
+            context: QgsMapBoxGlStyleConversionContext,
+            report: ConversionReport = None,
+            options: ConversionOptions = None,
+            vector_layers: dict = None):
     renderer, labeling, warnings = parse_layers(
-        source_name, style_json_data, context)
+        source_name, style_json_data, context, report, options,
+        vector_layers)
     return renderer, labeling, warnings
 
 
@@ -197,59 +237,43 @@ def get_raster_renderer_resampler(renderer, layer_json: dict):
     return styled_renderer, styled_resampler
 
 
-def write_sprite_imgs_from_style_json(style_json_data: dict, output_path: str):
-    sprite = style_json_data.get("sprite")
-    if not sprite:
-        return {}
-
-    sprite_urls = []
-    if isinstance(sprite, str):
-        sprite_urls = [(None, sprite)]
-    elif isinstance(sprite, list):
-        for item in sprite:
-            if isinstance(item, str):
-                sprite_urls.append((None, item))
-            elif isinstance(item, dict) and "url" in item:
-                sprite_urls.append((item.get("id"), item["url"]))
-
+def write_sprite_imgs_from_style_json(
+        style_json_data: dict, output_path: str = None,
+        compress_level: int = PNG_COMPRESS_LEVEL, scale: int = 1) -> dict:
+    """Extracts sprite icons of the style as PNG files and returns {icon name:
+    file path}. Without output_path icons go to a directory per sheet in the
+    icon cache of the profile and are extracted only once, with output_path
+    all icons are written into it as <icon name>.png. compress_level 0 or 1
+    writes larger files faster, scale 2 extracts @2x icons. Raises ImportError
+    without PIL/Pillow."""
+    sprite_urls = get_sprite_sources(style_json_data)
     if not sprite_urls:
         return {}
 
-    try:
-        from PIL import Image
-
-        sprite_imgs_dict = {}
-        for s_id, s_url in sprite_urls:
-            try:
-                sprite_json_dict = json.loads(
-                    requests.get(s_url + '.json', timeout=10).text)
-                sprite_png_content = requests.get(
-                    s_url + '.png', timeout=10).content
-                sprite_img = Image.open(io.BytesIO(sprite_png_content))
-            except (requests.exceptions.RequestException,
-                    json.JSONDecodeError, OSError) as e:
-                print(f"Failed to fetch or parse sprite {s_url}: {e}")
-                continue
-
-            for key, value in sprite_json_dict.items():
-                left = int(value["x"])
-                top = int(value["y"])
-                right = left + int(value["width"])
-                bottom = top + int(value["height"])
-                cropped = sprite_img.crop((left, top, right, bottom))
-                if not s_id or s_id == "default":
-                    sprite_imgs_dict[key] = cropped
-                else:
-                    sprite_imgs_dict[f"{s_id}_{key}"] = cropped
-
-        for key, value in sprite_imgs_dict.items():
-            value.save(os.path.join(output_path, key + ".png"))
-    except ImportError:
-        import_error_message = (
-            "You do not have PIL/Pillow library installed on your system. "
-            "Sprites will not be supported.\n"
-            "MacOS users: To install Pillow library, run following code "
-            "in terminal:\n"
-            "/Applications/QGIS.app/Contents/MacOS/bin/pip3 install pillow -U")
-        QMessageBox.warning(None, 'Missing PIL/Pillow library',
-                            import_error_message)
+    cache_dir = icon_cache_dir()
+    store = sprite_store()
+    sprite_imgs_dict = {}
+    for s_id, s_url in sprite_urls:
+        sprite_json_dict, sprite_png_content = store.get(s_url, scale)
+        if not sprite_json_dict:
+            continue
+        prefix = "" if not s_id or s_id == "default" else f"{s_id}_"
+        try:
+            if output_path:
+                directory = output_path
+                write_icons(sprite_json_dict, sprite_png_content, directory,
+                            compress_level, prefix)
+            else:
+                directory = extract_icons(
+                    sprite_json_dict, sprite_png_content, cache_dir,
+                    compress_level)
+        except OSError as e:
+            print(f"Failed to extract sprite {s_url}: {e}")
+            continue
+        for key in sprite_json_dict:
+            file_name = (prefix if output_path else "") + key + ".png"
+            sprite_imgs_dict[prefix + key] = os.path.join(directory,
+                                                          file_name)
+    if not output_path:
+        collect_unused(cache_dir, ICON_CACHE_MAX_AGE)
+    return sprite_imgs_dict
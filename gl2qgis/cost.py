@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ gl2qgis library
+
+ Static render cost estimate of converted vector tile styles.
+                              -------------------
+        begin                : 2026-10-19
+        copyright            : (C) 2026 by MapTiler AG.
+        author               : MapTiler Team
+ ***************************************************************************/
+
+ Scores are relative, for ranking the styles of one map against each other.
+ From the Python console:
+
+     renderer, labeling, _ = converter.convert(source, style_json, context)
+     print(cost.format_cost_table(cost.estimate_costs(renderer, labeling)))
+"""
+
+from qgis.core import (
+    QgsExpression,
+    QgsExpressionNode,
+    QgsExpressionNodeBetweenOperator,
+    QgsExpressionNodeBinaryOperator,
+    QgsExpressionNodeCondition,
+    QgsExpressionNodeFunction,
+    QgsExpressionNodeInOperator,
+    QgsExpressionNodeIndexOperator,
+    QgsExpressionNodeUnaryOperator,
+)
+
+# Zoom levels counted for styles without min or max zoom
+MAX_ZOOM_LEVEL = 24
+STRING_FUNCTIONS = {
+    "concat", "format", "left", "lower", "lpad", "regexp_match",
+    "regexp_replace", "regexp_substr", "replace", "right", "rpad", "substr",
+    "title", "to_string", "trim", "upper", "wordwrap",
+}
+# Weights of the metrics in the per zoom level score
+WEIGHTS = {
+    "nodes": 1,
+    "case_depth": 5,
+    "string_functions": 3,
+    "attribute_calls": 5,
+    "data_defined": 2,
+    "effects": 25,
+}
+
+
+def _children(node: QgsExpressionNode) -> list:
+    if isinstance(node, QgsExpressionNodeUnaryOperator):
+        return [node.operand()]
+    if isinstance(node, QgsExpressionNodeBinaryOperator):
+        return [node.opLeft(), node.opRight()]
+    if isinstance(node, QgsExpressionNodeInOperator):
+        return [node.node(), *node.list().list()]
+    if isinstance(node, QgsExpressionNodeBetweenOperator):
+        return [node.node(), node.lowerBound(), node.higherBound()]
+    if isinstance(node, QgsExpressionNodeIndexOperator):
+        return [node.container(), node.index()]
+    if isinstance(node, QgsExpressionNodeFunction):
+        args = node.args()
+        return args.list() if args is not None else []
+    if isinstance(node, QgsExpressionNodeCondition):
+        result = []
+        for when_then in node.conditions():
+            result.extend((when_then.whenExp(), when_then.thenExp()))
+        if node.elseExp() is not None:
+            result.append(node.elseExp())
+        return result
+    return []
+
+
+def _add_node_metrics(node: QgsExpressionNode, metrics: dict,
+                      case_depth: int = 0):
+    metrics["nodes"] += 1
+    if isinstance(node, QgsExpressionNodeCondition):
+        case_depth += 1
+        metrics["case_depth"] = max(metrics["case_depth"], case_depth)
+    elif isinstance(node, QgsExpressionNodeFunction):
+        name = QgsExpression.Functions()[node.fnIndex()].name().lower()
+        if name in STRING_FUNCTIONS:
+            metrics["string_functions"] += 1
+        elif name == "attribute":
+            metrics["attribute_calls"] += 1
+    for child in _children(node):
+        _add_node_metrics(child, metrics, case_depth)
+
+
+def _add_expression_metrics(expression: str, metrics: dict):
+    if not expression:
+        return
+    exp = QgsExpression(expression)
+    if exp.hasParserError() or exp.rootNode() is None:
+        return
+    _add_node_metrics(exp.rootNode(), metrics)
+
+
+def _add_property_metrics(properties, metrics: dict):
+    for key in properties.propertyKeys():
+        prop = properties.property(key)
+        if not prop.isActive():
+            continue
+        metrics["data_defined"] += 1
+        _add_expression_metrics(prop.expressionString(), metrics)
+
+
+def _has_effect(effect) -> bool:
+    return effect is not None and effect.enabled()
+
+
+def _zoom_levels(style) -> int:
+    low = max(style.minZoomLevel(), 0)
+    high = style.maxZoomLevel()
+    if high == -1:
+        high = MAX_ZOOM_LEVEL
+    return max(high - low + 1, 0)
+
+
+def _new_metrics(kind: str, style) -> dict:
+    return {
+        "style": style.styleName(),
+        "kind": kind,
+        "layer": style.layerName(),
+        "nodes": 0,
+        "case_depth": 0,
+        "string_functions": 0,
+        "attribute_calls": 0,
+        "data_defined": 0,
+        "effects": 0,
+        "zoom_levels": _zoom_levels(style),
+    }
+
+
+def _score(metrics: dict) -> float:
+    per_zoom = 1 + sum(metrics[name] * weight
+                       for name, weight in WEIGHTS.items())
+    return per_zoom * metrics["zoom_levels"]
+
+
+def renderer_style_cost(style) -> dict:
+    metrics = _new_metrics("renderer", style)
+    _add_expression_metrics(style.filterExpression(), metrics)
+    symbol = style.symbol()
+    if symbol is not None:
+        for symbol_layer in symbol.symbolLayers():
+            _add_property_metrics(symbol_layer.dataDefinedProperties(),
+                                  metrics)
+            if _has_effect(symbol_layer.paintEffect()):
+                metrics["effects"] += 1
+    metrics["score"] = _score(metrics)
+    return metrics
+
+
+def labeling_style_cost(style) -> dict:
+    metrics = _new_metrics("labeling", style)
+    _add_expression_metrics(style.filterExpression(), metrics)
+    settings = style.labelSettings()
+    if settings.isExpression:
+        _add_expression_metrics(settings.fieldName, metrics)
+    _add_property_metrics(settings.dataDefinedProperties(), metrics)
+    text_format = settings.format()
+    if text_format.buffer().enabled() and _has_effect(
+            text_format.buffer().paintEffect()):
+        metrics["effects"] += 1
+    if text_format.background().enabled():
+        metrics["effects"] += 1
+    metrics["score"] = _score(metrics)
+    return metrics
+
+
+def estimate_costs(renderer=None, labeling=None) -> list:
+    """Cost metrics of every style of renderer and labeling, most expensive
+    first"""
+    rows = []
+    if renderer is not None:
+        rows.extend(renderer_style_cost(s) for s in renderer.styles())
+    if labeling is not None:
+        rows.extend(labeling_style_cost(s) for s in labeling.styles())
+    rows.sort(key=lambda row: row["score"], reverse=True)
+    return rows
+
+
+COLUMNS = ("score", "style", "kind", "layer", "nodes", "case_depth",
+           "string_functions", "attribute_calls", "data_defined", "effects",
+           "zoom_levels")
+
+
+def format_cost_table(rows: list) -> str:
+    """Plain text table of estimate_costs() rows"""
+    table = [COLUMNS] + [
+        tuple(f"{row[c]:.0f}" if c == "score" else str(row[c])
+              for c in COLUMNS)
+        for row in rows]
+    widths = [max(len(line[i]) for line in table)
+              for i in range(len(COLUMNS))]
+    return "\n".join(
+        "  ".join(cell.ljust(width)
+                  for cell, width in zip(line, widths)).rstrip()
+        for line in table)
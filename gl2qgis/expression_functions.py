@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ gl2qgis library
+
+ QGIS expression functions registered by the plugin for converted styles.
+                              -------------------
+        begin                : 2026-10-19
+        copyright            : (C) 2026 by MapTiler AG.
+        author               : MapTiler Team
+ ***************************************************************************/
+
+ mt_interp() and mt_interp_color() evaluate zoom stops with a binary search
+ instead of a CASE chain with one branch per stop, mt_match() and mt_in()
+ look values up in a dict or frozenset instead of comparing them one by one.
+ Tables are passed as compact JSON arguments, so saved projects keep working
+ without any state from the conversion. Parsed tables are cached by their
+ text.
+"""
+
+import json
+import math
+from bisect import bisect_right
+from functools import lru_cache
+
+from qgis.PyQt.QtGui import QColor
+from qgis.core import QgsExpression, QgsSymbolLayerUtils, qgsfunction
+
+from .expressions import (
+    Function,
+    InList,
+    Interpolate,
+    Literal,
+    Match,
+    Not,
+    transform,
+)
+
+GROUP = "MapTiler"
+
+
+@lru_cache(maxsize=4096)
+def _stop_table(stops: str):
+    """Parses '[[zoom, value], ...]' into (zooms, values)"""
+    table = json.loads(stops)
+    return tuple(z for z, _ in table), tuple(v for _, v in table)
+
+
+def _segment(zoom: float, base: float, zooms: tuple):
+    """Returns (index of the upper stop, interpolation factor), factor is None
+    below the first (index 0) and above the last stop"""
+    index = bisect_right(zooms, zoom)
+    if index == 0 or index == len(zooms):
+        return index, None
+    zoom_min, zoom_max = zooms[index - 1], zooms[index]
+    if base == 1:
+        factor = (zoom - zoom_min) / (zoom_max - zoom_min)
+    else:
+        factor = ((base ** (zoom - zoom_min) - 1) /
+                  (base ** (zoom_max - zoom_min) - 1))
+    return index, factor
+
+
+def interpolate_value(zoom: float, base: float, stops: str):
+    zooms, values = _stop_table(stops)
+    index, factor = _segment(zoom, base, zooms)
+    if factor is None:
+        return values[0] if index == 0 else values[-1]
+    value_min, value_max = values[index - 1], values[index]
+    return value_min + (value_max - value_min) * factor
+
+
+def interpolate_color(zoom: float, base: float, stops: str) -> str:
+    zooms, values = _stop_table(stops)
+    index, factor = _segment(zoom, base, zooms)
+    if factor is None:
+        hsla = values[0] if index == 0 else values[-1]
+    else:
+        hsla = [a + (b - a) * factor
+                for a, b in zip(values[index - 1], values[index])]
+    hue, sat, lightness, alpha = hsla
+    color = QColor.fromHslF(
+        min(max(hue / 360.0, 0.0), 1.0), min(max(sat / 100.0, 0.0), 1.0),
+        min(max(lightness / 100.0, 0.0), 1.0),
+        min(max(alpha / 255.0, 0.0), 1.0))
+    return QgsSymbolLayerUtils.encodeColor(color)
+
+
+def lookup_key(value):
+    """Key comparing like QGIS = and IN: numbers and numeric strings by value
+    (1, 1.0 and '1' are equal), everything else as string"""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return str(value)
+    return number if math.isfinite(number) else str(value)
+
+
+@lru_cache(maxsize=4096)
+def _match_table(table: str) -> dict:
+    """Parses '[[key, value], ...]' into a dict, the first key wins"""
+    result = {}
+    for key, value in json.loads(table):
+        result.setdefault(lookup_key(key), value)
+    return result
+
+
+@lru_cache(maxsize=4096)
+def _value_set(values: str) -> frozenset:
+    return frozenset(map(lookup_key, json.loads(values)))
+
+
+@qgsfunction(args="auto", group=GROUP, register=False, referenced_columns=[])
+def mt_interp(zoom, base, stops, feature, parent):
+    """
+    Interpolates between zoom stops, exponentially for base other than 1.
+    <h4>Syntax</h4>
+    <p>mt_interp(zoom, base, stops)</p>
+    <h4>Example</h4>
+    <p>mt_interp(@vector_tile_zoom, 1.2, '[[5,1],[14,8]]')</p>
+    """
+    return interpolate_value(zoom, base, stops)
+
+
+@qgsfunction(args="auto", group=GROUP, register=False, referenced_columns=[])
+def mt_interp_color(zoom, base, stops, feature, parent):
+    """
+    Interpolates HSLA colors between zoom stops, exponentially for base other
+    than 1.
+    <h4>Syntax</h4>
+    <p>mt_interp_color(zoom, base, stops)</p>
+    <h4>Example</h4>
+    <p>mt_interp_color(@vector_tile_zoom, 1, '[[5,[0,50,50,255]],[14,[120,50,50,255]]]')</p>
+    """
+    return interpolate_color(zoom, base, stops)
+
+
+@qgsfunction(args="auto", group=GROUP, register=False, referenced_columns=[],
+             handlesnull=True)
+def mt_match(value, table, default, feature, parent):
+    """
+    Returns the value paired with the given key, default for other keys.
+    <h4>Syntax</h4>
+    <p>mt_match(key, table, default)</p>
+    <h4>Example</h4>
+    <p>mt_match("class", '[["park",1],["wood",2]]', 0)</p>
+    """
+    if value is None:
+        return default
+    return _match_table(table).get(lookup_key(value), default)
+
+
+@qgsfunction(args="auto", group=GROUP, register=False, referenced_columns=[])
+def mt_in(value, values, feature, parent):
+    """
+    Returns true when value is one of the values.
+    <h4>Syntax</h4>
+    <p>mt_in(value, values)</p>
+    <h4>Example</h4>
+    <p>mt_in("class", '["park","wood"]')</p>
+    """
+    return lookup_key(value) in _value_set(values)
+
+
+FUNCTIONS = (mt_interp, mt_interp_color, mt_match, mt_in)
+
+
+def register_functions():
+    for function in FUNCTIONS:
+        if not QgsExpression.isFunctionName(function.name()):
+            QgsExpression.registerFunction(function)
+
+
+def unregister_functions():
+    for function in FUNCTIONS:
+        QgsExpression.unregisterFunction(function.name())
+
+
+# Rewrite of converted expressions to the functions above
+
+def _number(node) -> bool:
+    return (isinstance(node, Literal) and isinstance(node.value, (int, float))
+            and not isinstance(node.value, bool))
+
+
+def _hsla(node) -> bool:
+    return (isinstance(node, Function) and node.name == "color_hsla"
+            and len(node.args) == 4 and all(map(_number, node.args)))
+
+
+def _literal(node) -> bool:
+    return (isinstance(node, Literal) and node.value is not None
+            and not isinstance(node.value, bool))
+
+
+def _json_literal(data) -> Literal:
+    return Literal(json.dumps(data, separators=(",", ":")))
+
+
+def _interpolation_call(node):
+    if not isinstance(node, Interpolate) or len(node.stops) < 2:
+        return node
+    values = [v for _, v in node.stops]
+    if all(map(_number, values)):
+        return Function("mt_interp", (
+            node.operand, Literal(node.base),
+            _json_literal([[z, v.value] for z, v in node.stops])))
+    if all(map(_hsla, values)):
+        return Function("mt_interp_color", (
+            node.operand, Literal(node.base),
+            _json_literal([[z, [a.value for a in v.args]]
+                            for z, v in node.stops])))
+    return node
+
+
+def _lookup_call(node, threshold: int):
+    if isinstance(node, Match):
+        keys = [k for keys, _ in node.branches for k in keys]
+        if (len(keys) < threshold or not all(map(_literal, keys))
+                or not all(_literal(v) for _, v in node.branches)):
+            return node
+        default = node.default if node.default is not None else Literal(None)
+        return Function("mt_match", (node.operand, _json_literal(
+            [[k.value, v.value] for keys, v in node.branches for k in keys]),
+            default))
+    if isinstance(node, InList):
+        if len(node.values) < threshold or not all(map(_literal, node.values)):
+            return node
+        call = Function("mt_in", (node.operand, _json_literal(
+            [v.value for v in node.values])))
+        return Not(call) if node.negate else call
+    return node
+
+
+def use_expression_functions(node, match_threshold: int = 0):
+    """Replaces interpolations of literal numbers and colors and, from
+    match_threshold keys on (0 never), matches and IN lists of literals with
+    calls of the registered functions"""
+    def rewrite(n):
+        n = _interpolation_call(n)
+        if match_threshold > 0:
+            n = _lookup_call(n, match_threshold)
+        return n
+
+    return transform(node, rewrite)
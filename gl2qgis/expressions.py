@@ -0,0 +1,407 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ gl2qgis library
+
+ Intermediate representation of the QGIS expressions built from GL styles.
+                              -------------------
+        begin                : 2026-10-19
+        copyright            : (C) 2026 by MapTiler AG.
+        author               : MapTiler Team
+ ***************************************************************************/
+
+ Parse functions in gl2qgis build trees of the nodes below instead of
+ concatenating expression strings. Nodes are immutable and hashable, so equal
+ sub-expressions compare (and hash) equal structurally. to_expression() is the
+ only place where QGIS expression syntax is written.
+"""
+
+from dataclasses import dataclass
+from typing import Any, Optional, Tuple
+
+from qgis.core import QgsExpression
+
+ZOOM_VARIABLE = "vector_tile_zoom"
+
+
+class Node:
+    """Base class of all expression nodes"""
+    __slots__ = ()
+
+
+@dataclass(frozen=True, eq=False)
+class Literal(Node):
+    """Number, string, boolean or NULL (None) value"""
+    value: Any
+
+    def _key(self):
+        # keeps TRUE and 1 apart, but not 1 and 1.0
+        if isinstance(self.value, bool) or self.value is None:
+            return type(self.value), self.value
+        if isinstance(self.value, (int, float)):
+            return float, self.value
+        return type(self.value), self.value
+
+    def __eq__(self, other):
+        return isinstance(other, Literal) and self._key() == other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
+
+@dataclass(frozen=True)
+class Field(Node):
+    """Direct reference to a feature attribute"""
+    name: str
+
+
+@dataclass(frozen=True)
+class Variable(Node):
+    """Expression context variable, e.g. @vector_tile_zoom"""
+    name: str
+
+
+@dataclass(frozen=True)
+class Function(Node):
+    """Call of a QGIS expression function"""
+    name: str
+    args: Tuple[Node, ...] = ()
+
+
+@dataclass(frozen=True)
+class BinaryOp(Node):
+    """Logical, comparison or arithmetic operator, e.g. AND, IS, <=, *"""
+    op: str
+    left: Node
+    right: Node
+
+
+@dataclass(frozen=True)
+class Not(Node):
+    operand: Node
+
+
+@dataclass(frozen=True)
+class InList(Node):
+    """operand IN (values) or operand NOT IN (values)"""
+    operand: Node
+    values: Tuple[Node, ...]
+    negate: bool = False
+
+
+@dataclass(frozen=True)
+class Case(Node):
+    """CASE WHEN condition THEN value ... ELSE default END"""
+    branches: Tuple[Tuple[Node, Node], ...]
+    default: Optional[Node] = None
+
+
+@dataclass(frozen=True)
+class Match(Node):
+    """Value lookup: the first branch whose keys contain operand wins"""
+    operand: Node
+    branches: Tuple[Tuple[Tuple[Node, ...], Node], ...]
+    default: Optional[Node] = None
+
+
+@dataclass(frozen=True)
+class Interpolate(Node):
+    """Piecewise interpolation of stop values, clamped at both ends.
+
+    base 1 is linear, any other base is exponential. Values that are calls of
+    the same function (e.g. color_hsla() or array()) are interpolated
+    argument by argument.
+    """
+    operand: Node
+    stops: Tuple[Tuple[float, Node], ...]
+    base: float = 1
+
+
+@dataclass(frozen=True)
+class Step(Node):
+    """Piecewise constant function: first below the first stop, then the value
+    of the last stop which is lower or equal than operand"""
+    operand: Node
+    first: Node
+    stops: Tuple[Tuple[float, Node], ...] = ()
+
+
+@dataclass(frozen=True)
+class Raw(Node):
+    """Expression text coming from outside (e.g. QGIS core converter)"""
+    text: str
+
+
+def zoom() -> Variable:
+    return Variable(ZOOM_VARIABLE)
+
+
+def as_node(value) -> Node:
+    """Wraps plain python values into Literal, keeps nodes untouched"""
+    if isinstance(value, Node):
+        return value
+    return Literal(value)
+
+
+def and_all(nodes) -> Node:
+    nodes = list(nodes)
+    if not nodes:
+        return Literal(True)
+    result = nodes[0]
+    for node in nodes[1:]:
+        result = BinaryOp("AND", result, node)
+    return result
+
+
+def or_any(nodes) -> Node:
+    nodes = list(nodes)
+    if not nodes:
+        return Literal(False)
+    result = nodes[0]
+    for node in nodes[1:]:
+        result = BinaryOp("OR", result, node)
+    return result
+
+
+def children(node: Node):
+    """Direct child nodes of node, in evaluation order"""
+    if isinstance(node, Function):
+        return list(node.args)
+    if isinstance(node, BinaryOp):
+        return [node.left, node.right]
+    if isinstance(node, Not):
+        return [node.operand]
+    if isinstance(node, InList):
+        return [node.operand, *node.values]
+    if isinstance(node, Case):
+        result = [n for branch in node.branches for n in branch]
+        if node.default is not None:
+            result.append(node.default)
+        return result
+    if isinstance(node, Match):
+        result = [node.operand]
+        for keys, value in node.branches:
+            result.extend(keys)
+            result.append(value)
+        if node.default is not None:
+            result.append(node.default)
+        return result
+    if isinstance(node, Interpolate):
+        return [node.operand, *(value for _, value in node.stops)]
+    if isinstance(node, Step):
+        return [node.operand, node.first,
+                *(value for _, value in node.stops)]
+    return []
+
+
+def walk(node: Node):
+    """Yields node and all its descendants, depth first"""
+    yield node
+    for child in children(node):
+        yield from walk(child)
+
+
+def transform(node: Node, function) -> Node:
+    """Rebuilds node bottom up, replacing every node n by function(n)"""
+    def t(child):
+        return transform(child, function) if child is not None else None
+
+    if isinstance(node, Function):
+        node = Function(node.name, tuple(map(t, node.args)))
+    elif isinstance(node, BinaryOp):
+        node = BinaryOp(node.op, t(node.left), t(node.right))
+    elif isinstance(node, Not):
+        node = Not(t(node.operand))
+    elif isinstance(node, InList):
+        node = InList(t(node.operand), tuple(map(t, node.values)),
+                      node.negate)
+    elif isinstance(node, Case):
+        node = Case(tuple((t(c), t(v)) for c, v in node.branches),
+                    t(node.default))
+    elif isinstance(node, Match):
+        node = Match(t(node.operand), tuple(
+            (tuple(map(t, keys)), t(value)) for keys, value in node.branches),
+            t(node.default))
+    elif isinstance(node, Interpolate):
+        node = Interpolate(t(node.operand),
+                           tuple((z, t(v)) for z, v in node.stops), node.base)
+    elif isinstance(node, Step):
+        node = Step(t(node.operand), t(node.first),
+                    tuple((z, t(v)) for z, v in node.stops))
+    return function(node)
+
+
+# Lowering of the high level nodes to plain CASE expressions
+
+def interpolate_pair(operand: Node, zoom_min: float, zoom_max: float,
+                     value_min: Node, value_max: Node, base: float) -> Node:
+    """Expression interpolating between two stop values"""
+    if value_min == value_max:
+        return value_min
+    if (isinstance(value_min, Function) and isinstance(value_max, Function)
+            and value_min.name == value_max.name
+            and len(value_min.args) == len(value_max.args)):
+        return Function(value_min.name, tuple(
+            interpolate_pair(operand, zoom_min, zoom_max, a, b, base)
+            for a, b in zip(value_min.args, value_max.args)))
+    if base == 1:
+        return Function("scale_linear", (
+            operand, Literal(zoom_min), Literal(zoom_max),
+            value_min, value_max))
+    # value_min + (value_max - value_min) *
+    # (base^(zoom - zoom_min) - 1) / (base^(zoom_max - zoom_min) - 1)
+    # with the constant parts computed here
+    numerator = BinaryOp("-", BinaryOp(
+        "^", Literal(base), BinaryOp("-", operand, Literal(zoom_min))),
+        Literal(1))
+    ratio = BinaryOp("/", numerator,
+                     Literal(base ** (zoom_max - zoom_min) - 1))
+    if isinstance(value_min, Literal) and isinstance(value_max, Literal):
+        delta = value_max.value - value_min.value
+        scale = ratio if delta == 1 else BinaryOp("*", Literal(delta), ratio)
+        if value_min.value == 0:
+            return scale
+    else:
+        scale = BinaryOp("*", BinaryOp("-", value_max, value_min), ratio)
+    return BinaryOp("+", value_min, scale)
+
+
+def lower(node: Node) -> Node:
+    """Rewrites Match, Interpolate and Step (not their children) to Case"""
+    if isinstance(node, Match):
+        branches = []
+        for keys, value in node.branches:
+            if len(keys) == 1:
+                condition = BinaryOp("=", node.operand, keys[0])
+            else:
+                condition = InList(node.operand, keys)
+            branches.append((condition, value))
+        return Case(tuple(branches), node.default)
+    if isinstance(node, Interpolate):
+        stops = node.stops
+        if len(stops) == 1:
+            return stops[0][1]
+        branches = [(BinaryOp("<=", node.operand, Literal(stops[0][0])),
+                     stops[0][1])]
+        for (bz, bv), (tz, tv) in zip(stops[:-1], stops[1:]):
+            branches.append((
+                BinaryOp("<=", node.operand, Literal(tz)),
+                interpolate_pair(node.operand, bz, tz, bv, tv, node.base)))
+        return Case(tuple(branches), stops[-1][1])
+    if isinstance(node, Step):
+        if not node.stops:
+            return node.first
+        branches = []
+        previous = node.first
+        for z, value in node.stops:
+            branches.append(
+                (BinaryOp("<", node.operand, Literal(z)), previous))
+            previous = value
+        return Case(tuple(branches), previous)
+    return node
+
+
+# Serialization
+
+_PRECEDENCE = {
+    "OR": 1,
+    "AND": 2,
+    "=": 4, "!=": 4, "<>": 4, "<": 4, "<=": 4, ">": 4, ">=": 4,
+    "IS": 4, "IS NOT": 4, "LIKE": 4, "ILIKE": 4, "~": 4,
+    "||": 5,
+    "+": 6, "-": 6,
+    "*": 7, "/": 7, "//": 7, "%": 7,
+    "^": 8,
+}
+_NOT_PRECEDENCE = 3
+_IN_PRECEDENCE = 4
+_ATOM_PRECEDENCE = 10
+_ASSOCIATIVE = ("AND", "OR", "+", "*", "||")
+
+
+def _precedence(node: Node) -> int:
+    if isinstance(node, BinaryOp):
+        return _PRECEDENCE[node.op]
+    if isinstance(node, Not):
+        return _NOT_PRECEDENCE
+    if isinstance(node, InList):
+        return _IN_PRECEDENCE
+    if isinstance(node, Raw):
+        # unknown content, always wrapped in parentheses
+        return 0
+    return _ATOM_PRECEDENCE
+
+
+def _operand(node: Node, parent_precedence: int, parent_op: str = None,
+             right: bool = False) -> str:
+    text = to_expression(node)
+    precedence = _precedence(node)
+    if parent_op == "OR" and isinstance(node, BinaryOp) and node.op == "AND":
+        # not needed, but easier to read
+        return f"({text})"
+    if precedence > parent_precedence:
+        return text
+    if (precedence == parent_precedence and isinstance(node, BinaryOp)
+            and parent_op is not None):
+        if node.op == parent_op and parent_op in _ASSOCIATIVE:
+            return text
+        # arithmetic operators except ^ are left associative
+        if not right and parent_op != "^" and precedence > 4:
+            return text
+    return f"({text})"
+
+
+def _format_literal(value) -> str:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return QgsExpression.quotedValue(value)
+    if isinstance(value, float):
+        if value.is_integer():
+            return str(int(value))
+        text = repr(value)
+        if "e" in text:
+            # avoid exponent notation
+            text = f"{value:.20f}".rstrip("0").rstrip(".")
+        return text
+    return str(value)
+
+
+def to_expression(node: Node) -> str:
+    """Serializes node into QGIS expression text"""
+    if isinstance(node, Literal):
+        return _format_literal(node.value)
+    if isinstance(node, Field):
+        return QgsExpression.quotedColumnRef(node.name)
+    if isinstance(node, Variable):
+        return f"@{node.name}"
+    if isinstance(node, Raw):
+        return node.text
+    if isinstance(node, Function):
+        args = ", ".join(to_expression(arg) for arg in node.args)
+        return f"{node.name}({args})"
+    if isinstance(node, BinaryOp):
+        precedence = _PRECEDENCE[node.op]
+        left = _operand(node.left, precedence, node.op)
+        right = _operand(node.right, precedence, node.op, right=True)
+        return f"{left} {node.op} {right}"
+    if isinstance(node, Not):
+        return f"NOT {_operand(node.operand, _ATOM_PRECEDENCE - 1)}"
+    if isinstance(node, InList):
+        operand = _operand(node.operand, _IN_PRECEDENCE)
+        values = ", ".join(to_expression(v) for v in node.values)
+        operator = "NOT IN" if node.negate else "IN"
+        return f"{operand} {operator} ({values})"
+    if isinstance(node, Case):
+        if not node.branches:
+            return to_expression(
+                node.default if node.default is not None else Literal(None))
+        parts = ["CASE"]
+        for condition, value in node.branches:
+            parts.append(f"WHEN {to_expression(condition)} "
+                         f"THEN {to_expression(value)}")
+        if node.default is not None:
+            parts.append(f"ELSE {to_expression(node.default)}")
+        parts.append("END")
+        return " ".join(parts)
+    if isinstance(node, (Match, Interpolate, Step)):
+        return to_expression(lower(node))
+    raise TypeError(f"Unknown expression node {type(node).__name__}")
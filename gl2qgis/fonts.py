@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ gl2qgis library
+
+ Resolution of GL font names to installed font families and styles.
+                              -------------------
+        begin                : 2026-10-19
+        copyright            : (C) 2026 by MapTiler AG.
+        author               : MapTiler Team
+ ***************************************************************************/
+
+ GL styles name fonts like "Noto Sans Bold", family and style in one
+ string. Installed fonts are indexed once per session, so resolving a name
+ is a few dictionary lookups instead of font database queries. Resolved
+ names are kept in the QGIS profile with a fingerprint of the installed
+ families and styles and reused by later sessions until any of them change,
+ which saves the QgsFontUtils checks of every name.
+"""
+
+import hashlib
+import json
+import os
+from functools import lru_cache
+
+from qgis.PyQt.QtGui import QFontDatabase
+from qgis.core import QgsApplication, QgsFontUtils
+
+# normalized family -> (family, {normalized style: style})
+_index = None
+# GL font name -> (family, style) or None
+_resolved = {}
+# fingerprint of the installed families and styles, None until computed
+_fingerprint = None
+# whether the table of the profile was read, and whether _resolved has
+# names missing in it
+_loaded = False
+_modified = False
+
+
+def normalize(name: str) -> str:
+    """Key matching "Semi Bold", "SemiBold" and "Semibold" alike"""
+    return name.replace(" ", "").lower()
+
+
+def font_index() -> dict:
+    """Installed font families and their styles, read once per session"""
+    global _index
+    if _index is None:
+        database = QFontDatabase()
+        _index = {}
+        for family in database.families():
+            _index.setdefault(normalize(family), (family, {
+                normalize(style): style for style in database.styles(family)
+            }))
+    return _index
+
+
+@lru_cache(maxsize=None)
+def _family_on_system(family: str) -> bool:
+    return QgsFontUtils.fontFamilyOnSystem(family)
+
+
+def _lookup(family_name: str, style_name: str):
+    entry = font_index().get(normalize(family_name))
+    if entry is None:
+        return None
+    family, styles = entry
+    if not style_name.strip():
+        return family, None
+    style = styles.get(normalize(style_name))
+    if style is None:
+        return None
+    if _family_on_system(family):
+        return family, style
+    # QFont does not find the family alone, only with the style in its name
+    return f"{family} {style}", None
+
+
+def fonts_fingerprint() -> str:
+    """Hash of the installed font families and their styles, computed from
+    font_index() so fonts are read only once"""
+    global _fingerprint
+    if _fingerprint is None:
+        digest = hashlib.sha1()
+        for family, styles in sorted(font_index().values()):
+            digest.update(family.encode("utf-8"))
+            for style in sorted(styles.values()):
+                digest.update(b"\t" + style.encode("utf-8"))
+            digest.update(b"\n")
+        _fingerprint = digest.hexdigest()
+    return _fingerprint
+
+
+def _table_path() -> str:
+    return os.path.join(QgsApplication.qgisSettingsDirPath(), "maptiler",
+                        "font_stacks.json")
+
+
+def _load():
+    global _loaded
+    _loaded = True
+    try:
+        with open(_table_path(), "r", encoding="utf-8") as f:
+            table = json.load(f)
+    except (OSError, ValueError):
+        return
+    if table.get("fingerprint") != fonts_fingerprint():
+        return
+    for font_name, resolved in table.get("fonts", {}).items():
+        _resolved.setdefault(font_name,
+                             tuple(resolved) if resolved else None)
+
+
+def save():
+    """Writes names resolved in this session to the table of the profile"""
+    global _modified
+    if not _modified:
+        return
+    path = _table_path()
+    table = {
+        "fingerprint": fonts_fingerprint(),
+        "fonts": _resolved,
+    }
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(table, f, indent=1, sort_keys=True)
+        os.replace(temp_path, path)
+        _modified = False
+    except OSError as e:
+        print(f"Failed to save resolved fonts: {e}")
+
+
+def resolve_font(font_name: str):
+    """(family, style or None) of an installed font matching a GL font name
+    like "Open Sans Semibold", None if no font matches"""
+    global _modified
+    if not _loaded:
+        _load()
+    if font_name not in _resolved:
+        parts = font_name.split(" ")
+        resolved = None
+        for i in range(1, len(parts) + 1):
+            resolved = _lookup(" ".join(parts[:i]), " ".join(parts[i:]))
+            if resolved:
+                break
+        _resolved[font_name] = resolved
+        _modified = True
+    return _resolved[font_name]
+
+
+def resolve_font_stack(font_names) -> tuple:
+    """(family, style or None) of the first installed font of a GL font
+    stack, None if none is installed"""
+    for font_name in font_names:
+        resolved = resolve_font(font_name)
+        if resolved:
+            return resolved
+    return None
+
+
+def clear():
+    """Forgets indexed and resolved fonts, after fonts were installed or
+    removed"""
+    global _index, _fingerprint, _loaded, _modified
+    _index = None
+    _fingerprint = None
+    _loaded = False
+    _modified = False
+    _resolved.clear()
+    _family_on_system.cache_clear()
@@ -15,17 +15,15 @@
 
 import enum
 import re
-import os
+from functools import lru_cache
 
 from qgis.PyQt.QtCore import Qt, QPointF, QSize, QSizeF, QRegularExpression
-from qgis.PyQt.QtGui import QFont, QFontDatabase, QColor, QImage
+from qgis.PyQt.QtGui import QFont, QColor, QImage
 from qgis.core import (
     Qgis,
     QgsBlurEffect,
-    qgsDoubleNear,
     QgsEffectStack,
     QgsExpression,
-    QgsFontUtils,
     QgsLabeling,
     QgsMapBoxGlStyleConversionContext,
     QgsMapBoxGlStyleConverter,
@@ -45,9 +43,47 @@ from qgis.core import (
     QgsVectorTileBasicRendererStyle,
     QgsWkbTypes,
 )
-from .. import utils
+from . import fonts, icons, profiles
+from .expressions import (
+    BinaryOp,
+    Case,
+    Field,
+    Function,
+    InList,
+    Interpolate,
+    Literal,
+    Match,
+    Not,
+    Raw,
+    Step,
+    Variable,
+    and_all,
+    or_any,
+    to_expression,
+    zoom,
+)
+from .analysis import (
+    ALL_FIELDS,
+    GEOMETRY_TYPE_FIELD,
+    labeling_style_fields,
+    renderer_style_fields,
+    specialize_geometry_type,
+    tighten_zoom_levels,
+    visible_zoom_range,
+)
+from .expression_functions import use_expression_functions
+from .optimizer import is_false, is_true, optimize
+from .sprites import (
+    get_sprite_sources,
+    pack_rects,
+    pattern_expression,
+    pattern_file,
+    sprite_scale,
+    sprite_store,
+)
+from .style_merge import merge_renderer_styles
+from .zoom_bands import split_labeling_style, split_renderer_style
 from itertools import repeat
-from pathlib import Path
 
 
 class PropertyType(enum.Enum):
@@ -59,17 +95,269 @@ class PropertyType(enum.Enum):
     Point = 6
 
 
+class ConversionReport:
+    """Statistics gathered by parse_layers, keyed by GL layer id"""
+
+    def __init__(self):
+        self.current_style = None
+        # style id -> [expression length before, after optimization]
+        self.expression_sizes = {}
+        # ids of styles dropped because they are never visible or their
+        # filter never matches their geometry type
+        self.invisible_styles = []
+        # style id -> number of renderer styles made by zoom bands
+        self.zoom_bands = {}
+        # style id -> fields used by its filter, symbol and labels
+        self.referenced_fields = {}
+        # source layer name -> fields used by all its styles
+        self.source_layer_fields = {}
+        # (kept style id, merged style id) of merged renderer styles
+        self.merged_styles = []
+        # ids of styles left out by the performance profile
+        self.profile_skipped_styles = []
+        # style id -> number of expressions QGIS could not parse
+        self.invalid_expressions = {}
+        # (bytes of sheets stacked, bytes of packed atlas) for styles with
+        # several sprite sheets
+        self.sprite_atlas_bytes = None
+
+    def add_fields(self, layer_name: str, fields: set):
+        self.referenced_fields.setdefault(
+            self.current_style, set()).update(fields)
+        self.source_layer_fields.setdefault(layer_name, set()).update(fields)
+
+    def add_expression(self, original: str, optimized: str):
+        sizes = self.expression_sizes.setdefault(self.current_style, [0, 0])
+        sizes[0] += len(original)
+        sizes[1] += len(optimized)
+
+    def add_invalid_expression(self):
+        self.invalid_expressions[self.current_style] = (
+            self.invalid_expressions.get(self.current_style, 0) + 1)
+
+    def size_reductions(self) -> dict:
+        """Characters of expression text saved by the optimizer per style"""
+        return {
+            style_id: original - optimized
+            for style_id, (original, optimized) in self.expression_sizes.items()
+        }
+
+
+class ConversionOptions:
+    """Switches of optional conversion strategies"""
+
+    def __init__(self, zoom_bands: bool = False,
+                 expression_functions: bool = False,
+                 match_table_threshold: int = 8,
+                 merge_styles: bool = True,
+                 profile: str = profiles.FULL,
+                 sprite_scale: int = None,
+                 embed_patterns: bool = False):
+        # split styles into zoom bands with static zoom dependent values
+        self.zoom_bands = zoom_bands
+        # interpolate stops with mt_interp() and mt_interp_color(), the styles
+        # then need the plugin loaded to render
+        self.expression_functions = expression_functions
+        # matches and IN lists with at least this many keys become table
+        # lookups when expression functions are enabled, 0 never
+        self.match_table_threshold = match_table_threshold
+        # merge neighbouring renderer styles drawing the same symbol
+        self.merge_styles = merge_styles
+        # performance profile, the settings below can be changed after it
+        self.profile = profile
+        profile_settings = profiles.PROFILES[profile]
+        # (GL layer type, id pattern) of layers left out
+        self.skipped_layers = list(profile_settings["skipped_layers"])
+        # blur label halos, plain buffers otherwise
+        self.halo_blur = profile_settings["halo_blur"]
+        # convert fill layers with fill-pattern, leave them out otherwise
+        self.fill_patterns = profile_settings["fill_patterns"]
+        # draw highway shields from PNGs rasterized once, SVGs otherwise
+        self.raster_shields = profile_settings["raster_shields"]
+        # 1 or 2 for @2x sprite sheets, None picks it for the primary screen
+        self.sprite_scale = sprite_scale
+        # fill patterns as base64 data in the symbols, for styles used on
+        # other machines, shared files in the QGIS profile otherwise
+        self.embed_patterns = embed_patterns
+
+
+# GL names of the geometry types of the features styles of a geometry type
+# receive: QGIS draws polygons with line styles along their boundary and
+# with point styles and labels at their pole of inaccessibility
+RECEIVED_GEOMETRY_TYPES = {
+    QgsWkbTypes.PointGeometry: ("Point", "Polygon"),
+    QgsWkbTypes.LineGeometry: ("LineString", "Polygon"),
+    QgsWkbTypes.PolygonGeometry: ("Polygon",),
+}
+
+# Report of the conversion running in parse_layers, None when not requested
+_report = None
+# Options of the conversion running in parse_layers
+_options = ConversionOptions()
+# Context of the conversion running in parse_layers
+_context = None
+
+
+@lru_cache(maxsize=8192)
+def expression_parser_error(expression: str) -> str:
+    """Parser error of expression, empty if it is valid"""
+    exp = QgsExpression(expression)
+    return exp.parserErrorString() if exp.hasParserError() else ""
+
+
+def validated(expression: str):
+    """Returns expression, None with a warning if QGIS can not parse it"""
+    error = expression_parser_error(expression)
+    if not error:
+        return expression
+    if _context is not None:
+        _context.pushWarning(
+            f"{_context.layerId()}: Skipping invalid expression "
+            f"{expression}: {error}")
+    if _report is not None:
+        _report.add_invalid_expression()
+    return None
+
+
+def optimize_node(node):
+    """optimize() followed by the rewrites enabled in conversion options"""
+    node = optimize(node)
+    if _options.expression_functions:
+        node = use_expression_functions(
+            node, _options.match_table_threshold)
+    return node
+
+
+def optimized_expression(node):
+    """Optimizes expression node and serializes it, None if the result is not
+    a valid QGIS expression"""
+    text = to_expression(optimize_node(node))
+    if _report is not None:
+        _report.add_expression(to_expression(node), text)
+    return validated(text)
+
+
+def expression_property(node):
+    """Optimizes expression node into data defined property, static if the
+    value does not depend on features or zoom"""
+    if node is None:
+        return QgsProperty()
+    optimized = optimize_node(node)
+    if _report is not None:
+        _report.add_expression(to_expression(node), to_expression(optimized))
+    if isinstance(optimized, Literal) and optimized.value is not None:
+        return QgsProperty.fromValue(optimized.value)
+    if (isinstance(optimized, Function) and optimized.name == "color_hsla"
+            and all(isinstance(arg, Literal) for arg in optimized.args)):
+        hue, sat, lightness, alpha = (arg.value for arg in optimized.args)
+        return QgsProperty.fromValue(QColor.fromHslF(
+            hue / 360.0, sat / 100.0, lightness / 100.0, alpha / 255.0))
+    text = validated(to_expression(optimized))
+    if text is None:
+        # falls back to the static value of the symbol
+        return QgsProperty()
+    return QgsProperty.fromExpression(text)
+
+
+def property_node(prop: QgsProperty):
+    """Expression node of a data defined property built before"""
+    if prop.propertyType() == QgsProperty.StaticProperty:
+        return Literal(prop.staticValue())
+    return Raw(prop.expressionString())
+
+
+def prepare_style(json_layer: dict, filter_node, geometry_type,
+                  min_zoom: int, max_zoom: int, labels: bool = False):
+    """Filter expression and zoom levels of a style with geometry_type.
+
+    Geometry type tests in the filter are decided where they have the same
+    result for every geometry type the style receives, and zoom levels where
+    opacity, width, size or filter hide the style are skipped. Returns None
+    when the style can never draw anything.
+    """
+    geometry_names = RECEIVED_GEOMETRY_TYPES.get(geometry_type)
+    if filter_node is not None and geometry_names is not None:
+        filter_node = specialize_geometry_type(filter_node, geometry_names)
+        decided = optimize(filter_node)
+        if is_false(decided):
+            return None
+        if is_true(decided):
+            filter_node = None
+
+    zoom_levels = tighten_zoom_levels(
+        visible_zoom_range(json_layer, filter_node, labels), min_zoom, max_zoom)
+    if zoom_levels is None:
+        return None
+    filter_expr = ""
+    if filter_node is not None:
+        filter_expr = optimized_expression(filter_node)
+        if filter_expr is None:
+            # without its filter the style would draw unrelated features
+            return None
+    return filter_expr, zoom_levels
+
+
+def clamp_zoom_levels(min_zoom: int, max_zoom: int,
+                      low: int, high: int):
+    """Intersection of two zoom level ranges (-1 is unbounded), (None, None)
+    when it is empty"""
+    if low != -1:
+        min_zoom = low if min_zoom == -1 else max(min_zoom, low)
+    if high != -1:
+        max_zoom = high if max_zoom == -1 else min(max_zoom, high)
+    if min_zoom != -1 and max_zoom != -1 and min_zoom > max_zoom:
+        return None, None
+    return min_zoom, max_zoom
+
+
+def check_fields(fields: set, vector_layer: dict, context):
+    """Warns about fields a style uses which its source layer does not have"""
+    if not vector_layer or not vector_layer["fields"]:
+        return
+    missing = fields - vector_layer["fields"] - {
+        GEOMETRY_TYPE_FIELD, ALL_FIELDS}
+    if missing:
+        context.pushWarning(
+            f"{context.layerId()}: Fields not in source layer: "
+            f"{', '.join(sorted(missing))}")
+
+
 def parse_layers(
     source_name: str,
     style_json_data: dict,
     context: QgsMapBoxGlStyleConversionContext,
+    report: ConversionReport = None,
+    options: ConversionOptions = None,
+    vector_layers: dict = None,
 ):
-    """Parse list of layers from JSON and return QgsVectorTileBasicRenderer + QgsVectorTileBasicLabeling in a tuple"""
+    """Parse list of layers from JSON and return QgsVectorTileBasicRenderer + QgsVectorTileBasicLabeling in a tuple
 
+    vector_layers are the source layers of the tileset, as returned by
+    converter.get_vector_layers_dict(). Styles of other source layers are
+    skipped and zoom levels are clamped to the ones of their source layer.
+    """
+    global _report, _options, _context
+    _report = report
+    _options = options or ConversionOptions()
+    _context = context
+    try:
+        return _parse_layers(source_name, style_json_data, context, report,
+                             vector_layers)
+    finally:
+        # nothing of this conversion leaks into later parse_* calls, also
+        # when it fails
+        _report = None
+        _options = ConversionOptions()
+        _context = None
+
+
+def _parse_layers(source_name: str, style_json_data: dict,
+                  context: QgsMapBoxGlStyleConversionContext,
+                  report: ConversionReport, vector_layers: dict):
     # Sprites
     if style_json_data.get("sprite"):
         sprite_json_dict, sprite_img = get_sprites_from_style_json(
-            style_json_data)
+            style_json_data, _options.sprite_scale or sprite_scale())
         context.setSprites(sprite_img, sprite_json_dict)
 
     # Parse layers
@@ -89,11 +377,37 @@ def parse_layers(
             continue
         style_id = json_layer["id"]
         context.setLayerId(style_id)
+        if report is not None:
+            report.current_style = style_id
         layer_name = json_layer.get("source-layer")
         min_zoom = (int(json_layer["minzoom"])
                     if "minzoom" in json_layer else -1)
         max_zoom = (int(json_layer["maxzoom"])
                     if "maxzoom" in json_layer else -1)
+        vector_layer = None
+        if vector_layers is not None:
+            vector_layer = vector_layers.get(layer_name)
+            if vector_layer is None:
+                context.pushWarning(
+                    f"{context.layerId()}: Skipping style of source layer "
+                    f"{layer_name} which is not in the tileset.")
+                if report is not None:
+                    report.invisible_styles.append(style_id)
+                continue
+            min_zoom, max_zoom = clamp_zoom_levels(
+                min_zoom, max_zoom,
+                vector_layer["minzoom"], vector_layer["maxzoom"])
+            if min_zoom is None:
+                if report is not None:
+                    report.invisible_styles.append(style_id)
+                continue
+
+        if (profiles.is_skipped(json_layer, _options.skipped_layers)
+                or (not _options.fill_patterns and layer_type == "fill"
+                    and "fill-pattern" in (json_layer.get("paint") or {}))):
+            if report is not None:
+                report.profile_skipped_styles.append(style_id)
+            continue
 
         enabled = True
         json_layout = json_layer.get("layout")
@@ -103,9 +417,9 @@ def parse_layers(
                 enabled = False
                 continue
 
-        filter_expr = ""
+        filter_node = None
         if "filter" in json_layer:
-            filter_expr = parse_expression(json_layer["filter"], context)
+            filter_node = parse_expression(json_layer["filter"], context)
 
         has_renderer_style = False
         has_labeling_style = False
@@ -135,23 +449,67 @@ def parse_layers(
                 f"check Python console for details.")
             print(e)
 
+        if has_renderer_style:
+            prepared = prepare_style(json_layer, filter_node,
+                                     renderer_style.geometryType(),
+                                     min_zoom, max_zoom)
+            if prepared is None:
+                has_renderer_style = False
+                if report is not None:
+                    report.invisible_styles.append(style_id)
+            else:
+                filter_expr, zoom_levels = prepared
         if has_renderer_style:
             renderer_style.setStyleName(style_id)
             renderer_style.setLayerName(layer_name)
             renderer_style.setFilterExpression(filter_expr)
-            renderer_style.setMinZoomLevel(min_zoom)
-            renderer_style.setMaxZoomLevel(max_zoom)
+            renderer_style.setMinZoomLevel(zoom_levels[0])
+            renderer_style.setMaxZoomLevel(zoom_levels[1])
             renderer_style.setEnabled(enabled)
-            renderer_styles.append(renderer_style)
+            if report is not None or vector_layer:
+                fields = renderer_style_fields(renderer_style)
+                check_fields(fields, vector_layer, context)
+                if report is not None:
+                    report.add_fields(layer_name, fields)
+            if _options.zoom_bands:
+                band_styles = split_renderer_style(renderer_style)
+                renderer_styles.extend(band_styles)
+                if report is not None:
+                    report.zoom_bands[style_id] = len(band_styles)
+            else:
+                renderer_styles.append(renderer_style)
 
+        if has_labeling_style:
+            prepared = prepare_style(json_layer, filter_node,
+                                     labeling_style.geometryType(),
+                                     min_zoom, max_zoom, labels=True)
+            if prepared is None:
+                has_labeling_style = False
+                if report is not None:
+                    report.invisible_styles.append(style_id)
+            else:
+                filter_expr, zoom_levels = prepared
         if has_labeling_style:
             labeling_style.setStyleName(style_id)
             labeling_style.setLayerName(layer_name)
             labeling_style.setFilterExpression(filter_expr)
-            labeling_style.setMinZoomLevel(min_zoom)
-            labeling_style.setMaxZoomLevel(max_zoom)
+            labeling_style.setMinZoomLevel(zoom_levels[0])
+            labeling_style.setMaxZoomLevel(zoom_levels[1])
             labeling_style.setEnabled(enabled)
-            labeling_styles.append(labeling_style)
+            if report is not None or vector_layer:
+                fields = labeling_style_fields(labeling_style)
+                check_fields(fields, vector_layer, context)
+                if report is not None:
+                    report.add_fields(layer_name, fields)
+            if _options.zoom_bands:
+                labeling_styles.extend(split_labeling_style(labeling_style))
+            else:
+                labeling_styles.append(labeling_style)
+
+    if _options.merge_styles:
+        renderer_styles, merges = merge_renderer_styles(renderer_styles)
+        if report is not None:
+            report.merged_styles.extend(merges)
 
     renderer = QgsVectorTileBasicRenderer()
     renderer.setStyles(renderer_styles)
@@ -159,6 +517,9 @@ def parse_layers(
     labeling = QgsVectorTileBasicLabeling()
     labeling.setStyles(labeling_styles)
 
+    # font names resolved by this conversion are reused by later sessions
+    fonts.save()
+
     return renderer, labeling, context.warnings()
 
 
@@ -349,7 +710,13 @@ def parse_fill_layer(json_layer, context):
         sprite_size = QSize()
         sprite_property = ""
         sprite_size_property = ""
-        if int(Qgis.QGIS_VERSION_INT) >= 34000:
+        if hasattr(core_converter, "retrieveSpriteAsBase64WithProperties"):
+            # also returns the expressions of data defined patterns
+            (sprite, sprite_size, sprite_property,
+             sprite_size_property) = (
+                core_converter.retrieveSpriteAsBase64WithProperties(
+                    json_fill_patern, context))
+        elif int(Qgis.QGIS_VERSION_INT) >= 34000:
             sprite = core_converter.retrieveSpriteAsBase64(
                 json_fill_patern, context)
         else:
@@ -364,7 +731,10 @@ def parse_fill_layer(json_layer, context):
         if sprite:
             # when fill-pattern exists, set and insert QgsRasterFillSymbolLayer
             raster_fill = QgsRasterFillSymbolLayer()
-            raster_fill.setImageFilePath(sprite)
+            # one shared file per pattern instead of base64 data in every
+            # symbol, clone and saved project
+            raster_fill.setImageFilePath(
+                sprite if _options.embed_patterns else pattern_file(sprite))
             raster_fill.setWidth(sprite_size.width())
             raster_fill.setWidthUnit(context.targetUnit())
             raster_fill.setCoordinateMode(QgsRasterFillSymbolLayer.Viewport)
@@ -373,6 +743,8 @@ def parse_fill_layer(json_layer, context):
             if raster_opacity:
                 raster_fill.setOpacity(raster_opacity)
             if sprite_property:
+                if not _options.embed_patterns:
+                    sprite_property = pattern_expression(sprite_property)
                 dd_raster_properties.setProperty(
                     QgsSymbolLayer.PropertyFile,
                     QgsProperty.fromExpression(sprite_property),
@@ -581,19 +953,20 @@ def parse_line_layer(json_layer: dict,
     if json_dasharray:
         if isinstance(json_dasharray, dict):
             stops = json_dasharray.get("stops")
+            dash_node = parse_array_stops(stops, 1)
             if line_width_property:
-                expr = (
-                    f"array_to_string("
-                    f"array_foreach({parse_array_stops(stops, 1)},"
-                    f"@element * coalesce("
-                    f"({line_width_property.asExpression()}), "
-                    f"{line_symbol.width()} * {context.pixelSizeConversionFactor()})), ';')"
-                )
-            else:
-                expr = f"array_to_string({parse_array_stops(stops, 1)}, ';')"
+                dash_node = Function("array_foreach", (
+                    dash_node,
+                    BinaryOp("*", Variable("element"), Function("coalesce", (
+                        Raw(line_width_property.asExpression()),
+                        BinaryOp("*", Literal(line_symbol.width()),
+                                 Literal(context.pixelSizeConversionFactor())),
+                    ))),
+                ))
             dd_properties.setProperty(
                 QgsSymbolLayer.PropertyCustomDash,
-                QgsProperty.fromExpression(expr),
+                expression_property(
+                    Function("array_to_string", (dash_node, Literal(";")))),
             )
             dash_source = stops[-1][1]
             if line_width:
@@ -602,16 +975,18 @@ def parse_line_layer(json_layer: dict,
                 dash_vector = dash_source
         elif isinstance(json_dasharray, list):
             if line_width_property:
-                expr = (
-                    f"array_to_string("
-                    f"array_foreach(array({','.join(map(str,json_dasharray))}),"
-                    f"@element * coalesce("
-                    f"({line_width_property.asExpression()}), "
-                    f"{line_symbol.width()} * {context.pixelSizeConversionFactor()})), ';')"
-                )
+                dash_node = Function("array_foreach", (
+                    Function("array", tuple(map(Literal, json_dasharray))),
+                    BinaryOp("*", Variable("element"), Function("coalesce", (
+                        Raw(line_width_property.asExpression()),
+                        BinaryOp("*", Literal(line_symbol.width()),
+                                 Literal(context.pixelSizeConversionFactor())),
+                    ))),
+                ))
                 dd_properties.setProperty(
                     QgsSymbolLayer.PropertyCustomDash,
-                    QgsProperty.fromExpression(expr),
+                    expression_property(Function(
+                        "array_to_string", (dash_node, Literal(";")))),
                 )
             if line_width:
                 dash_vector = [i * line_width for i in json_dasharray]
@@ -775,48 +1150,13 @@ def parse_symbol_layer(json_layer: dict, map_id: str,
     # Text font
     text_font = QFont()
 
-    def check_font_dbs(font_name, font_style):
-        if QgsFontUtils.fontFamilyOnSystem(font_name):
-            if font_style == " " or font_style is None:
-                return font_name, None
-            elif QgsFontUtils.fontFamilyHasStyle(font_name, font_style):
-                return font_name, font_style
-        elif font_name in QFontDatabase().families():
-            if font_style == " ":
-                return font_name, None
-            elif font_style in QFontDatabase().styles(font_name):
-                return f"{font_name} {font_style}", None
-        return None, None
-
     def split_font_family(font_name):
-        text_font_parts = font_name.split(" ")
-        for i in range(len(text_font_parts)):
-            candidate_font_name = " ".join(text_font_parts[:i + 1])
-            candidate_font_style = " ".join(text_font_parts[i + 1:])
-            # Check as-is
-            found_name, found_style = check_font_dbs(candidate_font_name,
-                                                     candidate_font_style)
-            if found_name:
-                return True, found_name, found_style
-            # Remove gaps after "Extra" or "Semi"
-            if "Extra " in candidate_font_style:
-                candidate_font_style = candidate_font_style.replace(
-                    "Extra ", "Extra")
-            if "Semi " in candidate_font_style:
-                candidate_font_style = candidate_font_style.replace(
-                    "Semi ", "Semi")
-            if "Semibold" in candidate_font_style:
-                candidate_font_style = candidate_font_style.replace(
-                    "Semibold", "SemiBold")
-            # Check again with no gaps
-            found_name, found_style = check_font_dbs(candidate_font_name,
-                                                     candidate_font_style)
-            if found_name:
-                return True, found_name, found_style
-        return False, None, None
+        resolved = fonts.resolve_font(font_name)
+        if resolved is None:
+            return False, None, None
+        return True, resolved[0], resolved[1]
 
     json_text_font = json_layout.get("text-font")
-    font_name = None
     if json_text_font:
         if not isinstance(json_text_font, (str, list, dict)):
             context.pushWarning(
@@ -825,12 +1165,11 @@ def parse_symbol_layer(json_layer: dict, map_id: str,
         else:
             split_ok = False
             if isinstance(json_text_font, list):
-                for font_name in json_text_font:
-                    split_ok, font_family, font_style = split_font_family(
-                        font_name)
-                    if split_ok:
-                        break
-                if not split_ok:
+                resolved = fonts.resolve_font_stack(json_text_font)
+                if resolved:
+                    split_ok = True
+                    font_family, font_style = resolved
+                else:
                     context.pushWarning(
                         f"{context.layerId()}: None of fonts in {json_text_font} is available on "
                         f"your system. Default font will be used.")
@@ -842,62 +1181,44 @@ def parse_symbol_layer(json_layer: dict, map_id: str,
                         f"{context.layerId()}: Referenced font {json_text_font} is not available on your "
                         f"system. Default font will be used.")
             elif isinstance(json_text_font, dict):
-                family_case_string = "CASE "
-                style_case_string = "CASE "
                 stops = json_text_font.get("stops")
+                font_stops = []
                 error = False
-                for i in range(len(stops) - 1):
-                    # Bottom zoom and value
-                    bz = stops[i][0]
-                    bv = (stops[i][1]
-                          if isinstance(stops[i][1], str) else stops[i][1][0])
-                    if isinstance(bz, list):
-                        context.pushWarning(
-                            f"{context.layerId()}: Expressions in interpolation function are not "
-                            f"supported, skipping")
-                        error = True
-
-                    # Top zoom
-                    tz = stops[i + 1][0]
-                    if isinstance(tz, list):
+                for stop in stops:
+                    z = stop[0]
+                    v = stop[1] if isinstance(stop[1], str) else stop[1][0]
+                    if isinstance(z, list):
                         context.pushWarning(
                             f"{context.layerId()}: Expressions in interpolation function are not "
                             f"supported, skipping")
                         error = True
-                    split_ok, font_family, font_style = split_font_family(bv)
+                        continue
+                    split_ok, font_family, font_style = split_font_family(v)
                     if split_ok:
-                        family_case_string += (
-                            f"WHEN @vector_tile_zoom > {bz} AND @vector_tile_zoom <= {tz} "
-                            f"THEN {QgsExpression.quotedValue(font_family)} ")
-                        style_case_string += (
-                            f"WHEN @vector_tile_zoom > {bz} AND @vector_tile_zoom <= {bz} "
-                            f"THEN {QgsExpression.quotedValue(font_style)} ")
+                        font_stops.append((z, font_family, font_style))
                     else:
                         context.pushWarning(
-                            f"{context.layerId()}: Referenced font {bv} is not available on your "
+                            f"{context.layerId()}: Referenced font {v} is not available on your "
                             f"system. Default font will be used.")
                 if error:
                     return False, None, False, None
-                bv = (stops[-1][1]
-                      if isinstance(stops[-1][1], str) else stops[-1][1][0])
-                split_ok, font_family, font_style = split_font_family(bv)
-                if split_ok:
-                    family_case_string += (
-                        f"ELSE {QgsExpression.quotedValue(font_family)} END")
-                    style_case_string += (
-                        f"ElSE {QgsExpression.quotedValue(font_style)} END")
+                if font_stops:
                     dd_label_properties.setProperty(
                         QgsPalLayerSettings.Family,
-                        QgsProperty.fromExpression(family_case_string),
+                        expression_property(Step(
+                            zoom(), Literal(font_stops[0][1]),
+                            tuple((z, Literal(family))
+                                  for z, family, _ in font_stops[1:]))),
                     )
                     dd_label_properties.setProperty(
                         QgsPalLayerSettings.FontStyle,
-                        QgsProperty.fromExpression(style_case_string),
+                        expression_property(Step(
+                            zoom(), Literal(font_stops[0][2]),
+                            tuple((z, Literal(style))
+                                  for z, _, style in font_stops[1:]))),
                     )
-                else:
-                    context.pushWarning(
-                        f"{context.layerId()}: Referenced font {bv} is not available on your system. "
-                        f"Default font will be used.")
+                    _, font_family, font_style = font_stops[-1]
+                    split_ok = True
             if split_ok:
                 text_font = QFont(font_family)
                 if font_style:
@@ -1016,7 +1337,7 @@ def parse_symbol_layer(json_layer: dict, map_id: str,
         format.buffer().setSize(buffer_size)
         format.buffer().setSizeUnit(context.targetUnit())
         format.buffer().setColor(buffer_color)
-        if halo_blur_size:
+        if halo_blur_size and _options.halo_blur:
             stack = QgsEffectStack()
             blur = QgsBlurEffect()
             blur.setEnabled(True)
@@ -1032,12 +1353,12 @@ def parse_symbol_layer(json_layer: dict, map_id: str,
         label_settings.autoWrapLength = int(text_max_width)
 
     json_text_field = json_layout.get("text-field")
+    label_field = None
+    label_is_expression = False
     if json_text_field:
         if isinstance(json_text_field, str):
-            field_name, field_is_expression = process_label_field(
+            label_field, label_is_expression = process_label_field(
                 json_text_field)
-            label_settings.fieldName = field_name
-            label_settings.isExpression = field_is_expression
         elif isinstance(json_text_field, list):
             if len(json_text_field) > 2 and json_text_field[0] == "format":
                 # e.g.
@@ -1046,27 +1367,22 @@ def parse_symbol_layer(json_layer: dict, map_id: str,
                 #                "bar", { "font-scale": 0.8 }
                 # ]
                 parts = []
-                for i in range(len(json_text_field)):
-                    is_expression = False
-                    part, is_expression = process_label_field(
-                        json_text_field[i])
-                    if not is_expression:
-                        parts.append(QgsExpression.quotedColumnRef(part))
+                for part in json_text_field[1::2]:
+                    if isinstance(part, str):
+                        parts.append(process_label_field(part)[0])
                     else:
-                        parts.append(part)
-                    i += 1
-                label_settings.fieldName = f"concat({','.join(parts)})"
-                label_settings.isExpression = True
+                        parts.append(parse_value(part, context))
+                if None not in parts:
+                    label_field = Function("concat", tuple(parts))
+                label_is_expression = True
             else:
                 # e.g.
                 # "text-field": ["to-string", ["get", "name"]]
-                label_settings.fieldName = parse_expression(
-                    json_text_field, context)
-                label_settings.isExpression = True
+                label_field = parse_expression(json_text_field, context)
+                label_is_expression = True
         elif isinstance(json_text_field, dict):
-            label_settings.fieldName = parse_field_name_dict(
-                json_text_field, context)
-            label_settings.isExpression = True
+            label_field = parse_field_name_dict(json_text_field, context)
+            label_is_expression = True
         else:
             context.pushWarning(
                 f"{context.layerId()}: Skipping unsupported text-field type ({type(json_text_field).__name__})."
@@ -1074,12 +1390,17 @@ def parse_symbol_layer(json_layer: dict, map_id: str,
 
     # Text transform
     text_transform = json_layout.get("text-transform")
-    if text_transform:
+    if text_transform and label_field is not None:
         if text_transform == "uppercase":
-            label_settings.fieldName = f"upper({label_settings.fieldName if label_settings.isExpression else QgsExpression.quotedColumnRef(label_settings.fieldName)})"
+            label_field = Function("upper", (label_field,))
+            label_is_expression = True
         elif text_transform == "lowercase":
-            label_settings.fieldName = f"lower({label_settings.fieldName if label_settings.isExpression else QgsExpression.quotedColumnRef(label_settings.fieldName)})"
-        label_settings.isExpression = True
+            label_field = Function("lower", (label_field,))
+            label_is_expression = True
+
+    if label_field is not None:
+        label_settings.fieldName = optimized_expression(label_field) or ""
+        label_settings.isExpression = label_is_expression
 
     # Placement
     label_settings.placement = Qgis.LabelPlacement.OverPoint
@@ -1098,61 +1419,65 @@ def parse_symbol_layer(json_layer: dict, map_id: str,
 
         if label_settings.placement == Qgis.LabelPlacement.Curved:
             json_text_offset = json_layout.get("text-offset")
-            text_offset_property = None
+            # text size of the label in target units, offsets are in ems
+            if text_size_property:
+                size_node = property_node(text_size_property)
+            else:
+                size_node = Literal(text_size)
+
+            def label_distance(offset_y_ems):
+                if isinstance(size_node, Literal):
+                    return BinaryOp("-", BinaryOp(
+                        "*", Function("abs", (offset_y_ems,)), size_node),
+                        size_node)
+                # with_variable() evaluates a data defined text size once
+                return Function("with_variable", (
+                    Literal("text_size"), size_node,
+                    BinaryOp("-", BinaryOp(
+                        "*", Function("abs", (offset_y_ems,)),
+                        Variable("text_size")), Variable("text_size"))))
+
             if json_text_offset:
-                if isinstance(json_text_offset, dict):
-                    text_offset_property = parse_interpolate_point_by_zoom(
-                        json_text_offset,
-                        context,
-                        text_size if not text_size_property else 1.0,
-                    )
-                    if not text_size_property:
+                if (isinstance(json_text_offset, dict)
+                        and json_text_offset.get("stops")):
+                    offset_node = parse_point_stops(
+                        json_text_offset.get("base") or 1,
+                        json_text_offset.get("stops"), context, 1.0)
+                    if offset_node is not None:
+                        offset_y = Function("array_get",
+                                            (offset_node, Literal(1)))
                         dd_label_properties.setProperty(
                             QgsPalLayerSettings.LabelDistance,
-                            f"abs(array_get({text_offset_property},1))-{text_size}",
+                            expression_property(label_distance(offset_y)),
                         )
-                    else:
                         dd_label_properties.setProperty(
-                            QgsPalLayerSettings.LabelDistance,
-                            f"with_variable('text_size',{text_size_property.asExpression()},abs(array_get({text_offset_property.asExpression()},1))*@text_size-@text_size)",
+                            QgsPalLayerSettings.LinePlacementOptions,
+                            expression_property(Function("if", (
+                                BinaryOp(">", offset_y, Literal(0)),
+                                Literal("BL"), Literal("AL")))),
                         )
-                    dd_label_properties.setProperty(
-                        QgsPalLayerSettings.LinePlacementOptions,
-                        f"if(array_get({text_offset_property},1)>0,'BL','AL')",
-                    )
                 elif isinstance(json_text_offset, list):
                     text_offset = QPointF(
                         json_text_offset[0] * text_size,
                         json_text_offset[1] * text_size,
                     )
+                    if text_size_property:
+                        dd_label_properties.setProperty(
+                            QgsPalLayerSettings.LabelDistance,
+                            expression_property(label_distance(
+                                Literal(json_text_offset[1]))),
+                        )
                 else:
                     context.pushWarning(
                         f"{context.layerId()}: Skipping unsupported text-offset type ({type(json_text_offset).__name__})"
                     )
 
-                if text_offset:
-                    label_settings.distUnits = context.targetUnit()
-                    label_settings.dist = abs(text_offset.y()) - text_size
-                    label_settings.lineSettings().setPlacementFlags(
-                        QgsLabeling.BelowLine if text_offset.y() >
-                        0.0 else QgsLabeling.AboveLine)
-                    if text_size_property and not text_offset_property:
-                        dd_label_properties.setProperty(
-                            QgsPalLayerSettings.LabelDistance,
-                            f"with_variable('text_size',{text_size_property.asExpression()},{abs(text_offset.y()/text_size)}*@text_size-@text_size)",
-                        )
-
             if text_offset:
                 label_settings.distUnits = context.targetUnit()
                 label_settings.dist = abs(text_offset.y()) - text_size
                 label_settings.lineSettings().setPlacementFlags(
                     QgsLabeling.BelowLine if text_offset.y() >
                     0.0 else QgsLabeling.AboveLine)
-                if text_offset and not text_offset_property:
-                    dd_label_properties.setProperty(
-                        QgsPalLayerSettings.LabelDistance,
-                        f"with_variable('text_size',{abs(text_offset.y()/text_size)},{text_size_property.asExpression()}*@text_size-@text_size)",
-                    )
             if not text_offset:
                 label_settings.lineSettings().setPlacementFlags(
                     QgsLabeling.OnLine)
@@ -1254,10 +1579,16 @@ def parse_symbol_layer(json_layer: dict, map_id: str,
             and json_layer.get("id").startswith("highway-shield")):
         backgroundSettings = QgsTextBackgroundSettings()
         backgroundSettings.setEnabled(True)
-        backgroundSettings.setType(QgsTextBackgroundSettings.ShapeSVG)
+        icons_dir, extension = shield_icons(map_id)
+        if extension == ".png":
+            backgroundSettings.setType(QgsTextBackgroundSettings.ShapeRaster)
+        else:
+            backgroundSettings.setType(QgsTextBackgroundSettings.ShapeSVG)
+        # the file of raster backgrounds is data defined by the same property
         dd_label_properties.setProperty(
             QgsPalLayerSettings.ShapeSVGFile,
-            parse_svg_path(json_icon_image, map_id, context),
+            parse_svg_path(json_icon_image, map_id, context, icons_dir,
+                           extension),
         )
         try:
             sz_type = (QgsTextBackgroundSettings.SizeType.SizeBuffer
@@ -1296,40 +1627,22 @@ def parse_symbol_layer(json_layer: dict, map_id: str,
 def parse_interpolate_color_by_zoom(json_fill_color, context):
     base = json_fill_color["base"] if "base" in json_fill_color else 1
     stops = json_fill_color["stops"]
-    # Bottom color
-    case_str = "CASE "
 
     if len(stops) == 0:
         return QgsProperty()
 
-    for i in range(0, len(stops) - 1):
-        bz = stops[i][0]
-        tz = stops[i + 1][0]
-        bottom_color = parse_color(stops[i][1], context)
-        top_color = parse_color(stops[i + 1][1], context)
-
-        bc_hue, bc_sat, bc_light, bc_alpha = get_color_as_hsla_components(
-            bottom_color)
-        tc_hue, tc_sat, tc_light, tc_alpha = get_color_as_hsla_components(
-            top_color)
-
-        case_str += (
-            f"WHEN @vector_tile_zoom >= {bz} AND @vector_tile_zoom < {tz} THEN color_hsla("
-            f"{interpolate_expression(bz, tz, bc_hue, tc_hue, base)}, "
-            f"{interpolate_expression(bz, tz, bc_sat, tc_sat, base)}, "
-            f"{interpolate_expression(bz, tz, bc_light, tc_light, base)}, "
-            f"{interpolate_expression(bz, tz, bc_alpha, tc_alpha, base)}) ")
-
-    # Top color
-    tz = stops[-1][0]
-    top_color = parse_color(stops[-1][1], context)
-    tc_hue, tc_sat, tc_light, tc_alpha = get_color_as_hsla_components(
-        top_color)
-    case_str += (
-        f"WHEN @vector_tile_zoom >= {tz} THEN color_hsla({tc_hue}, {tc_sat}, {tc_light}, {tc_alpha}) "
-        f"ELSE color_hsla({tc_hue}, {tc_sat}, {tc_light}, {tc_alpha}) END")
+    color_stops = []
+    for z, v in stops:
+        components = parse_color_hsla(v, context)
+        if components is None:
+            continue
+        hue, sat, lightness, alpha = components
+        color_stops.append((z, Function("color_hsla", (
+            Literal(hue), Literal(sat), Literal(lightness), Literal(alpha)))))
 
-    return QgsProperty.fromExpression(case_str)
+    if not color_stops:
+        return QgsProperty()
+    return expression_property(Interpolate(zoom(), tuple(color_stops), base))
 
 
 def parse_interpolate_by_zoom(
@@ -1340,12 +1653,7 @@ def parse_interpolate_by_zoom(
     base = json_obj.get("base") if json_obj.get("base") else 1
     stops = json_obj.get("stops")
 
-    scale_expression = parse_stops(base, stops, multiplier, context)
-
-    if isinstance(scale_expression, (int, float)):
-        return scale_expression
-    else:
-        return QgsProperty.fromExpression(scale_expression)
+    return expression_property(parse_stops(base, stops, multiplier, context))
 
 
 def parse_interpolate_opacity_by_zoom(json_obj: dict, max_opacity: int):
@@ -1354,33 +1662,15 @@ def parse_interpolate_opacity_by_zoom(json_obj: dict, max_opacity: int):
 
     if len(stops) == 0:
         return QgsProperty()
-    if len(stops) <= 2:
-        scale_exp = (
-            f"set_color_part(@symbol_color, 'alpha', "
-            f"{interpolate_expression(stops[0][0], stops[-1][0],stops[0][1] * max_opacity, stops[-1][1] * max_opacity, base)})"
-        )
-    else:
-        scale_exp = parse_opacity_stops(base, stops, max_opacity)
 
-    return QgsProperty.fromExpression(scale_exp)
+    return expression_property(parse_opacity_stops(base, stops, max_opacity))
 
 
 def parse_opacity_stops(base: (int, float), stops: list, max_opacity: int):
-    case_str = (
-        f"CASE WHEN @vector_tile_zoom < {stops[0][0]} THEN set_color_part(@symbol_color, 'alpha', "
-        f"{stops[0][1]*max_opacity})")
-
-    for i in range(len(stops) - 1):
-        case_str += (
-            f" WHEN @vector_tile_zoom >= {stops[i][0]} AND @vector_tile_zoom < {stops[i + 1][0]} "
-            f"THEN set_color_part(@symbol_color, 'alpha', "
-            f"{interpolate_expression(stops[i][0], stops[i+1][0], stops[i][1] * max_opacity, stops[i+1][1], max_opacity, base)})"
-        )
-    case_str += (
-        f" WHEN @vector_tile_zoom >= {stops[-1][0]}"
-        f" THEN set_color_part(@symbol_color, 'alpha', {stops[-1][1] * 255.0}) END"
-    )
-    return case_str
+    alpha = Interpolate(
+        zoom(), tuple((z, Literal(v * max_opacity)) for z, v in stops), base)
+    return Function("set_color_part",
+                    (Variable("symbol_color"), Literal("alpha"), alpha))
 
 
 def parse_interpolate_point_by_zoom(
@@ -1394,18 +1684,8 @@ def parse_interpolate_point_by_zoom(
     if len(stops) == 0:
         return QgsProperty()
 
-    if len(stops) <= 2:
-        scale_expr = (
-            f"array("
-            f"{interpolate_expression(stops[0][0], stops[-1][0], stops[0][1][0], stops[-1][1][0], base, multiplier)}, "
-            f"{interpolate_expression(stops[0][0], stops[-1][0], stops[0][1][1], stops[-1][1][1], base, multiplier)})"
-        )
-        scale_expr = parse_point_stops(base, stops, context, multiplier)
-
-    else:
-        scale_expr = parse_point_stops(base, stops, context, multiplier)
-
-    return QgsProperty.fromExpression(scale_expr)
+    return expression_property(
+        parse_point_stops(base, stops, context, multiplier))
 
 
 def parse_interpolate_string_by_zoom(
@@ -1414,8 +1694,8 @@ def parse_interpolate_string_by_zoom(
     stops = json_dict.get("stops")
     if not stops:
         return QgsProperty()
-    scale_expression = parse_string_stops(stops, context, conversion_map)
-    return QgsProperty.fromExpression(scale_expression)
+    return expression_property(
+        parse_string_stops(stops, context, conversion_map))
 
 
 def parse_point_stops(
@@ -1424,30 +1704,16 @@ def parse_point_stops(
         context: QgsMapBoxGlStyleConversionContext,
         multiplier: (int, float),
 ):
-    case_str = "CASE "
-    for i in range(len(stops) - 1):
-        bz = stops[i][0]
-        bv = stops[i][-1]
-        if not isinstance(bv, list):
-            context.pushWarning(
-                f"{context.layerId()}: Skipping unsupported offset interpolation type ({type(bz).__name__})."
-            )
-            return
-
-        tz = stops[i + 1][0]
-        tv = stops[i + 1][-1]
-        if not isinstance(tv, list):
+    point_stops = []
+    for z, v in stops:
+        if not isinstance(v, list):
             context.pushWarning(
-                f"{context.layerId()}: Skipping unsupported offset interpolation type ({type(bz).__name__})."
+                f"{context.layerId()}: Skipping unsupported offset interpolation type ({type(v).__name__})."
             )
-            return
-    case_str += (
-        f"WHEN @vector_tile_zoom > {bz} AND @vector_tile_zoom <= {tz} "
-        f"THEN array("
-        f"{interpolate_expression(bz, tz, bv[0], tv[0], base, multiplier)}, "
-        f"{interpolate_expression(bz, tz, bv[1], tv[1], base, multiplier)}) ")
-    case_str += "END"
-    return case_str
+            return None
+        point_stops.append((z, Function("array", (
+            Literal(v[0] * multiplier), Literal(v[1] * multiplier)))))
+    return Interpolate(zoom(), tuple(point_stops), base)
 
 
 def parse_stops(
@@ -1456,64 +1722,37 @@ def parse_stops(
         multiplier: (int, float),
         context: QgsMapBoxGlStyleConversionContext,
 ):
-    case_str = "CASE "
-    # First zoom/value
-    fz = stops[0][0]
-    fv = stops[0][1]
-    if isinstance(fv, list):
-        fv = parse_expression(fv, context)
-    case_str += f"WHEN @vector_tile_zoom <= {fz} " f"THEN {fv} * {multiplier} "
-    for i in range(len(stops) - 1):
-        bz = stops[i][0]
-        bv = stops[i][1]
-        if isinstance(bv, list):
-            bv = parse_expression(bv, context)
-        tz = stops[i + 1][0]
-        tv = stops[i + 1][1]
-        if isinstance(tv, list):
-            tv = parse_expression(tv, context)
-
-        case_str += (
-            f"WHEN @vector_tile_zoom > {bz} AND @vector_tile_zoom <= {tz} "
-            f"THEN {interpolate_expression(bz, tz, bv, tv, base, multiplier)} "
-        )
-
-    z = stops[-1][0]
-    v = stops[-1][1]
-    if isinstance(v, list):
-        v = parse_expression(v, context)
-    case_str += f"WHEN @vector_tile_zoom > {z} THEN {v} * {multiplier} END"
-    return case_str
+    value_stops = []
+    for z, v in stops:
+        if isinstance(v, list):
+            v = parse_expression(v, context)
+            if multiplier != 1:
+                v = BinaryOp("*", v, Literal(multiplier))
+        else:
+            v = Literal(v * multiplier)
+        value_stops.append((z, v))
+    return Interpolate(zoom(), tuple(value_stops), base)
 
 
 def parse_discrete(json_list: list,
                    context: QgsMapBoxGlStyleConversionContext):
-    attr = parse_expression(json_list[1], context)
+    # ["step", input, output_0, stop_1, output_1, ..., stop_n, output_n]
+    attr = parse_value(json_list[1], context)
 
-    if not attr:
+    if attr is None or len(json_list) < 3:
         context.pushWarning(
             f"{context.layerId()}: Could not interpret step expression.")
         return
 
-    case_str = "CASE "
-    for i in range(2, len(json_list) - 1, 2):
-        # WHEN value
-        when_value = json_list[i]
-        # THEN value
-        then_value = json_list[i + 1]
-        # IN operator for list
-        if isinstance(when_value, list):
-            match_str_lst = [
-                QgsExpression.quotedValue(wv) for wv in when_value
-            ]
-            case_str += f"WHEN {attr} IN ({','.join(match_str_lst)}) THEN {then_value} "
-        # EQUAL operator for single key
-        elif isinstance(when_value, str):
-            case_str += f"WHEN {attr}={QgsExpression.quotedValue(when_value)} THEN {then_value} "
-
-    else_value = json_list[-1]
-    case_str += f"ELSE {else_value} END"
-    return case_str
+    first = parse_value(json_list[2], context)
+    stops = []
+    for i in range(3, len(json_list) - 1, 2):
+        stops.append((json_list[i], parse_value(json_list[i + 1], context)))
+    if first is None or None in (v for _, v in stops):
+        context.pushWarning(
+            f"{context.layerId()}: Could not interpret step expression.")
+        return
+    return Step(attr, first, tuple(stops))
 
 
 def parse_concat(json_list: list, context: QgsMapBoxGlStyleConversionContext):
@@ -1522,30 +1761,32 @@ def parse_concat(json_list: list, context: QgsMapBoxGlStyleConversionContext):
         context.pushWarning(
             f"{context.layerId()}: Skipping unsupported concat expression.")
         return None
-    concat_str = f"concat({','.join(concat_items)})"
-    return concat_str
+    return Function("concat", tuple(concat_items))
 
 
 def parse_case(json_list: list, context: QgsMapBoxGlStyleConversionContext):
-    case_str = "CASE "
+    branches = []
     for i in range(1, len(json_list) - 1, 2):
         # WHEN value
         when_value = json_list[i]
         # THEN value
-        then_value = json_list[i + 1]
+        then_value = parse_value(json_list[i + 1], context)
         if isinstance(when_value, list):
             when_expr = parse_expression(when_value, context)
             if when_expr is None:
                 context.pushWarning(
                     f"{context.layerId()}: Skipping unsupported case statement condition.")
                 return None
-            case_str += f"WHEN {when_expr} THEN {then_value} "
+            branches.append((when_expr, then_value))
         # EQUAL operator for single key
         elif isinstance(when_value, str):
-            case_str += f"WHEN {QgsExpression.quotedValue(when_value)} THEN {then_value} "
-    else_value = json_list[-1]
-    case_str += f"ELSE {else_value} END"
-    return case_str
+            branches.append((Literal(when_value), then_value))
+    else_value = parse_value(json_list[-1], context)
+    if else_value is None or None in (v for _, v in branches):
+        context.pushWarning(
+            f"{context.layerId()}: Skipping unsupported case statement value.")
+        return None
+    return Case(tuple(branches), else_value)
 
 
 def parse_coalesce(json_list: list,
@@ -1556,32 +1797,19 @@ def parse_coalesce(json_list: list,
         context.pushWarning(
             f"{context.layerId()}: Skipping empty or unsupported coalesce expression.")
         return None
-    coalesce_str = f"COALESCE({','.join(coalesce_items)})"
-    return coalesce_str
+    return Function("coalesce", tuple(coalesce_items))
 
 
 def parse_array_stops(stops: list, multiplier: (int, float)):
     if len(stops) < 2:
         return
-    case_str = "CASE "
-    for i in range(len(stops) - 1):
-        bz = stops[i][0]
-        bv = stops[i][1]
-        bl = []
-        for v in bv:
-            bl.append(str(float(v) * multiplier))
-        tz = stops[i + 1][0]
-
-        case_str += f"WHEN @vector_tile_zoom > {bz} AND @vector_tile_zoom <= {tz} THEN array({','.join(bl)}) "
-
-    lz = stops[-1][0]
-    lv = stops[-1][1]
-    ll = []
-    for v in lv:
-        ll.append(str(float(v) * multiplier))
-    case_str += f"WHEN @vector_tile_zoom > {lz} THEN array({','.join(ll)}) "
-    case_str += "END"
-    return case_str
+
+    def array_node(values):
+        return Function(
+            "array", tuple(Literal(float(v) * multiplier) for v in values))
+
+    return Step(zoom(), array_node(stops[0][1]),
+                tuple((z, array_node(v)) for z, v in stops[1:]))
 
 
 def process_label_field(string: str):
@@ -1593,7 +1821,7 @@ def process_label_field(string: str):
     match = single_field_rx.match(string)
     if match.hasMatch():
         is_expression = True
-        return QgsExpression.quotedColumnRef(match.captured(1)), is_expression
+        return Field(match.captured(1)), is_expression
     multi_field_rx = "(?={[^}]+})"
     parts = re.split(multi_field_rx, string)
     if len(parts) > 1:
@@ -1605,44 +1833,30 @@ def process_label_field(string: str):
             elif "}" in part:
                 # part will start at a {field} reference
                 split = part.split("}")
-                res.append(QgsExpression.quotedColumnRef(split[0][1:]))
+                res.append(Field(split[0][1:]))
                 if split[1]:
-                    res.append(QgsExpression.quotedValue(split[1]))
+                    res.append(Literal(split[1]))
             else:
-                res.append(QgsExpression.quotedValue(part))
-        return f"concat({','.join(res)})", is_expression
+                res.append(Literal(part))
+        return Function("concat", tuple(res)), is_expression
     else:
         is_expression = False
-    return QgsExpression.quotedColumnRef(string), is_expression
+    return Field(string), is_expression
 
 
 def parse_string_stops(stops, context, conversion_map):
-    case_str = "CASE "
-    for i in range(len(stops) - 1):
-        # Bottom zoom and value
-        bz = stops[i][0]
-        bv = stops[i][1]
-
-        if isinstance(bz, list):
-            context.pushWarning(
-                f"{context.layerId()}: Expressions in interplation function are not supported, skipping."
-            )
-            return
-
-        # Top zoom
-        tz = stops[i + 1][0]
-        if isinstance(tz, list):
+    for z, _ in stops:
+        if isinstance(z, list):
             context.pushWarning(
                 f"{context.layerId()}: Expressions in interplation function are not supported, skipping."
             )
             return
 
-        case_str += (
-            f"WHEN @vector_tile_zoom > {bz} AND @vector_tile_zoom <= {tz} "
-            f"THEN {QgsExpression.quotedValue(conversion_map[bv][bv])} ")
-    case_str += f"ELSE {QgsExpression.quotedValue(conversion_map[stops[-1][1]][stops[-1][1]])} END"
+    def converted(v):
+        return Literal(conversion_map[v][v])
 
-    return case_str
+    return Step(zoom(), converted(stops[0][1]),
+                tuple((z, converted(v)) for z, v in stops[1:]))
 
 
 def parse_value_list(
@@ -1680,48 +1894,34 @@ def parse_match_list(
             f"{context.layerId()}: Could not interpret match list.")
         return QgsProperty()
 
-    case_str = "CASE "
-    for i in range(2, len(json_list) - 1, 2):
-        # THEN value
-        then_value = json_list[i + 1]
+    def value_node(value):
         if property_type == PropertyType.Color:
-            color = parse_color(then_value, context)
-            then_value_str = QgsExpression.quotedString(
-                color.name(QColor.NameFormat.HexArgb))
+            return Literal(parse_color_hex_argb(value, context))
         elif property_type == PropertyType.Numeric:
-            then_value_str = str(then_value * multiplier)
+            return Literal(value * multiplier)
         elif property_type == PropertyType.Opacity:
-            then_value_str = str(then_value * max_opacity)
+            return Literal(value * max_opacity)
         elif property_type == PropertyType.Point:
-            then_value_str = f"array({then_value[0] * multiplier},{then_value[0] * multiplier})"
+            return Function("array", (Literal(value[0] * multiplier),
+                                      Literal(value[1] * multiplier)))
+
+    branches = []
+    for i in range(2, len(json_list) - 1, 2):
         # WHEN value
         when_value = json_list[i]
         # IN operator for list
         if isinstance(when_value, list):
-            match_str_lst = [
-                QgsExpression.quotedValue(wv) for wv in when_value
-            ]
-            case_str += f"WHEN {attr} IN ({','.join(match_str_lst)}) THEN {then_value_str} "
+            keys = tuple(Literal(wv) for wv in when_value)
         # EQUAL operator for single key
         elif isinstance(when_value, (str, int, float)):
-            case_str += f"WHEN {attr}={QgsExpression.quotedValue(when_value)} THEN {then_value_str} "
-
-    if property_type == PropertyType.Color:
-        color = parse_color(json_list[-1], context)
-        else_value = QgsExpression.quotedString(
-            color.name(QColor.NameFormat.HexArgb))
-    elif property_type == PropertyType.Numeric:
-        v = json_list[-1] * multiplier
-        else_value = str(v)
-    elif property_type == PropertyType.Opacity:
-        v = json_list[-1] * max_opacity
-        else_value = str(v)
-    elif property_type == PropertyType.Point:
-        else_value = (f"array("
-                      f"{json_list[-1][0] * multiplier},"
-                      f"{json_list[-1][0] * multiplier})")
-    case_str += f"ELSE {else_value} END"
-    return QgsProperty.fromExpression(case_str)
+            keys = (Literal(when_value),)
+        else:
+            continue
+        # THEN value
+        branches.append((keys, value_node(json_list[i + 1])))
+
+    return expression_property(
+        Match(attr, tuple(branches), value_node(json_list[-1])))
 
 
 def parse_interpolate_list_by_zoom(
@@ -1777,13 +1977,53 @@ def parse_interpolate_list_by_zoom(
     return QgsProperty()
 
 
-def parse_color(json_color: str, context: QgsMapBoxGlStyleConversionContext):
+# Basemap styles use a small palette many times, colors are parsed once per
+# session
+@lru_cache(maxsize=4096)
+def _parsed_color(json_color: str) -> QColor:
+    return QgsSymbolLayerUtils.parseColor(json_color)
+
+
+@lru_cache(maxsize=4096)
+def _color_hsla(json_color: str) -> tuple:
+    return get_color_as_hsla_components(_parsed_color(json_color))
+
+
+@lru_cache(maxsize=4096)
+def _color_hex_argb(json_color: str) -> str:
+    return _parsed_color(json_color).name(QColor.NameFormat.HexArgb)
+
+
+def _is_color_string(json_color, context) -> bool:
     if not isinstance(json_color, str):
         context.pushWarning(
             f"{context.layerId()}: Could not parse non-string color {json_color}, skipping."
         )
+        return False
+    return True
+
+
+def parse_color(json_color: str, context: QgsMapBoxGlStyleConversionContext):
+    if not _is_color_string(json_color, context):
         return None
-    return QgsSymbolLayerUtils.parseColor(json_color)
+    # a copy, callers may change it
+    return QColor(_parsed_color(json_color))
+
+
+def parse_color_hsla(json_color: str,
+                     context: QgsMapBoxGlStyleConversionContext):
+    """get_color_as_hsla_components() of a GL color, None if not a string"""
+    if not _is_color_string(json_color, context):
+        return None
+    return _color_hsla(json_color)
+
+
+def parse_color_hex_argb(json_color: str,
+                         context: QgsMapBoxGlStyleConversionContext):
+    """#AARRGGBB of a GL color, None if not a string"""
+    if not _is_color_string(json_color, context):
+        return None
+    return _color_hex_argb(json_color)
 
 
 def get_color_as_hsla_components(qcolor: QColor):
@@ -1801,33 +2041,6 @@ def get_color_as_hsla_components(qcolor: QColor):
     return hue, sat, lightness, alpha
 
 
-def interpolate_expression(
-    zoom_min: float,
-    zoom_max: float,
-    value_min: float,
-    value_max: float,
-    base: float,
-    multiplier: float = 1,
-):
-    if (isinstance(value_min,
-                   (int, float)) and isinstance(value_max, (int, float))
-            and qgsDoubleNear(value_min, value_max)):
-        return value_min * multiplier
-
-    if base == 1:
-        expression = f"scale_linear(@vector_tile_zoom,{zoom_min},{zoom_max},{value_min},{value_max})"
-    else:
-        expression = (
-            f"{value_min} + ({value_max} - {value_min}) * "
-            f"({base}^(@vector_tile_zoom-{zoom_min})-1)/({base}^({zoom_max}-{zoom_min})-1)"
-        )
-
-    if multiplier != 1:
-        return f"({expression}) * {multiplier}"
-    else:
-        return expression
-
-
 def parse_cap_style(style: str):
     if style == "round":
         return Qt.PenCapStyle.RoundCap
@@ -1849,9 +2062,9 @@ def parse_join_style(style: str):
 
 
 def parse_expression(json_expr, context):
-    """Parses expression into QGIS expression string"""
+    """Parses expression into QGIS expression node"""
     if isinstance(json_expr, str):
-        return QgsExpression.quotedValue(json_expr)
+        return Literal(json_expr)
 
     op = json_expr[0]
 
@@ -1862,19 +2075,22 @@ def parse_expression(json_expr, context):
                 f"{context.layerId()}: Skipping unsupported expression.")
             return None
         if op == "none":
-            operator_string = ") AND NOT ("
-            return f"NOT ({operator_string.join(lst)})"
+            return Not(or_any(lst))
         if op == "all":
-            operator_string = ") AND ("
-        elif op == "any":
-            operator_string = ") OR ("
-        return f"({operator_string.join(lst)})"
+            return and_all(lst)
+        return or_any(lst)
     elif op == "!":
         # ! inverts next expression meaning
-        contra_json_expr = json_expr[1]
-        contra_json_expr[0] = op + contra_json_expr[0]
         # ['!', ['has', 'level']] -> ['!has', 'level']
-        return parse_key(contra_json_expr, context)
+        contra_json_expr = json_expr[1]
+        if (isinstance(contra_json_expr, list)
+                and contra_json_expr[0] in ("has", "in")):
+            return parse_expression(
+                [op + contra_json_expr[0]] + contra_json_expr[1:], context)
+        contra_expr = parse_expression(contra_json_expr, context)
+        if contra_expr is None:
+            return None
+        return Not(contra_expr)
     elif op in ("==", "!=", ">=", ">", "<=", "<"):
         key = parse_key(json_expr[1], context)
         val = parse_value(json_expr[2], context)
@@ -1887,80 +2103,94 @@ def parse_expression(json_expr, context):
             op = "IS"
         elif op == "!=":
             op = "IS NOT"
-        return f"{key} {op} {val}"
+        return BinaryOp(op, key, val)
     elif op == "has":
         key = parse_key(json_expr[1], context)
         if key is None:
             context.pushWarning(
                 f"{context.layerId()}: Skipping unsupported expression.")
             return None
-        return key + " IS NOT NULL"
+        return BinaryOp("IS NOT", key, Literal(None))
     elif op == "!has":
         key = parse_key(json_expr[1], context)
         if key is None:
             context.pushWarning(
                 f"{context.layerId()}: Skipping unsupported expression.")
             return None
-        return key + " IS NULL"
+        return BinaryOp("IS", key, Literal(None))
     elif op == "in" or op == "!in":
         key = parse_key(json_expr[1], context)
-        lst = [parse_value(v, context) for v in json_expr[2:]]
+        lst = []
+        for v in json_expr[2:]:
+            if (isinstance(v, list) and len(v) == 2 and v[0] == "literal"
+                    and isinstance(v[1], list)):
+                # ["in", key, ["literal", [value, ...]]]
+                lst.extend(parse_value(item, context) for item in v[1])
+            else:
+                lst.append(parse_value(v, context))
         if key is None or None in lst:
             context.pushWarning(
                 f"{context.layerId()}: Skipping unsupported expression.")
             return None
         if op == "in":
-            return f"{key} IN ({', '.join(lst)})"
+            return InList(key, tuple(lst))
         else:  # not in
-            return f"({key} IS NULL OR {key} NOT IN ({', '.join(lst)}))"
+            return BinaryOp("OR", BinaryOp("IS", key, Literal(None)),
+                            InList(key, tuple(lst), negate=True))
     elif op == "get":
-        if json_expr[1].startswith("name"):
-            return parse_key(json_expr[1], context)
-        elif json_expr[1] == "class":
+        if isinstance(json_expr[1], str):
             return parse_key(json_expr[1], context)
-        else:
-            return f"attribute('{json_expr[1]}')"
+        # field name computed per feature
+        name = parse_expression(json_expr[1], context)
+        if name is None:
+            context.pushWarning(
+                f"{context.layerId()}: Skipping unsupported expression.")
+            return None
+        return Function("attribute", (name,))
     elif op == "match":
-        attr = json_expr[1][1]
+        attr = Field(json_expr[1][1])
 
         if (len(json_expr) == 5 and isinstance(json_expr[3], bool)
                 and isinstance(json_expr[4], bool)):
             if isinstance(json_expr[2], list):
-                operator = "IN" if json_expr[3] is True else "NOT IN"
-                lst = map(QgsExpression.quotedValue, json_expr[2])
-                if len(json_expr[2]) > 1:
-                    return f"{attr} IS NULL OR {QgsExpression.quotedColumnRef(attr)} {operator} ({', '.join(lst)})"
-                else:
-                    operator = "=" if json_expr[3] is True else "!="
-                    return f"{QgsExpression.quotedColumnRef(attr)} {operator} '{json_expr[2][0]}'"
+                lst = tuple(Literal(v) for v in json_expr[2])
+                if json_expr[3] is True:
+                    if len(lst) > 1:
+                        return InList(attr, lst)
+                    return BinaryOp("=", attr, lst[0])
+                if len(lst) > 1:
+                    return BinaryOp("OR", BinaryOp("IS", attr, Literal(None)),
+                                    InList(attr, lst, negate=True))
+                return BinaryOp("!=", attr, lst[0])
             elif isinstance(json_expr[2], (str, float, int)):
-                return QgsExpression.createFieldEqualityExpression(
-                    attr, json_expr[2])
+                return BinaryOp("=", attr, Literal(json_expr[2]))
             else:
                 context.pushWarning(
                     f"{context.layerId()}: Skipping unsupported expression.")
                 return None
         else:
-            case_str = "CASE "
+            branches = []
             for i in range(2, len(json_expr) - 2, 2):
                 if isinstance(json_expr[i], (list, tuple)):
-                    lst = list(map(QgsExpression.quotedValue, json_expr[i]))
-                    if len(lst) > 1:
-                        case_str += f"WHEN {QgsExpression.quotedValue(attr)} IN ({', '.join(lst)}) "
-                    else:
-                        case_str += f"WHEN {QgsExpression.createFieldEqualityExpression(attr, json_expr[i])} "
+                    keys = tuple(Literal(v) for v in json_expr[i])
                 elif isinstance(json_expr[i], (str, float, int)):
-                    case_str += f"WHEN ({QgsExpression.createFieldEqualityExpression(attr, json_expr[i])}) "
-                case_str += f"THEN {json_expr[i+1]} "
-            case_str += f"ELSE {QgsExpression.quotedValue(json_expr[-1])} END"
-            return case_str
+                    keys = (Literal(json_expr[i]),)
+                else:
+                    continue
+                branches.append((keys, parse_value(json_expr[i + 1], context)))
+            default = parse_value(json_expr[-1], context)
+            if default is None or None in (v for _, v in branches):
+                context.pushWarning(
+                    f"{context.layerId()}: Skipping unsupported expression.")
+                return None
+            return Match(attr, tuple(branches), default)
     elif op == "to-string":
         val = parse_expression(json_expr[1], context)
         if val is None:
             context.pushWarning(
                 f"{context.layerId()}: Skipping unsupported expression.")
             return None
-        return f"to_string({val})"
+        return Function("to_string", (val,))
     elif op == "step":
         return parse_discrete(json_expr, context)
     elif op == "literal":
@@ -1968,7 +2198,7 @@ def parse_expression(json_expr, context):
             lst = [parse_value(v, context) for v in json_expr[1]]
             if None in lst:
                 return None
-            return ", ".join(lst)
+            return Function("array", tuple(lst))
         else:
             field_name, field_is_expression = process_label_field(str(json_expr[1]))
             return field_name
@@ -1978,13 +2208,15 @@ def parse_expression(json_expr, context):
         return parse_case(json_expr, context)
     elif op == "coalesce":
         return parse_coalesce(json_expr, context)
+    elif op == "zoom":
+        return zoom()
     elif op == "to-number":
         val = parse_expression(json_expr[1], context)
         if val is None:
             context.pushWarning(
                 f"{context.layerId()}: Skipping unsupported expression.")
             return None
-        return f"to_real({val})"
+        return Function("to_real", (val,))
     else:
         context.pushWarning(
             f"{context.layerId()}: Skipping unsupported expression.")
@@ -1994,28 +2226,26 @@ def parse_expression(json_expr, context):
 def parse_value(json_value, context):
     if isinstance(json_value, list):
         return parse_expression(json_value, context)
-    elif isinstance(json_value, str):
-        return QgsExpression.quotedValue(json_value)
-    elif isinstance(json_value, (int, float)):
-        return str(json_value)
+    elif isinstance(json_value, (str, int, float)):
+        return Literal(json_value)
     else:
         context.pushWarning(
-            f"{context.layerId}: Skipping unsupported expression part: {json_value}"
+            f"{context.layerId()}: Skipping unsupported expression part: {json_value}"
         )
         return None
 
 
 def parse_key(json_key, context):
     if json_key == "$type" or json_key == "geometry-type":
-        return "_geom_type"
+        return Field(GEOMETRY_TYPE_FIELD)
     elif isinstance(json_key, list):
-        if len(json_key) > 1:
+        if len(json_key) > 1 or json_key[0] == "zoom":
             return parse_expression(json_key, context)
         else:
             return parse_key(json_key[0], context)
     elif isinstance(json_key, int):
-        return json_key
-    return QgsExpression.quotedColumnRef(json_key)
+        return Literal(json_key)
+    return Field(json_key)
 
 
 def parse_field_name_dict(json_obj, context):
@@ -2023,60 +2253,89 @@ def parse_field_name_dict(json_obj, context):
 
     if len(stops) == 0:
         return
-    else:
-        case_str = "CASE "
-        for i in range(len(stops) - 1):
-            bz = stops[i][0]
-            bv = stops[i][1]
-            if isinstance(bv, list):
-                context.pushWarning(
-                    f"{context.layerId()}: Expressions in field name are not supported, skipping."
-                )
-                return QgsExpression()
-            processed_bv, is_expression = process_label_field(bv)
-            tz = stops[i + 1][0]
-            case_str += (
-                f"WHEN @vector_tile_zoom > {bz} AND @vector_tile_zoom <= {tz} "
-                f"THEN {processed_bv} ")
-
-        z = stops[-1][0]
-        v = stops[-1][1]
-        processed_v, is_expression = process_label_field(v)
-        case_str += f"WHEN @vector_tile_zoom > {z} THEN {processed_v} END"
-        return case_str
-
-
-def parse_svg_path(json_icon_image, map_id, context):
-    ICONS_PATH = Path(
-        os.path.dirname(os.path.realpath(__file__)).strip("gl2qgis"),
-        "data",
-        "icons",
-    ).as_posix()
+    field_stops = []
+    for z, v in stops:
+        if isinstance(v, list):
+            context.pushWarning(
+                f"{context.layerId()}: Expressions in field name are not supported, skipping."
+            )
+            return
+        field_stops.append((z, process_label_field(v)[0]))
+    return Step(zoom(), field_stops[0][1], tuple(field_stops[1:]))
+
+
+def shield_icons(map_id):
+    """(directory, file extension) of the highway shield icons of the map"""
+    svg_dir = icons.svg_icons_dir(map_id)
+    if (_options.raster_shields
+            and hasattr(QgsTextBackgroundSettings, "ShapeRaster")):
+        scale = _options.sprite_scale or sprite_scale()
+        raster_dir = icons.raster_icons_dir(
+            svg_dir, icons.SHIELD_HEIGHT * scale)
+        if raster_dir:
+            return raster_dir, ".png"
+    return svg_dir, ".svg"
+
+
+def icon_lookup(path: Function, icons_dir: str, extension: str):
+    """Rewrites concat() of an icon path with one non literal part to a match
+    of that part to the paths of the icon files which exist, NULL for
+    others. Returns path unchanged if it has another form."""
+    parts = path.args
+    variable = [i for i, part in enumerate(parts)
+                if not (isinstance(part, Literal)
+                        and isinstance(part.value, str))]
+    if len(variable) != 1:
+        return path
+    i = variable[0]
+    prefix = "".join(part.value for part in parts[:i])
+    suffix = "".join(part.value for part in parts[i + 1:])
+    branches = []
+    for name in sorted(icons.icon_names(icons_dir, extension)):
+        file_path = f"{icons_dir}/{name}{extension}"
+        if not (file_path.startswith(prefix) and file_path.endswith(suffix)):
+            continue
+        key = file_path[len(prefix):len(file_path) - len(suffix)]
+        if key:
+            branches.append(((Literal(key),), Literal(file_path)))
+    if not branches:
+        return Literal(None)
+    # GL substitutes the value as a string, keys are strings too, so an
+    # integer ref_length matches '1' in mt_match() as well as in CASE
+    return Match(Function("to_string", (parts[i],)), tuple(branches),
+                 Literal(None))
+
+
+def parse_svg_path(json_icon_image, map_id, context, icons_dir=None,
+                   extension=".svg"):
+    if icons_dir is None:
+        icons_dir = icons.svg_icons_dir(map_id)
     if map_id == "openstreetmap":
-        return QgsProperty.fromExpression(
-            f"""'{ICONS_PATH}/{json_icon_image}.svg'""")
-    if map_id == "bright":
-        ICONS_PATH = f"{ICONS_PATH}/bright/"
+        return expression_property(
+            Literal(f"{icons_dir}/{json_icon_image}{extension}"))
     if isinstance(json_icon_image, str):
         image_parts = re.split("{|}", json_icon_image)
-        concat_expr = f"concat('{ICONS_PATH}/', "
+        concat_items = [Literal(f"{icons_dir}/")]
         for p in image_parts:
             if p:
                 if not p.startswith("_") and not p.endswith("_"):
-                    p = f"attribute('{p}')"
-                    concat_expr = f"{concat_expr}{p}, "
+                    concat_items.append(Field(p))
                 else:
-                    concat_expr = f"{concat_expr}'{p}', "
-        concat_expr = f"{concat_expr}'.svg')"
-        return QgsProperty.fromExpression(concat_expr)
+                    concat_items.append(Literal(p))
+        concat_items.append(Literal(extension))
+        return expression_property(icon_lookup(
+            Function("concat", tuple(concat_items)), icons_dir, extension))
     elif isinstance(json_icon_image, list):
         if json_icon_image[0] == "concat":
-            json_icon_image.insert(1, f"{ICONS_PATH}/")
-            json_icon_image.append(".svg")
-            concat_expr = parse_concat(json_icon_image, context)
-            return QgsProperty.fromExpression(concat_expr)
+            path = parse_concat(
+                ["concat", f"{icons_dir}/", *json_icon_image[1:], extension],
+                context)
+            if path is None:
+                return None
+            return expression_property(
+                icon_lookup(path, icons_dir, extension))
     else:
-        context.pushWarning(f"{context.layerId}: Cannot parse svg icon path.")
+        context.pushWarning(f"{context.layerId()}: Cannot parse svg icon path.")
         return
 
 
@@ -2123,24 +2382,11 @@ def parse_background(bg_layer_data: dict):
     return renderer
 
 
-def get_sprites_from_style_json(style_json_data: dict):
+def get_sprites_from_style_json(style_json_data: dict, scale: int = 2):
     from qgis.PyQt.QtGui import QPainter, QImage
     from qgis.PyQt.QtCore import Qt
 
-    sprite = style_json_data.get("sprite")
-    if not sprite:
-        return None, None
-
-    sprite_urls = []
-    if isinstance(sprite, str):
-        sprite_urls = [(None, sprite)]
-    elif isinstance(sprite, list):
-        for item in sprite:
-            if isinstance(item, str):
-                sprite_urls.append((None, item))
-            elif isinstance(item, dict) and "url" in item:
-                sprite_urls.append((item.get("id"), item["url"]))
-
+    sprite_urls = get_sprite_sources(style_json_data)
     if not sprite_urls:
         return None, None
 
@@ -2149,19 +2395,19 @@ def get_sprites_from_style_json(style_json_data: dict):
     json_dicts = []
     ids = []
 
+    store = sprite_store()
     for s_id, s_url in sprite_urls:
-        try:
-            s_json = utils.qgis_request_json(f"{s_url}@2x.json")
-            img_data = utils.qgis_request_data(f"{s_url}@2x.png")
-            img = QImage()
-            img.loadFromData(img_data)
-            if s_json and not img.isNull():
-                json_dicts.append(s_json)
-                images.append(img)
-                ids.append(s_id)
-        except Exception as e:
-            print(f"Failed to fetch or parse sprite {s_url}: {e}")
+        s_json, img_data = store.get(s_url, scale)
+        if not s_json:
             continue
+        img = QImage()
+        img.loadFromData(img_data)
+        if not img.isNull():
+            json_dicts.append(s_json)
+            images.append(img)
+            ids.append(s_id)
+        else:
+            print(f"Failed to parse sprite {s_url}")
 
     if not images:
         return None, None
@@ -2169,25 +2415,34 @@ def get_sprites_from_style_json(style_json_data: dict):
     if len(images) == 1 and not (ids[0] and ids[0] != "default"):
         return json_dicts[0], images[0]
 
-    total_height = sum(img.height() for img in images)
-    max_width = max(img.width() for img in images)
-
-    combined_img = QImage(max_width, total_height, QImage.Format_ARGB32)
-    combined_img.fill(QColor("transparent"))
-
-    painter = QPainter(combined_img)
-    y_offset = 0
-
+    # every icon is copied into a packed atlas, stacking the sheets would
+    # waste the space right of narrow ones
+    entries = []
     for img, s_json, s_id in zip(images, json_dicts, ids):
-        painter.drawImage(0, y_offset, img)
         for key, val in s_json.items():
-            val_copy = dict(val)
-            val_copy["y"] += y_offset
             if not s_id or s_id == "default":
-                combined_json_dict[key] = val_copy
+                entries.append((key, img, val))
             else:
-                combined_json_dict[f"{s_id}:{key}"] = val_copy
-        y_offset += img.height()
+                entries.append((f"{s_id}:{key}", img, val))
+    positions, width, height = pack_rects(
+        [(int(val["width"]), int(val["height"])) for _, _, val in entries])
+    if _report is not None:
+        _report.sprite_atlas_bytes = (
+            max(img.width() for img in images) *
+            sum(img.height() for img in images) * 4,
+            width * height * 4)
+
+    combined_img = QImage(width, height, QImage.Format_ARGB32)
+    combined_img.fill(QColor("transparent"))
+
+    painter = QPainter(combined_img)
+    for (key, img, val), (x, y) in zip(entries, positions):
+        painter.drawImage(x, y, img, int(val["x"]), int(val["y"]),
+                          int(val["width"]), int(val["height"]))
+        val_copy = dict(val)
+        val_copy["x"] = x
+        val_copy["y"] = y
+        combined_json_dict[key] = val_copy
 
     painter.end()
     return combined_json_dict, combined_img
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ gl2qgis library
+
+ Highway shield icons bundled with the plugin.
+                              -------------------
+        begin                : 2026-10-19
+        copyright            : (C) 2026 by MapTiler AG.
+        author               : MapTiler Team
+ ***************************************************************************/
+
+ Shields are label backgrounds picked per feature from the SVGs in
+ data/icons. For faster rendering they can be rasterized once per height
+ into PNGs with the same names, so QGIS draws images instead of parsing and
+ rendering SVG for every shield.
+"""
+
+import hashlib
+import os
+import shutil
+from functools import lru_cache
+from pathlib import Path
+
+from qgis.core import QgsApplication
+
+ICONS_PATH = Path(
+    os.path.dirname(os.path.dirname(os.path.realpath(__file__))),
+    "data",
+    "icons",
+).as_posix()
+# Height in pixels of rasterized shields at sprite scale 1
+SHIELD_HEIGHT = 32
+
+
+def svg_icons_dir(map_id: str) -> str:
+    """Directory of the shield SVGs of a MapTiler map"""
+    if map_id == "bright":
+        return f"{ICONS_PATH}/bright"
+    return ICONS_PATH
+
+
+@lru_cache(maxsize=None)
+def icon_names(icons_dir: str, extension: str) -> frozenset:
+    """Names without extension of the icon files in icons_dir, read once per
+    session"""
+    try:
+        return frozenset(name[:-len(extension)]
+                         for name in os.listdir(icons_dir)
+                         if name.endswith(extension))
+    except OSError:
+        return frozenset()
+
+
+def _cache_dir() -> str:
+    return os.path.join(QgsApplication.qgisSettingsDirPath(),
+                        "maptiler", "icon_rasters")
+
+
+def _svg_files(svg_dir: str) -> list:
+    return sorted(name for name in os.listdir(svg_dir)
+                  if name.endswith(".svg"))
+
+
+def _rasterize(svg_path: str, png_path: str, height: int) -> bool:
+    from qgis.PyQt.QtCore import Qt
+    from qgis.PyQt.QtGui import QImage, QPainter
+    from qgis.PyQt.QtSvg import QSvgRenderer
+
+    renderer = QSvgRenderer(svg_path)
+    size = renderer.defaultSize()
+    if not renderer.isValid() or size.isEmpty():
+        return False
+    width = max(round(size.width() * height / size.height()), 1)
+    image = QImage(width, height, QImage.Format_ARGB32)
+    image.fill(Qt.transparent)
+    painter = QPainter(image)
+    renderer.render(painter)
+    painter.end()
+    return image.save(png_path, "PNG")
+
+
+@lru_cache(maxsize=None)
+def raster_icons_dir(svg_dir: str, height: int, cache_dir: str = None):
+    """Directory with a PNG of the given height for every SVG of svg_dir,
+    named like the SVG. Icons are rasterized on first use and again only
+    when the SVGs change. None if they can not be rasterized. The SVGs are
+    hashed once per session, not for every shield layer. The directories
+    are never removed, label settings of saved projects reference them."""
+    cache_dir = cache_dir or _cache_dir()
+    try:
+        names = _svg_files(svg_dir)
+        digest = hashlib.sha1(str(height).encode("utf-8"))
+        for name in names:
+            digest.update(name.encode("utf-8"))
+            with open(os.path.join(svg_dir, name), "rb") as f:
+                digest.update(f.read())
+        directory = os.path.join(cache_dir, digest.hexdigest())
+        if os.path.isdir(directory):
+            return Path(directory).as_posix()
+
+        temp_dir = f"{directory}.{os.getpid()}.tmp"
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        os.makedirs(temp_dir)
+        for name in names:
+            if not _rasterize(os.path.join(svg_dir, name),
+                              os.path.join(temp_dir, name[:-4] + ".png"),
+                              height):
+                print(f"Failed to rasterize shield {name}")
+        try:
+            # the directory appears complete or not at all
+            os.rename(temp_dir, directory)
+        except OSError:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            if not os.path.isdir(directory):
+                raise
+    except (ImportError, OSError) as e:
+        print(f"Failed to rasterize shields of {svg_dir}: {e}")
+        return None
+    return Path(directory).as_posix()
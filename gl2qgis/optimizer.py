@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ gl2qgis library
+
+ Simplification of converted expressions before they are handed to QGIS.
+                              -------------------
+        begin                : 2026-10-19
+        copyright            : (C) 2026 by MapTiler AG.
+        author               : MapTiler Team
+ ***************************************************************************/
+
+ QGIS evaluates data defined properties and filters for every feature on
+ every render, so everything that can be decided at conversion time is
+ decided here. All rewrites keep the value of the expression unchanged.
+"""
+
+import math
+
+from .expressions import (
+    BinaryOp,
+    Case,
+    Field,
+    Function,
+    InList,
+    Interpolate,
+    Literal,
+    Match,
+    Node,
+    Not,
+    Step,
+)
+
+_ARITHMETIC = {
+    "+": lambda a, b: a + b,
+    "-": lambda a, b: a - b,
+    "*": lambda a, b: a * b,
+    "/": lambda a, b: a / b,
+    "^": lambda a, b: a ** b,
+}
+_COMPARISON = {
+    "=": lambda a, b: a == b,
+    "IS": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    "<>": lambda a, b: a != b,
+    "IS NOT": lambda a, b: a != b,
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+}
+
+
+def is_number(node: Node) -> bool:
+    return (isinstance(node, Literal) and isinstance(node.value, (int, float))
+            and not isinstance(node.value, bool))
+
+
+def is_string(node: Node) -> bool:
+    return isinstance(node, Literal) and isinstance(node.value, str)
+
+
+def is_true(node: Node) -> bool:
+    return isinstance(node, Literal) and node.value is True
+
+
+def is_false(node: Node) -> bool:
+    return isinstance(node, Literal) and node.value is False
+
+
+def _is_value(node: Node, value) -> bool:
+    return is_number(node) and node.value == value
+
+
+def optimize(node: Node) -> Node:
+    """Returns simplified node with the same value as node"""
+    if isinstance(node, Function):
+        return _optimize_function(
+            node.name, tuple(optimize(arg) for arg in node.args))
+    if isinstance(node, BinaryOp):
+        return _optimize_binary(
+            node.op, optimize(node.left), optimize(node.right))
+    if isinstance(node, Not):
+        operand = optimize(node.operand)
+        if isinstance(operand, Literal) and isinstance(operand.value, bool):
+            return Literal(not operand.value)
+        if isinstance(operand, Not):
+            return operand.operand
+        return Not(operand)
+    if isinstance(node, InList):
+        return InList(optimize(node.operand),
+                      tuple(optimize(v) for v in node.values), node.negate)
+    if isinstance(node, Case):
+        return _optimize_case(node)
+    if isinstance(node, Match):
+        return _optimize_match(node)
+    if isinstance(node, Interpolate):
+        return _optimize_interpolate(node)
+    if isinstance(node, Step):
+        return _optimize_step(node)
+    return node
+
+
+def _optimize_binary(op: str, left: Node, right: Node) -> Node:
+    if op == "AND":
+        if is_false(left) or is_false(right):
+            return Literal(False)
+        if is_true(left):
+            return right
+        if is_true(right):
+            return left
+        if left == right:
+            return left
+    elif op == "OR":
+        if is_true(left) or is_true(right):
+            return Literal(True)
+        if is_false(left):
+            return right
+        if is_false(right):
+            return left
+        if left == right:
+            return left
+    elif op in _ARITHMETIC:
+        if is_number(left) and is_number(right):
+            try:
+                value = _ARITHMETIC[op](left.value, right.value)
+            except (ZeroDivisionError, OverflowError):
+                value = None
+            if isinstance(value, (int, float)) and math.isfinite(value):
+                return Literal(value)
+        # identity arithmetic
+        if op in ("*", "/", "^") and _is_value(right, 1):
+            return left
+        if op == "*" and _is_value(left, 1):
+            return right
+        if op in ("+", "-") and _is_value(right, 0):
+            return left
+        if op == "+" and _is_value(left, 0):
+            return right
+    elif op in _COMPARISON:
+        if ((is_number(left) and is_number(right))
+                or (is_string(left) and is_string(right))):
+            return Literal(_COMPARISON[op](left.value, right.value))
+    return BinaryOp(op, left, right)
+
+
+def _optimize_function(name: str, args: tuple) -> Node:
+    lower_name = name.lower()
+    if lower_name == "concat":
+        flat = []
+        for arg in args:
+            if isinstance(arg, Function) and arg.name.lower() == "concat":
+                flat.extend(arg.args)
+            else:
+                flat.append(arg)
+        merged = []
+        for arg in flat:
+            if is_string(arg) and not arg.value:
+                continue
+            if is_string(arg) and merged and is_string(merged[-1]):
+                merged[-1] = Literal(merged[-1].value + arg.value)
+            else:
+                merged.append(arg)
+        if not merged:
+            return Literal("")
+        if len(merged) == 1 and is_string(merged[0]):
+            return merged[0]
+        return Function(name, tuple(merged))
+    if lower_name == "attribute" and len(args) == 1 and is_string(args[0]):
+        # name known now, e.g. from a folded concat()
+        return Field(args[0].value)
+    if lower_name == "scale_linear" and len(args) == 5:
+        if args[3] == args[4]:
+            return args[3]
+    if lower_name == "coalesce":
+        args = tuple(arg for arg in args
+                     if not (isinstance(arg, Literal) and arg.value is None))
+        if not args:
+            return Literal(None)
+        if isinstance(args[0], Literal) or len(args) == 1:
+            return args[0]
+    return Function(name, args)
+
+
+def _optimize_case(node: Case) -> Node:
+    default = optimize(node.default) if node.default is not None else None
+    branches = []
+    for condition, value in node.branches:
+        condition = optimize(condition)
+        if isinstance(condition, Literal) and not condition.value:
+            # FALSE and NULL never match
+            continue
+        value = optimize(value)
+        if is_true(condition):
+            default = value
+            break
+        branches.append((condition, value))
+
+    # trailing branches which return the default anyway
+    fallback = default if default is not None else Literal(None)
+    while branches and branches[-1][1] == fallback:
+        branches.pop()
+
+    if not branches:
+        return fallback
+    return Case(tuple(branches), default)
+
+
+def _optimize_match(node: Match) -> Node:
+    operand = optimize(node.operand)
+    default = optimize(node.default) if node.default is not None else None
+    seen = set()
+    branches = []
+    for keys, value in node.branches:
+        # keys matched by an earlier branch can never match this one
+        keys = tuple(k for k in map(optimize, keys) if k not in seen)
+        seen.update(keys)
+        if not keys:
+            continue
+        value = optimize(value)
+        if branches and branches[-1][1] == value:
+            branches[-1] = (branches[-1][0] + keys, value)
+        else:
+            branches.append((keys, value))
+
+    fallback = default if default is not None else Literal(None)
+    while branches and branches[-1][1] == fallback:
+        branches.pop()
+
+    if not branches:
+        return fallback
+    return Match(operand, tuple(branches), default)
+
+
+def _optimize_interpolate(node: Interpolate) -> Node:
+    stops = [(z, optimize(v)) for z, v in node.stops]
+    # inner stops surrounded by equal values lie on a constant segment
+    stops = [
+        stop for i, stop in enumerate(stops)
+        if not (0 < i < len(stops) - 1
+                and stops[i - 1][1] == stop[1] == stops[i + 1][1])]
+    # values are clamped beyond the first and the last stop
+    while len(stops) > 1 and stops[0][1] == stops[1][1]:
+        stops.pop(0)
+    while len(stops) > 1 and stops[-1][1] == stops[-2][1]:
+        stops.pop()
+    if len(stops) == 1:
+        return stops[0][1]
+    return Interpolate(optimize(node.operand), tuple(stops), node.base)
+
+
+def _optimize_step(node: Step) -> Node:
+    first = optimize(node.first)
+    stops = []
+    previous = first
+    for z, value in node.stops:
+        value = optimize(value)
+        if value != previous:
+            stops.append((z, value))
+            previous = value
+    if not stops:
+        return first
+    return Step(optimize(node.operand), first, tuple(stops))
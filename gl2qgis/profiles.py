@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ gl2qgis library
+
+ Performance profiles trading cartographic detail for render speed.
+                              -------------------
+        begin                : 2026-10-19
+        copyright            : (C) 2026 by MapTiler AG.
+        author               : MapTiler Team
+ ***************************************************************************/
+"""
+
+from fnmatch import fnmatchcase
+
+FULL = "full"
+BALANCED = "balanced"
+FAST = "fast"
+
+# (GL layer type, layer id pattern) of the layers left out, ids are matched
+# in lower case
+HOUSENUMBERS = [("symbol", "*housenumber*")]
+MINOR_ROAD_LABELS = [
+    ("symbol", "*road*minor*label*"),
+    ("symbol", "*road*label*minor*"),
+    ("symbol", "*highway*name*minor*"),
+    ("symbol", "*path*label*"),
+    ("symbol", "*highway*name*path*"),
+]
+POI_ICONS = [("symbol", "*poi*")]
+
+PROFILES = {
+    FULL: {
+        "skipped_layers": [],
+        "halo_blur": True,
+        "fill_patterns": True,
+        "raster_shields": False,
+    },
+    BALANCED: {
+        "skipped_layers": HOUSENUMBERS + MINOR_ROAD_LABELS,
+        "halo_blur": False,
+        "fill_patterns": True,
+        "raster_shields": True,
+    },
+    FAST: {
+        "skipped_layers": HOUSENUMBERS + MINOR_ROAD_LABELS + POI_ICONS,
+        "halo_blur": False,
+        "fill_patterns": False,
+        "raster_shields": True,
+    },
+}
+
+
+def is_skipped(json_layer: dict, skipped_layers: list) -> bool:
+    """True if GL layer matches one of (type, id pattern) in skipped_layers"""
+    layer_type = json_layer.get("type")
+    layer_id = str(json_layer.get("id", "")).lower()
+    return any(
+        layer_type == skipped_type and fnmatchcase(layer_id, pattern)
+        for skipped_type, pattern in skipped_layers)
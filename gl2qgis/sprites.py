@@ -0,0 +1,350 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ gl2qgis library
+
+ Download and cache of GL style sprite sheets.
+                              -------------------
+        begin                : 2026-10-19
+        copyright            : (C) 2026 by MapTiler AG.
+        author               : MapTiler Team
+ ***************************************************************************/
+
+ Sprite sheets are kept by URL and resolution in memory for the session and
+ on disk in the QGIS profile across sessions, so converting several sources
+ of a style, or the same style again, downloads every sheet only once.
+"""
+
+import base64
+import binascii
+import hashlib
+import io
+import json
+import math
+import os
+import re
+import shutil
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from qgis.core import QgsApplication, QgsExpression
+
+# Seconds a sheet cached on disk is used before it is downloaded again
+DISK_CACHE_MAX_AGE = 24 * 60 * 60
+# Sheets kept in memory, the least recently used ones are dropped
+MAX_SHEETS_IN_MEMORY = 8
+# Seconds unused entries of the caches in the QGIS profile are kept, sheets
+# are downloaded again after DISK_CACHE_MAX_AGE anyway. Fill patterns and
+# rasterized shields (icons.py) are never removed, saved projects reference
+# them.
+SHEET_CACHE_MAX_AGE = 7 * 24 * 60 * 60
+ICON_CACHE_MAX_AGE = 30 * 24 * 60 * 60
+# Threads cropping and encoding icons, PIL releases the GIL while encoding
+ICON_WORKERS = min(8, os.cpu_count() or 1)
+# zlib level of extracted icons: PIL default 6, 1 is fast, 0 uncompressed
+PNG_COMPRESS_LEVEL = 6
+# Transparent pixels between icons packed into an atlas
+ATLAS_PADDING = 1
+# Output pixels per CSS pixel from which @2x sprite sheets are used
+HIGH_DPI_RATIO = 1.5
+
+
+def get_sprite_sources(style_json_data: dict) -> list:
+    """(sprite id, sprite url) of every sprite sheet of the style, id is None
+    for the default sheet"""
+    sprite = style_json_data.get("sprite")
+    sprite_urls = []
+    if isinstance(sprite, str):
+        sprite_urls = [(None, sprite)]
+    elif isinstance(sprite, list):
+        for item in sprite:
+            if isinstance(item, str):
+                sprite_urls.append((None, item))
+            elif isinstance(item, dict) and "url" in item:
+                sprite_urls.append((item.get("id"), item["url"]))
+    return sprite_urls
+
+
+def sheet_url(url: str, scale: int, extension: str) -> str:
+    """URL of the .json or .png file of a sprite sheet at scale 1 or 2"""
+    suffix = "@2x" if scale == 2 else ""
+    base, question, query = url.partition("?")
+    return f"{base}{suffix}.{extension}{question}{query}"
+
+
+def sprite_scale(device_pixel_ratio: float = None, dpi: float = None) -> int:
+    """Sprite sheet resolution, 1 or 2, for a device pixel ratio and output
+    DPI. Missing values come from the primary screen, 1 and 96 DPI without
+    one (headless)."""
+    if device_pixel_ratio is None or dpi is None:
+        from qgis.PyQt.QtGui import QGuiApplication
+
+        screen = (QGuiApplication.primaryScreen()
+                  if QGuiApplication.instance() else None)
+        if device_pixel_ratio is None:
+            device_pixel_ratio = screen.devicePixelRatio() if screen else 1
+        if dpi is None:
+            dpi = screen.logicalDotsPerInch() if screen else 96
+    ratio = device_pixel_ratio * dpi / 96
+    return 2 if ratio >= HIGH_DPI_RATIO else 1
+
+
+def _cache_dir(name: str = "sprite_sheets") -> str:
+    return os.path.join(QgsApplication.qgisSettingsDirPath(),
+                        "maptiler", name)
+
+
+def pack_rects(sizes: list, padding: int = ATLAS_PADDING):
+    """Shelf packing of (width, height) rects into a roughly square atlas.
+    Returns ([(x, y)] in the order of sizes, atlas width, atlas height)"""
+    if not sizes:
+        return [], 0, 0
+    area = sum((w + padding) * (h + padding) for w, h in sizes)
+    max_width = max(max(w for w, _ in sizes),
+                    math.ceil(math.sqrt(area)))
+    # tallest first, so rects on a shelf waste little height
+    order = sorted(range(len(sizes)),
+                   key=lambda i: (-sizes[i][1], -sizes[i][0]))
+    positions = [None] * len(sizes)
+    x = y = shelf_height = width = 0
+    for i in order:
+        w, h = sizes[i]
+        if x and x + w > max_width:
+            y += shelf_height
+            x = shelf_height = 0
+        positions[i] = (x, y)
+        width = max(width, x + w)
+        x += w + padding
+        shelf_height = max(shelf_height, h + padding)
+    return positions, width, y + shelf_height - padding
+
+
+class SpriteStore:
+    """Sprite sheets by URL and scale, as (JSON dict, PNG bytes)"""
+
+    def __init__(self, cache_dir: str = None):
+        self.cache_dir = cache_dir
+        self._sheets = OrderedDict()
+
+    def _disk_path(self, url: str, scale: int) -> str:
+        key = hashlib.sha1(f"{scale}:{url}".encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, key)
+
+    def _read_disk(self, url: str, scale: int):
+        if not self.cache_dir:
+            return None
+        path = self._disk_path(url, scale)
+        try:
+            if time.time() - os.path.getmtime(path + ".png") > \
+                    DISK_CACHE_MAX_AGE:
+                return None
+            with open(path + ".json", "r", encoding="utf-8") as f:
+                sheet_json = json.load(f)
+            with open(path + ".png", "rb") as f:
+                return sheet_json, f.read()
+        except (OSError, ValueError):
+            return None
+
+    def _write_disk(self, url: str, scale: int, sheet_json: dict,
+                    png: bytes):
+        if not self.cache_dir:
+            return
+        path = self._disk_path(url, scale)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # the PNG is written last, its age decides whether the pair is used
+            for extension, data in (
+                    ("json", json.dumps(sheet_json).encode("utf-8")),
+                    ("png", png)):
+                temp_path = f"{path}.{extension}.{os.getpid()}.tmp"
+                with open(temp_path, "wb") as f:
+                    f.write(data)
+                os.replace(temp_path, f"{path}.{extension}")
+        except OSError as e:
+            print(f"Failed to cache sprite {url}: {e}")
+
+    def get(self, url: str, scale: int = 1):
+        """Returns (JSON dict, PNG bytes) of a sprite sheet, (None, None) if
+        it can not be fetched"""
+        from .. import net
+
+        key = (url, scale)
+        if key in self._sheets:
+            self._sheets.move_to_end(key)
+        else:
+            sheet = self._read_disk(url, scale)
+            if sheet is None:
+                try:
+                    sheet = (
+                        net.qgis_request_json(sheet_url(url, scale, "json")),
+                        net.qgis_request_data(sheet_url(url, scale, "png")),
+                    )
+                except Exception as e:
+                    print(f"Failed to fetch sprite {url}: {e}")
+                    return None, None
+                if not sheet[0] or not sheet[1]:
+                    return None, None
+                self._write_disk(url, scale, *sheet)
+            self._sheets[key] = sheet
+            while len(self._sheets) > MAX_SHEETS_IN_MEMORY:
+                self._sheets.popitem(last=False)
+        return self._sheets[key]
+
+    def clear(self):
+        self._sheets.clear()
+
+
+_store = None
+
+
+def sprite_store() -> SpriteStore:
+    """Sprite store shared by all conversions of the session"""
+    global _store
+    if _store is None:
+        _store = SpriteStore(_cache_dir())
+        collect_unused(_store.cache_dir, SHEET_CACHE_MAX_AGE)
+    return _store
+
+
+# Extraction of single icons as PNG files
+
+def icon_cache_dir() -> str:
+    return _cache_dir("sprite_icons")
+
+
+def sheet_hash(sheet_json: dict, png: bytes) -> str:
+    """Content hash of a sprite sheet"""
+    digest = hashlib.sha1(png)
+    digest.update(json.dumps(sheet_json, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def write_icons(sheet_json: dict, png: bytes, directory: str,
+                compress_level: int = PNG_COMPRESS_LEVEL, prefix: str = ""):
+    """Writes every icon of a sprite sheet to directory as <prefix><name>.png.
+    Raises ImportError without PIL."""
+    from PIL import Image
+
+    sheet_img = Image.open(io.BytesIO(png))
+    # decoded once here, the threads only read pixels
+    sheet_img.load()
+
+    def write_icon(item):
+        name, value = item
+        left = int(value["x"])
+        top = int(value["y"])
+        right = left + int(value["width"])
+        bottom = top + int(value["height"])
+        sheet_img.crop((left, top, right, bottom)).save(
+            os.path.join(directory, prefix + name + ".png"),
+            compress_level=compress_level)
+
+    with ThreadPoolExecutor(max_workers=ICON_WORKERS) as pool:
+        # list() re-raises errors of the workers
+        list(pool.map(write_icon, sheet_json.items()))
+
+
+def extract_icons(sheet_json: dict, png: bytes, cache_dir: str,
+                  compress_level: int = PNG_COMPRESS_LEVEL) -> str:
+    """Writes every icon of a sprite sheet to <cache_dir>/<sheet hash>/ and
+    returns that directory. Sheets extracted before are not written again.
+    Raises ImportError without PIL."""
+    directory = os.path.join(cache_dir, sheet_hash(sheet_json, png))
+    if os.path.isdir(directory):
+        # marks the directory as used for collect_unused()
+        os.utime(directory)
+        return directory
+
+    os.makedirs(cache_dir, exist_ok=True)
+    temp_dir = f"{directory}.{os.getpid()}.tmp"
+    shutil.rmtree(temp_dir, ignore_errors=True)
+    os.makedirs(temp_dir)
+    try:
+        write_icons(sheet_json, png, temp_dir, compress_level)
+        # the directory appears complete or not at all
+        os.rename(temp_dir, directory)
+    except OSError:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        if not os.path.isdir(directory):
+            raise
+    return directory
+
+
+# cache directories collected in this session
+_collected = set()
+
+
+def collect_unused(cache_dir: str, max_age: float):
+    """Removes files and directories in cache_dir unused (not modified) for
+    max_age seconds, once per session and directory. Only for the caches of
+    the plugin, never for directories of callers."""
+    if cache_dir in _collected:
+        return
+    _collected.add(cache_dir)
+    if not os.path.isdir(cache_dir):
+        return
+    now = time.time()
+    for entry in os.scandir(cache_dir):
+        try:
+            if now - entry.stat(follow_symlinks=False).st_mtime <= max_age:
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                shutil.rmtree(entry.path, ignore_errors=True)
+            else:
+                os.remove(entry.path)
+        except OSError:
+            continue
+
+
+# Fill patterns as shared files instead of base64 data in every symbol
+
+BASE64_PREFIX = "base64:"
+# quoted base64 sprite paths inside expressions
+_BASE64_LITERAL = re.compile(r"'(base64:[A-Za-z0-9+/=]*)'")
+
+# base64 sprite path -> file path, for the session
+_pattern_paths = {}
+
+
+def pattern_cache_dir() -> str:
+    return _cache_dir("sprite_patterns")
+
+
+def pattern_file(sprite_path: str, cache_dir: str = None) -> str:
+    """Path of a PNG file holding the image of a base64: sprite path. Every
+    distinct image is written once, named by its hash, and kept as long as
+    the profile since saved projects reference it. Returns sprite_path
+    itself if it is no base64 path or the file can not be written."""
+    if not sprite_path.startswith(BASE64_PREFIX):
+        return sprite_path
+    if sprite_path in _pattern_paths:
+        return _pattern_paths[sprite_path]
+    cache_dir = cache_dir or pattern_cache_dir()
+    try:
+        png = base64.b64decode(sprite_path[len(BASE64_PREFIX):],
+                               validate=True)
+        if not png:
+            return sprite_path
+        path = os.path.join(
+            cache_dir, hashlib.sha1(png).hexdigest() + ".png")
+        if not os.path.exists(path):
+            os.makedirs(cache_dir, exist_ok=True)
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            with open(temp_path, "wb") as f:
+                f.write(png)
+            os.replace(temp_path, path)
+    except (binascii.Error, OSError) as e:
+        print(f"Failed to cache fill pattern: {e}")
+        return sprite_path
+    _pattern_paths[sprite_path] = path
+    return path
+
+
+def pattern_expression(expression: str, cache_dir: str = None) -> str:
+    """Replaces the base64: sprite paths of a data defined fill-pattern
+    expression (stops, match) with pattern_file() paths"""
+    return _BASE64_LITERAL.sub(
+        lambda m: QgsExpression.quotedString(
+            pattern_file(m.group(1), cache_dir)),
+        expression)
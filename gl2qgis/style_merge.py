@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ gl2qgis library
+
+ Merges converted renderer styles which draw the same symbol.
+                              -------------------
+        begin                : 2026-10-19
+        copyright            : (C) 2026 by MapTiler AG.
+        author               : MapTiler Team
+ ***************************************************************************/
+
+ Only neighbouring styles are merged, so the paint order relative to other
+ styles is kept. Two styles become one when they share source layer,
+ geometry type and symbol, and either have the same zoom levels (filters are
+ OR-ed) or the same filter and touching zoom levels (zoom levels are joined).
+"""
+
+import math
+
+from qgis.core import QgsSymbolLayerUtils, QgsVectorTileBasicRendererStyle
+
+
+def _symbol_key(style: QgsVectorTileBasicRendererStyle) -> str:
+    symbol = style.symbol()
+    return QgsSymbolLayerUtils.symbolProperties(symbol) if symbol else ""
+
+
+def _zoom_interval(style: QgsVectorTileBasicRendererStyle):
+    low = style.minZoomLevel()
+    high = style.maxZoomLevel()
+    return (-math.inf if low == -1 else low, math.inf if high == -1 else high)
+
+
+def _or_filters(a: str, b: str) -> str:
+    if not a or not b:
+        # one of them matches everything
+        return ""
+    return f"({a}) OR ({b})"
+
+
+def _merged(a: QgsVectorTileBasicRendererStyle,
+            b: QgsVectorTileBasicRendererStyle):
+    """Returns style drawing the same as a and b, None if there is none"""
+    zoom_a, zoom_b = _zoom_interval(a), _zoom_interval(b)
+    if zoom_a == zoom_b:
+        merged = QgsVectorTileBasicRendererStyle(a)
+        merged.setFilterExpression(
+            _or_filters(a.filterExpression(), b.filterExpression()))
+        return merged
+    if a.filterExpression() == b.filterExpression():
+        # zoom levels are integers, 3-5 and 6-8 touch
+        if zoom_a[1] + 1 < zoom_b[0] or zoom_b[1] + 1 < zoom_a[0]:
+            return None
+        merged = QgsVectorTileBasicRendererStyle(a)
+        merged.setMinZoomLevel(
+            -1 if -1 in (a.minZoomLevel(), b.minZoomLevel())
+            else min(a.minZoomLevel(), b.minZoomLevel()))
+        merged.setMaxZoomLevel(
+            -1 if -1 in (a.maxZoomLevel(), b.maxZoomLevel())
+            else max(a.maxZoomLevel(), b.maxZoomLevel()))
+        return merged
+    return None
+
+
+def merge_renderer_styles(styles: list):
+    """Returns (merged styles, list of (kept style name, merged style name))"""
+    result = []
+    keys = []
+    merges = []
+    for style in styles:
+        key = (style.layerName(), style.geometryType(), style.isEnabled(),
+               _symbol_key(style))
+        if result and keys[-1] == key:
+            merged = _merged(result[-1], style)
+            if merged is not None:
+                merges.append((result[-1].styleName(), style.styleName()))
+                result[-1] = merged
+                continue
+        result.append(style)
+        keys.append(key)
+    return result, merges
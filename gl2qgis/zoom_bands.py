@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ gl2qgis library
+
+ Splits styles into zoom bands with static property values.
+                              -------------------
+        begin                : 2026-10-19
+        copyright            : (C) 2026 by MapTiler AG.
+        author               : MapTiler Team
+ ***************************************************************************/
+
+ Data defined properties which only depend on @vector_tile_zoom are evaluated
+ once per integer zoom level here, instead of once per feature by QGIS.
+ Consecutive zoom levels with identical values share one style.
+"""
+
+from qgis.core import (
+    QgsExpression,
+    QgsExpressionContext,
+    QgsExpressionContextScope,
+    QgsProperty,
+    QgsPropertyCollection,
+    QgsVectorTileBasicLabelingStyle,
+    QgsVectorTileBasicRendererStyle,
+)
+
+from .expressions import ZOOM_VARIABLE
+
+# Highest zoom level evaluated for styles without max zoom
+MAX_ZOOM_LEVEL = 24
+# Variables an expression may use and still count as zoom only,
+# @element is bound by array_foreach()
+ZOOM_ONLY_VARIABLES = {ZOOM_VARIABLE, "element"}
+
+
+def zoom_only_expression(prop: QgsProperty):
+    """Returns QgsExpression of prop if its value depends on zoom
+    only, None otherwise"""
+    if not prop.isActive() or not prop.expressionString():
+        return None
+    exp = QgsExpression(prop.expressionString())
+    if exp.hasParserError() or exp.referencedColumns():
+        return None
+    if not set(exp.referencedVariables()) <= ZOOM_ONLY_VARIABLES:
+        return None
+    return exp
+
+
+def _zoom_context(zoom_level: int) -> QgsExpressionContext:
+    scope = QgsExpressionContextScope()
+    scope.setVariable(ZOOM_VARIABLE, zoom_level)
+    context = QgsExpressionContext()
+    context.appendScope(scope)
+    return context
+
+
+def _symbol_layers(symbol):
+    """Symbol layers of symbol and its sub symbols"""
+    for symbol_layer in symbol.symbolLayers():
+        yield symbol_layer
+        sub_symbol = symbol_layer.subSymbol()
+        if sub_symbol is not None:
+            yield from _symbol_layers(sub_symbol)
+
+
+def _zoom_bands(expressions: list, min_zoom: int, max_zoom: int):
+    """Evaluates expressions per zoom level, returns list of
+    (min zoom, max zoom, values) with consecutive equal values merged"""
+    first = max(min_zoom, 0)
+    last = max_zoom if max_zoom != -1 else MAX_ZOOM_LEVEL
+    bands = []
+    for zoom_level in range(first, last + 1):
+        context = _zoom_context(zoom_level)
+        values = []
+        for exp in expressions:
+            exp.prepare(context)
+            value = exp.evaluate(context)
+            if exp.hasEvalError():
+                return None
+            values.append(value)
+        if bands and bands[-1][2] == values:
+            bands[-1][1] = zoom_level
+        else:
+            bands.append([zoom_level, zoom_level, values])
+    if not bands:
+        return None
+    # keep the original open ends
+    bands[0][0] = min_zoom
+    bands[-1][1] = max_zoom
+    return bands
+
+
+def _static_properties(properties: QgsPropertyCollection, keys: list,
+                       values: list) -> QgsPropertyCollection:
+    result = QgsPropertyCollection(properties)
+    for key, value in zip(keys, values):
+        result.setProperty(key, QgsProperty.fromValue(value))
+    return result
+
+
+def split_renderer_style(style: QgsVectorTileBasicRendererStyle) -> list:
+    """Returns list of styles replacing style, one per zoom band"""
+    symbol = style.symbol()
+    if symbol is None:
+        return [style]
+    # (symbol layer index, property key) of zoom only properties
+    targets = []
+    expressions = []
+    for index, symbol_layer in enumerate(_symbol_layers(symbol)):
+        properties = symbol_layer.dataDefinedProperties()
+        for key in properties.propertyKeys():
+            exp = zoom_only_expression(properties.property(key))
+            if exp is not None:
+                targets.append((index, key))
+                expressions.append(exp)
+    if not expressions:
+        return [style]
+    bands = _zoom_bands(expressions, style.minZoomLevel(), style.maxZoomLevel())
+    if bands is None:
+        return [style]
+
+    styles = []
+    for min_zoom, max_zoom, values in bands:
+        band_style = QgsVectorTileBasicRendererStyle(style)
+        band_symbol = symbol.clone()
+        symbol_layers = list(_symbol_layers(band_symbol))
+        for index, symbol_layer in enumerate(symbol_layers):
+            keys = [k for i, k in targets if i == index]
+            if not keys:
+                continue
+            layer_values = [v for (i, _), v in zip(targets, values)
+                            if i == index]
+            symbol_layer.setDataDefinedProperties(_static_properties(
+                symbol_layer.dataDefinedProperties(), keys, layer_values))
+        band_style.setSymbol(band_symbol)
+        band_style.setMinZoomLevel(min_zoom)
+        band_style.setMaxZoomLevel(max_zoom)
+        styles.append(band_style)
+    return styles
+
+
+def split_labeling_style(style: QgsVectorTileBasicLabelingStyle) -> list:
+    """Returns list of styles replacing style, one per zoom band"""
+    label_settings = style.labelSettings()
+    properties = label_settings.dataDefinedProperties()
+    keys = []
+    expressions = []
+    for key in properties.propertyKeys():
+        exp = zoom_only_expression(properties.property(key))
+        if exp is not None:
+            keys.append(key)
+            expressions.append(exp)
+    if not expressions:
+        return [style]
+    bands = _zoom_bands(expressions, style.minZoomLevel(), style.maxZoomLevel())
+    if bands is None:
+        return [style]
+
+    styles = []
+    for min_zoom, max_zoom, values in bands:
+        band_style = QgsVectorTileBasicLabelingStyle(style)
+        band_settings = style.labelSettings()
+        band_settings.setDataDefinedProperties(
+            _static_properties(properties, keys, values))
+        band_style.setLabelSettings(band_settings)
+        band_style.setMinZoomLevel(min_zoom)
+        band_style.setMaxZoomLevel(max_zoom)
+        styles.append(band_style)
+    return styles
@@ -31,6 +31,7 @@ from qgis.core import QgsProject, QgsApplication, QgsVectorTileLayer, \
     QgsMapLayer
 
 from .browser_root_collection import DataItemProvider
+from .gl2qgis import expression_functions
 from .geocoder import MapTilerGeocoderToolbar
 
 
@@ -107,6 +108,9 @@ class MapTiler:
         QgsApplication.instance().dataItemProviderRegistry().addProvider(
             self.dip)
 
+        # functions used by converted styles
+        expression_functions.register_functions()
+
         self._activate_copyrights()
 
     def unload(self):
@@ -117,6 +121,8 @@ class MapTiler:
             self.dip)
         self.dip = None
 
+        expression_functions.unregister_functions()
+
         # remove the toolbar
         del self.gc_toolbar
 
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+ Times parsing GL colors through the session caches of gl2qgis against
+ parsing every occurrence with QgsSymbolLayerUtils.parseColor(), for a
+ synthetic palette used many times like in basemap styles. Needs PyQGIS:
+
+     python scripts/benchmark_colors.py [colors parsed] [palette size]
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from qgis.PyQt.QtGui import QColor  # noqa: E402
+from qgis.core import (  # noqa: E402
+    QgsApplication,
+    QgsMapBoxGlStyleConversionContext,
+    QgsSymbolLayerUtils,
+)
+
+from gl2qgis import gl2qgis  # noqa: E402
+
+NAMED = ["white", "black", "red", "gray", "transparent", "lightblue"]
+
+
+def synthetic_palette(size: int) -> list:
+    """GL colors in the notations styles use"""
+    rng = random.Random(0)
+    palette = list(NAMED)
+    while len(palette) < size:
+        r, g, b = (rng.randrange(256) for _ in range(3))
+        h, s, lightness = (rng.randrange(360), rng.randrange(101),
+                           rng.randrange(101))
+        alpha = round(rng.random(), 2)
+        palette.extend([
+            f"#{r:02x}{g:02x}{b:02x}",
+            f"rgb({r}, {g}, {b})",
+            f"rgba({r}, {g}, {b}, {alpha})",
+            f"hsl({h}, {s}%, {lightness}%)",
+            f"hsla({h}, {s}%, {lightness}%, {alpha})",
+        ])
+    return palette[:size]
+
+
+def uncached(colors: list) -> float:
+    start = time.perf_counter()
+    for color in colors:
+        QgsSymbolLayerUtils.parseColor(color)
+        gl2qgis.get_color_as_hsla_components(
+            QgsSymbolLayerUtils.parseColor(color))
+        QgsSymbolLayerUtils.parseColor(color).name(QColor.NameFormat.HexArgb)
+    return time.perf_counter() - start
+
+
+def cached(colors: list, context) -> float:
+    for function in (gl2qgis._parsed_color, gl2qgis._color_hsla,
+                     gl2qgis._color_hex_argb):
+        function.cache_clear()
+    start = time.perf_counter()
+    for color in colors:
+        gl2qgis.parse_color(color, context)
+        gl2qgis.parse_color_hsla(color, context)
+        gl2qgis.parse_color_hex_argb(color, context)
+    return time.perf_counter() - start
+
+
+def main(count: int, palette_size: int):
+    palette = synthetic_palette(palette_size)
+    rng = random.Random(1)
+    colors = [rng.choice(palette) for _ in range(count)]
+    context = QgsMapBoxGlStyleConversionContext()
+    print(f"{count} colors from a palette of {len(palette)}, parsed as "
+          f"QColor, HSLA components and #AARRGGBB")
+    print(f"uncached: {uncached(colors):.3f}s")
+    print(f"cached:   {cached(colors, context):.3f}s "
+          f"({gl2qgis._parsed_color.cache_info()})")
+
+
+if __name__ == "__main__":
+    app = QgsApplication([], False)
+    app.initQgis()
+    try:
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000,
+             int(sys.argv[2]) if len(sys.argv) > 2 else 200)
+    finally:
+        app.exitQgis()
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+ Times QgsExpression evaluation of converted expressions in their plain
+ CASE / IN form against the mt_interp(), mt_match() and mt_in() form used
+ with ConversionOptions(expression_functions=True). Needs PyQGIS:
+
+     python scripts/benchmark_expression_functions.py [features]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from qgis.PyQt.QtCore import QVariant  # noqa: E402
+from qgis.core import (  # noqa: E402
+    QgsApplication,
+    QgsExpression,
+    QgsExpressionContext,
+    QgsExpressionContextScope,
+    QgsFeature,
+    QgsField,
+    QgsFields,
+)
+
+from gl2qgis import expression_functions  # noqa: E402
+from gl2qgis.expressions import (  # noqa: E402
+    Field,
+    InList,
+    Interpolate,
+    Literal,
+    Match,
+    to_expression,
+    zoom,
+)
+from gl2qgis.optimizer import optimize  # noqa: E402
+
+KEYS = 40
+STOPS = 8
+
+
+def synthetic_expressions() -> dict:
+    classes = [f"class_{i}" for i in range(KEYS)]
+    return {
+        "match": Match(Field("class"), tuple(
+            ((Literal(c),), Literal(i)) for i, c in enumerate(classes)),
+            Literal(-1)),
+        "in": InList(Field("class"), tuple(map(Literal, classes[::2]))),
+        "interpolate": Interpolate(zoom(), tuple(
+            (z * 2, Literal(z * 1.5)) for z in range(STOPS)), 1.2),
+    }
+
+
+def time_expression(text: str, features: list) -> float:
+    expression = QgsExpression(text)
+    if expression.hasParserError():
+        raise ValueError(expression.parserErrorString())
+    context = QgsExpressionContext()
+    scope = QgsExpressionContextScope()
+    context.appendScope(scope)
+    expression.prepare(context)
+    start = time.perf_counter()
+    for feature, zoom_level in features:
+        scope.setVariable("vector_tile_zoom", zoom_level)
+        context.setFeature(feature)
+        expression.evaluate(context)
+    return time.perf_counter() - start
+
+
+def main(count: int):
+    fields = QgsFields()
+    fields.append(QgsField("class", QVariant.String))
+    features = []
+    for i in range(count):
+        feature = QgsFeature(fields)
+        # some values are in no table
+        feature.setAttribute("class", f"class_{i % (KEYS + 10)}")
+        features.append((feature, (i % 150) / 10))
+
+    print(f"{'expression':<12} {'CASE / IN':>10} {'functions':>10}")
+    for name, node in synthetic_expressions().items():
+        node = optimize(node)
+        plain = to_expression(node)
+        functions = to_expression(
+            expression_functions.use_expression_functions(node, 8))
+        print(f"{name:<12} {time_expression(plain, features):>9.3f}s "
+              f"{time_expression(functions, features):>9.3f}s")
+
+
+if __name__ == "__main__":
+    app = QgsApplication([], False)
+    app.initQgis()
+    expression_functions.register_functions()
+    try:
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
+    finally:
+        expression_functions.unregister_functions()
+        app.exitQgis()
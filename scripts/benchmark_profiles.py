@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""
+ Converts one synthetic style with the full, balanced and fast performance
+ profiles and times drawing it: the renderer styles with the draw() loop of
+ benchmark_zoom_bands.py, the labels with map renders of memory layers as in
+ benchmark_shields.py. The style has the layers the profiles act on:
+ housenumbers, minor road and POI labels, blurred halos and highway shields.
+ Needs PyQGIS:
+
+     python scripts/benchmark_profiles.py [features per source layer]
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from qgis.core import (  # noqa: E402
+    QgsApplication,
+    QgsFeature,
+    QgsGeometry,
+    QgsMapBoxGlStyleConversionContext,
+    QgsNullSymbolRenderer,
+    QgsPointXY,
+    QgsUnitTypes,
+    QgsVectorLayer,
+    QgsVectorLayerSimpleLabeling,
+)
+
+from gl2qgis import profiles  # noqa: E402
+from gl2qgis.gl2qgis import ConversionOptions, parse_layers  # noqa: E402
+
+from benchmark_shields import render  # noqa: E402
+from benchmark_zoom_bands import SIZE, draw  # noqa: E402
+
+RENDERS = 3
+SOURCE_LAYERS = {
+    "transportation": "LineString?field=class:string&field=name:string"
+                      "&field=ref:string&field=ref_length:integer"
+                      "&field=network:string",
+    "landuse": "Polygon?field=class:string",
+    "housenumber": "Point?field=housenumber:string",
+    "poi": "Point?field=class:string&field=name:string",
+}
+ROAD_CLASSES = ("motorway", "primary", "minor", "path")
+
+
+def _label_layer(layer_id: str, source_layer: str, filter_expr, text_field,
+                 **layout) -> dict:
+    json_layer = {
+        "id": layer_id,
+        "type": "symbol",
+        "source": "synthetic",
+        "source-layer": source_layer,
+        "layout": {
+            "text-field": text_field,
+            "text-font": ["Noto Sans Regular"],
+            "text-size": 11,
+            **layout,
+        },
+        "paint": {
+            "text-color": "#333333",
+            "text-halo-color": "#ffffff",
+            "text-halo-width": 1.5,
+            "text-halo-blur": 1,
+        },
+    }
+    if filter_expr:
+        json_layer["filter"] = filter_expr
+    return json_layer
+
+
+def synthetic_style() -> dict:
+    return {
+        "version": 8,
+        "id": "streets",
+        "sources": {"synthetic": {"type": "vector"}},
+        "layers": [
+            {"id": "landuse", "type": "fill", "source": "synthetic",
+             "source-layer": "landuse",
+             "paint": {"fill-color": ["match", ["get", "class"],
+                                      "park", "#d8e8c8", "#e6e0d4"]}},
+            {"id": "road_minor", "type": "line", "source": "synthetic",
+             "source-layer": "transportation",
+             "filter": ["in", "class", "minor", "path"],
+             "paint": {"line-color": "#ffffff",
+                       "line-width": ["interpolate", ["linear"], ["zoom"],
+                                      10, 0.5, 18, 6]}},
+            {"id": "road_major", "type": "line", "source": "synthetic",
+             "source-layer": "transportation",
+             "filter": ["in", "class", "motorway", "primary"],
+             "paint": {"line-color": "#f2c48c",
+                       "line-width": ["interpolate", ["linear"], ["zoom"],
+                                      5, 1, 18, 14]}},
+            _label_layer("road_label_major", "transportation",
+                         ["in", "class", "motorway", "primary"], "{name}",
+                         **{"symbol-placement": "line"}),
+            _label_layer("road_minor_label", "transportation",
+                         ["in", "class", "minor", "path"], "{name}",
+                         **{"symbol-placement": "line"}),
+            _label_layer("highway-shield-us-interstate", "transportation",
+                         ["==", "class", "motorway"], "{ref}",
+                         **{"icon-image": "us-interstate_{ref_length}",
+                            "symbol-placement": "line",
+                            "text-rotation-alignment": "viewport"}),
+            _label_layer("housenumber", "housenumber", None,
+                         "{housenumber}"),
+            _label_layer("poi_label", "poi", None, "{name}"),
+        ],
+    }
+
+
+def synthetic_layer(source_layer: str, count: int) -> QgsVectorLayer:
+    """Memory layer of a source layer with features on a grid"""
+    layer = QgsVectorLayer(SOURCE_LAYERS[source_layer], source_layer,
+                           "memory")
+    columns = max(int(count ** 0.5), 1)
+    step = SIZE / columns
+    features = []
+    for i in range(count):
+        x = (i % columns) * step
+        y = (i // columns) * step
+        feature = QgsFeature(layer.fields())
+        if source_layer == "transportation":
+            road_class = ROAD_CLASSES[i % len(ROAD_CLASSES)]
+            ref = str(1 + i % 99)
+            feature.setAttributes([road_class, f"{road_class} {i}", ref,
+                                   len(ref), "us-interstate"])
+            feature.setGeometry(QgsGeometry.fromPolylineXY([
+                QgsPointXY(x, y), QgsPointXY(x + step * 2, y + step / 3),
+                QgsPointXY(x + step * 4, y)]))
+        elif source_layer == "landuse":
+            feature.setAttributes([("park", "residential")[i % 2]])
+            feature.setGeometry(QgsGeometry.fromPolygonXY([[
+                QgsPointXY(x, y), QgsPointXY(x + step, y),
+                QgsPointXY(x + step, y + step), QgsPointXY(x, y + step),
+                QgsPointXY(x, y)]]))
+        elif source_layer == "housenumber":
+            feature.setAttributes([str(i % 200)])
+            feature.setGeometry(QgsGeometry.fromPointXY(QgsPointXY(x, y)))
+        else:
+            feature.setAttributes(["shop", f"Shop {i}"])
+            feature.setGeometry(QgsGeometry.fromPointXY(QgsPointXY(x, y)))
+        features.append(feature)
+    layer.dataProvider().addFeatures(features)
+    layer.updateExtents()
+    return layer
+
+
+def convert(profile: str):
+    context = QgsMapBoxGlStyleConversionContext()
+    context.setTargetUnit(QgsUnitTypes.RenderMillimeters)
+    context.setPixelSizeConversionFactor(0.264583)  # 25.4 / 96.0
+    renderer, labeling, _ = parse_layers(
+        "synthetic", synthetic_style(), context,
+        options=ConversionOptions(profile=profile, sprite_scale=1))
+    return renderer.styles(), labeling.styles()
+
+
+def main(count: int):
+    layers = {name: synthetic_layer(name, count) for name in SOURCE_LAYERS}
+    features = {name: (layer.fields(), list(layer.getFeatures()))
+                for name, layer in layers.items()}
+    print(f"{'profile':<10} {'styles':>6} {'labels':>6} {'symbols':>9} "
+          f"{'first labels':>12} {'later labels':>12}")
+    for profile in profiles.PROFILES:
+        renderer_styles, labeling_styles = convert(profile)
+        label_layers = []
+        for style in labeling_styles:
+            # one layer per style, filtered like in a vector tile layer
+            layer = synthetic_layer(style.layerName(), count)
+            layer.setSubsetString(style.filterExpression())
+            layer.setRenderer(QgsNullSymbolRenderer())
+            layer.setLabeling(QgsVectorLayerSimpleLabeling(
+                style.labelSettings()))
+            layer.setLabelsEnabled(True)
+            label_layers.append(layer)
+        symbols = draw(renderer_styles, features)
+        first, later = (render(label_layers, RENDERS) if label_layers
+                        else (0, 0))
+        print(f"{profile:<10} {len(renderer_styles):>6} "
+              f"{len(labeling_styles):>6} {symbols:>8.3f}s "
+              f"{first:>11.3f}s {later:>11.3f}s")
+
+
+if __name__ == "__main__":
+    app = QgsApplication([], False)
+    app.initQgis()
+    try:
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
+    finally:
+        app.exitQgis()
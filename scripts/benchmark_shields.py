@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+ Times drawing labelled synthetic highways with the highway shield
+ backgrounds converted as SVGs and as PNGs rasterized once
+ (ConversionOptions.raster_shields). Labels are drawn by the QGIS labeling
+ engine through a map render job of a memory layer. The first render and
+ the later ones are reported apart, as QGIS caches drawn SVGs and images.
+ Needs PyQGIS:
+
+     python scripts/benchmark_shields.py [highways] [renders]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from qgis.PyQt.QtCore import QSize  # noqa: E402
+from qgis.core import (  # noqa: E402
+    QgsApplication,
+    QgsExpressionContext,
+    QgsExpressionContextScope,
+    QgsFeature,
+    QgsGeometry,
+    QgsMapBoxGlStyleConversionContext,
+    QgsMapRendererSequentialJob,
+    QgsMapSettings,
+    QgsNullSymbolRenderer,
+    QgsPointXY,
+    QgsUnitTypes,
+    QgsVectorLayer,
+    QgsVectorLayerSimpleLabeling,
+)
+
+from gl2qgis.gl2qgis import ConversionOptions, parse_layers  # noqa: E402
+
+SIZE = 1024
+ZOOM = 12
+NETWORKS = ("us-interstate", "us-highway", "us-state")
+
+
+def synthetic_style() -> dict:
+    """Shield labels of three highway networks, like MapTiler Streets"""
+    layers = []
+    for network in NETWORKS:
+        layers.append({
+            "id": f"highway-shield-{network}",
+            "type": "symbol",
+            "source": "synthetic",
+            "source-layer": "transportation_name",
+            "filter": ["==", ["get", "network"], network],
+            "layout": {
+                "icon-image": f"{network}_{{ref_length}}",
+                "symbol-placement": "line",
+                "symbol-spacing": 200,
+                "text-field": "{ref}",
+                "text-font": ["Noto Sans Regular"],
+                "text-rotation-alignment": "viewport",
+                "text-size": 10,
+            },
+            "paint": {"text-color": "#ffffff"},
+        })
+    return {
+        "version": 8,
+        "id": "streets",
+        "sources": {"synthetic": {"type": "vector"}},
+        "layers": layers,
+    }
+
+
+def synthetic_layer(count: int) -> QgsVectorLayer:
+    """Memory layer of highways on a grid, all networks and ref lengths"""
+    layer = QgsVectorLayer(
+        "LineString?field=ref:string&field=ref_length:integer"
+        "&field=network:string", "highways", "memory")
+    features = []
+    columns = max(int(count ** 0.5), 1)
+    for i in range(count):
+        x = (i % columns) * SIZE / columns
+        y = (i // columns) * SIZE / columns
+        ref = str(1 + i * 7 % 10 ** (1 + i % 3))
+        feature = QgsFeature(layer.fields())
+        feature.setAttributes([ref, len(ref), NETWORKS[i % len(NETWORKS)]])
+        feature.setGeometry(QgsGeometry.fromPolylineXY([
+            QgsPointXY(x, y), QgsPointXY(x + 60, y + 20),
+            QgsPointXY(x + 120, y + 10)]))
+        features.append(feature)
+    layer.dataProvider().addFeatures(features)
+    layer.updateExtents()
+    layer.setRenderer(QgsNullSymbolRenderer())
+    return layer
+
+
+def label_styles(raster_shields: bool) -> list:
+    """(filter expression, label settings) of the converted styles"""
+    context = QgsMapBoxGlStyleConversionContext()
+    context.setTargetUnit(QgsUnitTypes.RenderMillimeters)
+    context.setPixelSizeConversionFactor(0.264583)  # 25.4 / 96.0
+    options = ConversionOptions(sprite_scale=1)
+    options.raster_shields = raster_shields
+    _, labeling, _ = parse_layers("synthetic", synthetic_style(), context,
+                                  options=options)
+    return [(style.filterExpression(), style.labelSettings())
+            for style in labeling.styles()]
+
+
+def render(layers: list, renders: int) -> tuple:
+    """Seconds of the first and the mean of the later renders"""
+    settings = QgsMapSettings()
+    settings.setLayers(layers)
+    settings.setOutputSize(QSize(SIZE, SIZE))
+    settings.setExtent(layers[0].extent().buffered(50))
+    expression_context = QgsExpressionContext()
+    scope = QgsExpressionContextScope()
+    scope.setVariable("vector_tile_zoom", ZOOM)
+    expression_context.appendScope(scope)
+    settings.setExpressionContext(expression_context)
+
+    seconds = []
+    for _ in range(renders):
+        job = QgsMapRendererSequentialJob(settings)
+        start = time.perf_counter()
+        job.start()
+        job.waitForFinished()
+        seconds.append(time.perf_counter() - start)
+    later = seconds[1:] or seconds
+    return seconds[0], sum(later) / len(later)
+
+
+def main(count: int, renders: int):
+    print(f"{'shields':<8} {'first render':>12} {'later renders':>14}")
+    for raster_shields in (False, True):
+        layers = []
+        for filter_expression, settings in label_styles(raster_shields):
+            # one layer per style, filtered like in a vector tile layer
+            layer = synthetic_layer(count)
+            layer.setSubsetString(filter_expression)
+            layer.setLabeling(QgsVectorLayerSimpleLabeling(settings))
+            layer.setLabelsEnabled(True)
+            layers.append(layer)
+        first, later = render(layers, renders)
+        name = "PNG" if raster_shields else "SVG"
+        print(f"{name:<8} {first:>11.3f}s {later:>13.3f}s")
+
+
+if __name__ == "__main__":
+    app = QgsApplication([], False)
+    app.initQgis()
+    try:
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000,
+             int(sys.argv[2]) if len(sys.argv) > 2 else 5)
+    finally:
+        app.exitQgis()
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+ Times slicing synthetic sprite sheets into icon PNGs with one thread and
+ with sprites.ICON_WORKERS threads, at several PNG compress levels, and
+ the reuse of a sheet already extracted to the icon cache. Needs PyQGIS and
+ Pillow:
+
+     python scripts/benchmark_sprite_slicing.py [icons per sheet] [sheets]
+"""
+
+import io
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image  # noqa: E402
+
+from gl2qgis import sprites  # noqa: E402
+
+ICON_SIZE = 32
+COMPRESS_LEVELS = (1, sprites.PNG_COMPRESS_LEVEL, 9)
+
+
+def synthetic_sheet(icons: int, seed: int) -> tuple:
+    """(sprite JSON, PNG bytes) of a sheet with icons in a grid"""
+    rng = random.Random(seed)
+    columns = max(int(icons ** 0.5), 1)
+    rows = -(-icons // columns)
+    sheet = Image.new("RGBA", (columns * ICON_SIZE, rows * ICON_SIZE))
+    sheet_json = {}
+    for i in range(icons):
+        x = (i % columns) * ICON_SIZE
+        y = (i // columns) * ICON_SIZE
+        color = tuple(rng.randrange(256) for _ in range(3)) + (255,)
+        icon = Image.new("RGBA", (ICON_SIZE, ICON_SIZE), color)
+        # some detail, so icons do not compress to nothing
+        for _ in range(40):
+            icon.putpixel((rng.randrange(ICON_SIZE), rng.randrange(ICON_SIZE)),
+                          (255, 255, 255, rng.randrange(256)))
+        sheet.paste(icon, (x, y))
+        sheet_json[f"icon_{seed}_{i}"] = {
+            "x": x, "y": y, "width": ICON_SIZE, "height": ICON_SIZE,
+            "pixelRatio": 1,
+        }
+    png = io.BytesIO()
+    sheet.save(png, "PNG")
+    return sheet_json, png.getvalue()
+
+
+def time_write(sheets: list, workers: int, compress_level: int) -> float:
+    sprites.ICON_WORKERS = workers
+    directory = tempfile.mkdtemp()
+    try:
+        start = time.perf_counter()
+        for sheet_json, png in sheets:
+            sprites.write_icons(sheet_json, png, directory, compress_level)
+        return time.perf_counter() - start
+    finally:
+        shutil.rmtree(directory)
+
+
+def time_extract(sheets: list) -> tuple:
+    """Seconds of the first and of a repeated extract_icons() of sheets"""
+    cache_dir = tempfile.mkdtemp()
+    try:
+        seconds = []
+        for _ in range(2):
+            start = time.perf_counter()
+            for sheet_json, png in sheets:
+                sprites.extract_icons(sheet_json, png, cache_dir)
+            seconds.append(time.perf_counter() - start)
+        return tuple(seconds)
+    finally:
+        shutil.rmtree(cache_dir)
+
+
+def main(icons: int, sheet_count: int):
+    threads = sprites.ICON_WORKERS
+    for label, sheets in (
+            ("single sheet", [synthetic_sheet(icons, 0)]),
+            (f"{sheet_count} sheets", [synthetic_sheet(icons, seed)
+                                       for seed in range(sheet_count)])):
+        print(f"{label}, {icons} icons per sheet")
+        print(f"{'compress level':<16} {'1 thread':>9} "
+              f"{f'{threads} workers':>10}")
+        for level in COMPRESS_LEVELS:
+            serial = time_write(sheets, 1, level)
+            threaded = time_write(sheets, threads, level)
+            print(f"{level:<16} {serial:>8.3f}s {threaded:>9.3f}s")
+        sprites.ICON_WORKERS = threads
+        first, cached = time_extract(sheets)
+        print(f"extract_icons: {first:.3f}s, cached {cached:.3f}s\n")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 400,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 4)
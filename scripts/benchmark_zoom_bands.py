@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+ Times drawing a synthetic vector tile layer with the styles converted
+ without and with ConversionOptions(zoom_bands=True). Features are drawn
+ style by style like QgsVectorTileBasicRenderer does, with the filter and
+ the data defined properties of every style evaluated per feature. Needs
+ PyQGIS:
+
+     python scripts/benchmark_zoom_bands.py [features]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from qgis.PyQt.QtCore import QVariant  # noqa: E402
+from qgis.PyQt.QtGui import QImage, QPainter  # noqa: E402
+from qgis.core import (  # noqa: E402
+    QgsApplication,
+    QgsExpression,
+    QgsExpressionContextScope,
+    QgsFeature,
+    QgsField,
+    QgsFields,
+    QgsGeometry,
+    QgsMapBoxGlStyleConversionContext,
+    QgsMapToPixel,
+    QgsPointXY,
+    QgsRenderContext,
+    QgsUnitTypes,
+)
+
+from gl2qgis.gl2qgis import ConversionOptions, parse_layers  # noqa: E402
+
+SIZE = 512
+ZOOMS = range(4, 19)
+CLASSES = ["motorway", "trunk", "primary", "secondary", "tertiary", "minor"]
+
+
+def synthetic_style() -> dict:
+    """Roads and landuse with widths, colors and opacities by zoom"""
+    layers = []
+    for i, road_class in enumerate(CLASSES):
+        width = 4 - i * 0.5
+        layers.append({
+            "id": f"road_{road_class}",
+            "type": "line",
+            "source": "synthetic",
+            "source-layer": "transportation",
+            "filter": ["==", ["get", "class"], road_class],
+            "paint": {
+                "line-color": ["interpolate", ["linear"], ["zoom"],
+                               5, "#f2c48c", 12, "#e8a04c", 16, "#d9822b"],
+                "line-width": ["interpolate", ["exponential", 1.2], ["zoom"],
+                               5, width * 0.2, 10, width, 14, width * 3,
+                               18, width * 12],
+                "line-opacity": ["step", ["zoom"], 0.6, 8, 0.8, 12, 1],
+            },
+        })
+    layers.append({
+        "id": "landuse",
+        "type": "fill",
+        "source": "synthetic",
+        "source-layer": "landuse",
+        "paint": {
+            "fill-color": ["match", ["get", "class"],
+                           "park", "#d8e8c8", "residential", "#e6e0d4",
+                           "#eeeeee"],
+            "fill-opacity": ["interpolate", ["linear"], ["zoom"],
+                             6, 0.2, 12, 0.6, 16, 0.9],
+        },
+    })
+    return {
+        "version": 8,
+        "sources": {"synthetic": {"type": "vector"}},
+        "layers": layers,
+    }
+
+
+def synthetic_features(count: int) -> dict:
+    """Source layer name -> features spread over the image"""
+    fields = QgsFields()
+    fields.append(QgsField("class", QVariant.String))
+    lines = []
+    polygons = []
+    for i in range(count):
+        x = (i * 37) % SIZE
+        y = (i * 91) % SIZE
+        feature = QgsFeature(fields)
+        if i % 4:
+            feature.setAttribute("class", CLASSES[i % len(CLASSES)])
+            feature.setGeometry(QgsGeometry.fromPolylineXY([
+                QgsPointXY(x, y), QgsPointXY(x + 40, y + 15),
+                QgsPointXY(x + 60, y + 50)]))
+            lines.append(feature)
+        else:
+            feature.setAttribute("class", ("park", "residential", "farm")[
+                i % 3])
+            feature.setGeometry(QgsGeometry.fromPolygonXY([[
+                QgsPointXY(x, y), QgsPointXY(x + 30, y),
+                QgsPointXY(x + 30, y + 30), QgsPointXY(x, y + 30),
+                QgsPointXY(x, y)]]))
+            polygons.append(feature)
+    return {"transportation": (fields, lines), "landuse": (fields, polygons)}
+
+
+def convert(zoom_bands: bool) -> list:
+    context = QgsMapBoxGlStyleConversionContext()
+    context.setTargetUnit(QgsUnitTypes.RenderMillimeters)
+    context.setPixelSizeConversionFactor(0.264583)  # 25.4 / 96.0
+    renderer, _, _ = parse_layers(
+        "synthetic", synthetic_style(), context,
+        options=ConversionOptions(zoom_bands=zoom_bands))
+    return renderer.styles()
+
+
+def draw(styles: list, features: dict) -> float:
+    image = QImage(SIZE, SIZE, QImage.Format_ARGB32_Premultiplied)
+    painter = QPainter(image)
+    context = QgsRenderContext.fromQPainter(painter)
+    context.setMapToPixel(
+        QgsMapToPixel(1, SIZE / 2, SIZE / 2, SIZE, SIZE, 0))
+    expression_context = context.expressionContext()
+    scope = QgsExpressionContextScope()
+    expression_context.appendScope(scope)
+
+    start = time.perf_counter()
+    for zoom_level in ZOOMS:
+        scope.setVariable("vector_tile_zoom", zoom_level)
+        for style in styles:
+            if not style.isActive(zoom_level) or style.symbol() is None:
+                continue
+            fields, layer_features = features[style.layerName()]
+            expression_context.setFields(fields)
+            filter_expression = None
+            if style.filterExpression():
+                filter_expression = QgsExpression(style.filterExpression())
+                filter_expression.prepare(expression_context)
+            symbol = style.symbol()
+            symbol.startRender(context, fields)
+            for feature in layer_features:
+                if style.geometryType() != feature.geometry().type():
+                    continue
+                expression_context.setFeature(feature)
+                if filter_expression is not None and not (
+                        filter_expression.evaluate(expression_context)):
+                    continue
+                symbol.renderFeature(feature, context)
+            symbol.stopRender(context)
+    seconds = time.perf_counter() - start
+    painter.end()
+    return seconds
+
+
+def main(count: int):
+    features = synthetic_features(count)
+    print(f"{'zoom bands':<12} {'styles':>6} {'seconds':>9}")
+    for zoom_bands in (False, True):
+        styles = convert(zoom_bands)
+        print(f"{str(zoom_bands):<12} {len(styles):>6} "
+              f"{draw(styles, features):>8.3f}s")
+
+
+if __name__ == "__main__":
+    app = QgsApplication([], False)
+    app.initQgis()
+    try:
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
+    finally:
+        app.exitQgis()
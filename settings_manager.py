@@ -17,6 +17,7 @@ class SettingsManager:
             ],
             'prefervector': '1',
             'custommaps': {},
+            'profiles': {},
             'auth_cfg_id': ''
         }
         self.load_settings()
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+"""
+ The tests import gl2qgis as a top level package. Without PyQGIS a minimal
+ stand-in of qgis is installed, see qgis_stub.py; tests evaluating
+ expressions with QGIS itself are then skipped.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+try:
+    import qgis.core  # noqa: F401
+    REAL_QGIS = True
+except ImportError:
+    import qgis_stub
+
+    qgis_stub.install()
+    REAL_QGIS = False
+
+
+class Context:
+    """Records warnings like QgsMapBoxGlStyleConversionContext"""
+
+    def __init__(self):
+        self.warnings = []
+
+    def layerId(self):
+        return "test"
+
+    def pushWarning(self, warning):
+        self.warnings.append(warning)
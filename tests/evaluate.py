@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+ Evaluates expression nodes of gl2qgis.expressions in Python, following the
+ QGIS rules for NULL: arithmetic and comparisons with NULL are NULL, AND and
+ OR are three-valued, concat() skips NULL. Only the functions the converter
+ emits are known. Match, Interpolate and Step are evaluated through lower(),
+ i.e. as the CASE expressions QGIS gets.
+"""
+
+import math
+
+from gl2qgis.expressions import (
+    BinaryOp,
+    Case,
+    Field,
+    Function,
+    InList,
+    Interpolate,
+    Literal,
+    Match,
+    Not,
+    Step,
+    Variable,
+    ZOOM_VARIABLE,
+    lower,
+)
+
+
+def _to_string(value) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _truth(value):
+    if value is None:
+        return None
+    return bool(value)
+
+
+def _scale_linear(value, domain_min, domain_max, range_min, range_max):
+    if value is None:
+        return None
+    value = min(max(value, domain_min), domain_max)
+    return range_min + (range_max - range_min) * (
+        (value - domain_min) / (domain_max - domain_min))
+
+
+_FUNCTIONS = {
+    "abs": lambda value: None if value is None else abs(value),
+    "array": lambda *values: list(values),
+    "array_get": lambda array, index: (
+        array[index] if array is not None and -len(array) <= index < len(array)
+        else None),
+    "coalesce": lambda *values: next(
+        (v for v in values if v is not None), None),
+    "concat": lambda *values: "".join(
+        _to_string(v) for v in values if v is not None),
+    "if": lambda condition, then, otherwise: (
+        then if _truth(condition) else otherwise),
+    "scale_linear": _scale_linear,
+    "to_string": lambda value: None if value is None else _to_string(value),
+}
+
+_ARITHMETIC = {
+    "+": lambda a, b: a + b,
+    "-": lambda a, b: a - b,
+    "*": lambda a, b: a * b,
+    "/": lambda a, b: a / b if b else None,
+    "^": lambda a, b: a ** b,
+    "||": lambda a, b: _to_string(a) + _to_string(b),
+}
+_COMPARISON = {
+    "=": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    "<>": lambda a, b: a != b,
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+}
+
+
+def evaluate(node, feature: dict, zoom: float):
+    """Value of node for a feature (field name -> value) at a zoom level"""
+    def e(child):
+        return evaluate(child, feature, zoom)
+
+    if isinstance(node, Literal):
+        return node.value
+    if isinstance(node, Field):
+        return feature.get(node.name)
+    if isinstance(node, Variable):
+        if node.name != ZOOM_VARIABLE:
+            raise NotImplementedError(f"@{node.name}")
+        return zoom
+    if isinstance(node, (Match, Interpolate, Step)):
+        return e(lower(node))
+    if isinstance(node, Function):
+        args = [e(arg) for arg in node.args]
+        name = node.name.lower()
+        if name == "attribute":
+            return feature.get(args[0])
+        if name not in _FUNCTIONS:
+            raise NotImplementedError(f"{node.name}()")
+        return _FUNCTIONS[name](*args)
+    if isinstance(node, Not):
+        value = _truth(e(node.operand))
+        return None if value is None else not value
+    if isinstance(node, BinaryOp):
+        return _evaluate_binary(node.op, e(node.left), e(node.right))
+    if isinstance(node, InList):
+        value = e(node.operand)
+        if value is None:
+            return None
+        found = value in [e(v) for v in node.values]
+        return found != node.negate
+    if isinstance(node, Case):
+        for condition, value in node.branches:
+            if _truth(e(condition)):
+                return e(value)
+        return e(node.default) if node.default is not None else None
+    raise NotImplementedError(type(node).__name__)
+
+
+def _evaluate_binary(op: str, left, right):
+    if op == "AND":
+        left, right = _truth(left), _truth(right)
+        if left is False or right is False:
+            return False
+        return None if left is None or right is None else True
+    if op == "OR":
+        left, right = _truth(left), _truth(right)
+        if left or right:
+            return True
+        return None if left is None or right is None else False
+    if op == "IS":
+        return left == right
+    if op == "IS NOT":
+        return left != right
+    if left is None or right is None:
+        return None
+    if op in _ARITHMETIC:
+        try:
+            return _ARITHMETIC[op](left, right)
+        except OverflowError:
+            return None
+    return _COMPARISON[op](left, right)
+
+
+def same_value(a, b) -> bool:
+    if isinstance(a, float) or isinstance(b, float):
+        if a is None or b is None or isinstance(a, str) or isinstance(b, str):
+            return False
+        return math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-9)
+    return a == b
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+ Minimal stand-in for the qgis package, installed by conftest.py when PyQGIS
+ is not importable. It is just enough to import the gl2qgis modules and to
+ build expression strings: QgsExpression quotes values and column names like
+ QGIS does, every other class is an inert placeholder.
+"""
+
+import sys
+import types
+
+
+class _PlaceholderType(type):
+    def __getattr__(cls, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return _Placeholder()
+
+
+class _Placeholder(metaclass=_PlaceholderType):
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __call__(self, *args, **kwargs):
+        return _Placeholder()
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return _Placeholder()
+
+    def __or__(self, other):
+        return self
+
+
+def _module_getattr(name):
+    if name.startswith("__"):
+        raise AttributeError(name)
+    return type(name, (_Placeholder,), {})
+
+
+class QgsExpression:
+    def __init__(self, text=""):
+        self._text = text
+
+    def expression(self):
+        return self._text
+
+    def hasParserError(self):
+        return False
+
+    def parserErrorString(self):
+        return ""
+
+    @staticmethod
+    def quotedString(text):
+        text = (text.replace("\\", "\\\\").replace("'", "\\'")
+                .replace("\n", "\\n").replace("\t", "\\t"))
+        return f"'{text}'"
+
+    @staticmethod
+    def quotedColumnRef(name):
+        return '"' + name.replace('"', '""') + '"'
+
+    @staticmethod
+    def quotedValue(value):
+        if value is None:
+            return "NULL"
+        if isinstance(value, bool):
+            return "TRUE" if value else "FALSE"
+        if isinstance(value, (int, float)):
+            return str(value)
+        return QgsExpression.quotedString(str(value))
+
+
+class QgsProperty:
+    def __init__(self, expression=None, value=None):
+        self._expression = expression
+        self._value = value
+
+    @staticmethod
+    def fromExpression(expression, active=True):
+        return QgsProperty(expression=expression)
+
+    @staticmethod
+    def fromValue(value, active=True):
+        return QgsProperty(value=value)
+
+    def expressionString(self):
+        return self._expression or ""
+
+    def staticValue(self):
+        return self._value
+
+    def asExpression(self):
+        if self._expression is not None:
+            return self._expression
+        return QgsExpression.quotedValue(self._value)
+
+
+class Qgis:
+    QGIS_VERSION_INT = 34000
+
+
+class QgsWkbTypes:
+    PointGeometry = 0
+    LineGeometry = 1
+    PolygonGeometry = 2
+    UnknownGeometry = 3
+
+
+class QgsFeatureRequest:
+    ALL_ATTRIBUTES = "#!allattributes!#"
+
+
+def qgsfunction(*args, **kwargs):
+    def decorator(function):
+        return function
+    return decorator
+
+
+def _module(name: str, **attributes) -> types.ModuleType:
+    module = types.ModuleType(name)
+    module.__getattr__ = _module_getattr
+    module.__dict__.update(attributes)
+    sys.modules[name] = module
+    return module
+
+
+def install():
+    qgis = _module("qgis")
+    qgis.__path__ = []
+    qgis.core = _module(
+        "qgis.core",
+        QgsExpression=QgsExpression,
+        QgsProperty=QgsProperty,
+        Qgis=Qgis,
+        QgsWkbTypes=QgsWkbTypes,
+        QgsFeatureRequest=QgsFeatureRequest,
+        qgsfunction=qgsfunction,
+    )
+    qgis.gui = _module("qgis.gui")
+    qgis.utils = _module("qgis.utils")
+    qgis.PyQt = _module("qgis.PyQt")
+    qgis.PyQt.__path__ = []
+    for name in ("QtCore", "QtGui", "QtWidgets", "QtNetwork", "QtSvg"):
+        setattr(qgis.PyQt, name, _module(f"qgis.PyQt.{name}"))
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""
+ parse_color_hsla() and parse_color_hex_argb() return the cached values
+ without building a QColor per call.
+"""
+
+import pytest
+
+from conftest import Context
+from gl2qgis import gl2qgis
+
+
+@pytest.fixture
+def no_qcolor(monkeypatch):
+    def fail(*args):
+        raise AssertionError("QColor built")
+    monkeypatch.setattr(gl2qgis, "QColor", fail)
+    monkeypatch.setattr(gl2qgis, "_color_hsla",
+                        lambda color: (0, 0, 100, 255))
+    monkeypatch.setattr(gl2qgis, "_color_hex_argb",
+                        lambda color: "#ffffffff")
+
+
+def test_cached_values(no_qcolor):
+    context = Context()
+    assert gl2qgis.parse_color_hsla("#fff", context) == (0, 0, 100, 255)
+    assert gl2qgis.parse_color_hex_argb("#fff", context) == "#ffffffff"
+    assert not context.warnings
+
+
+@pytest.mark.parametrize("parse", [gl2qgis.parse_color,
+                                   gl2qgis.parse_color_hsla,
+                                   gl2qgis.parse_color_hex_argb])
+def test_non_string_color(parse):
+    context = Context()
+    assert parse(["get", "color"], context) is None
+    assert len(context.warnings) == 1
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+ Field names known at conversion time are emitted as column references, so
+ QGIS can tell which fields a style uses. attribute() is left only for names
+ computed per feature.
+"""
+
+import pytest
+
+from conftest import Context
+from gl2qgis.expressions import Field, Function, to_expression, walk
+from gl2qgis.gl2qgis import parse_expression
+from gl2qgis.optimizer import optimize
+
+STATIC_NAMES = [
+    ["get", "name"],
+    ["==", ["get", "class"], "motorway"],
+    ["==", "class", "motorway"],
+    ["!=", ["get", "class"], "motorway"],
+    ["<", ["get", "rank"], 5],
+    ["has", "name"],
+    ["!has", "name"],
+    ["in", "class", "primary", "secondary"],
+    ["!in", ["get", "class"], ["literal", ["primary", "secondary"]]],
+    ["all", ["==", "$type", "LineString"], ["has", "ref"],
+     ["!", ["in", "class", "path", "track"]]],
+    ["match", ["get", "class"], ["primary", "secondary"], 2, "tertiary", 1,
+     0],
+    ["to-string", ["get", "ref"]],
+    ["concat", ["get", "ref"], " ", ["get", "name"]],
+    ["coalesce", ["get", "name:en"], ["get", "name"]],
+    ["case", ["has", "ref"], ["get", "ref"], ["get", "name"]],
+    ["step", ["zoom"], ["get", "ref"], 12, ["get", "name"]],
+    ["get", ["concat", "name:", "en"]],
+]
+
+
+def _attribute_calls(node) -> list:
+    return [n for n in walk(node)
+            if isinstance(n, Function) and n.name.lower() == "attribute"]
+
+
+@pytest.mark.parametrize("json_expr", STATIC_NAMES, ids=str)
+def test_no_attribute_for_static_names(json_expr):
+    context = Context()
+    node = optimize(parse_expression(json_expr, context))
+    assert not context.warnings
+    assert not _attribute_calls(node)
+    assert "attribute(" not in to_expression(node)
+    assert any(isinstance(n, Field) for n in walk(node))
+
+
+def test_concatenated_name_is_field():
+    node = optimize(parse_expression(["get", ["concat", "name:", "en"]],
+                                     Context()))
+    assert node == Field("name:en")
+    assert to_expression(node) == '"name:en"'
+
+
+def test_attribute_for_computed_names():
+    node = optimize(parse_expression(
+        ["get", ["concat", "name:", ["get", "lang"]]], Context()))
+    assert len(_attribute_calls(node)) == 1
+    assert Field("lang") in walk(node)
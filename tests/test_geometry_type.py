@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+ Geometry type tests in filters are decided only where they have the same
+ result for every geometry a style receives: QGIS draws polygons with line
+ styles along their boundary and with point styles and labels at their pole
+ of inaccessibility.
+"""
+
+import pytest
+
+from qgis.core import QgsWkbTypes
+
+from conftest import Context
+from gl2qgis.analysis import GEOMETRY_TYPE_FIELD
+from gl2qgis.gl2qgis import parse_expression, prepare_style
+
+POINT = QgsWkbTypes.PointGeometry
+LINE = QgsWkbTypes.LineGeometry
+POLYGON = QgsWkbTypes.PolygonGeometry
+
+
+def prepare(json_layer: dict, geometry_type, labels: bool = False):
+    filter_node = parse_expression(json_layer["filter"], Context())
+    return prepare_style(json_layer, filter_node, geometry_type, -1, -1,
+                         labels)
+
+
+def test_line_style_with_polygon_filter():
+    # building outlines
+    json_layer = {"type": "line", "filter": ["==", "$type", "Polygon"]}
+    prepared = prepare(json_layer, LINE)
+    assert prepared is not None
+    filter_expr, zoom_levels = prepared
+    assert GEOMETRY_TYPE_FIELD in filter_expr
+    assert zoom_levels == (-1, -1)
+
+
+def test_point_label_with_polygon_filter():
+    # area labels
+    json_layer = {"type": "symbol",
+                  "filter": ["all", ["==", "$type", "Polygon"],
+                             ["has", "name"]]}
+    prepared = prepare(json_layer, POINT, labels=True)
+    assert prepared is not None
+    assert GEOMETRY_TYPE_FIELD in prepared[0]
+    assert '"name"' in prepared[0]
+
+
+def test_point_style_with_polygon_filter():
+    json_layer = {"type": "symbol",
+                  "filter": ["in", "$type", "Polygon", "LineString"]}
+    prepared = prepare(json_layer, POINT)
+    assert prepared is not None
+    assert GEOMETRY_TYPE_FIELD in prepared[0]
+
+
+@pytest.mark.parametrize("json_layer, geometry_type", [
+    ({"type": "fill", "filter": ["==", "$type", "Polygon"]}, POLYGON),
+    ({"type": "line", "filter": ["!=", "$type", "Point"]}, LINE),
+    ({"type": "symbol", "filter": ["!in", "$type", "LineString"]}, POINT),
+])
+def test_filter_decided_true(json_layer, geometry_type):
+    assert prepare(json_layer, geometry_type) == ("", (-1, -1))
+
+
+@pytest.mark.parametrize("json_layer, geometry_type", [
+    ({"type": "fill", "filter": ["==", "$type", "LineString"]}, POLYGON),
+    ({"type": "line", "filter": ["==", "$type", "Point"]}, LINE),
+    ({"type": "symbol", "filter": ["==", "$type", "LineString"]}, POINT),
+])
+def test_filter_decided_false(json_layer, geometry_type):
+    assert prepare(json_layer, geometry_type) is None
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+"""
+ Rasterized shields are referenced by saved projects, so their directories
+ are never collected.
+"""
+
+import os
+
+from gl2qgis import icons
+
+
+def test_old_rasters_are_kept(tmp_path):
+    svg_dir = tmp_path / "svg"
+    svg_dir.mkdir()
+    (svg_dir / "us-interstate-2.svg").write_text(
+        '<svg xmlns="http://www.w3.org/2000/svg" width="20" height="20"/>')
+    cache_dir = tmp_path / "rasters"
+    old = cache_dir / "0123"
+    old.mkdir(parents=True)
+    os.utime(old, (0, 0))
+
+    icons.raster_icons_dir.cache_clear()
+    directory = icons.raster_icons_dir(str(svg_dir), 32, str(cache_dir))
+    assert directory is not None
+    assert os.path.dirname(directory) == cache_dir.as_posix()
+    assert old.exists()
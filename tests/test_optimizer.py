@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+ Every rewrite of gl2qgis.optimizer must keep the value of the expression.
+ Each case is evaluated before and after optimize() for a set of features and
+ zoom levels, in Python (evaluate.py) and, with PyQGIS available, by QGIS.
+"""
+
+import pytest
+
+from conftest import REAL_QGIS
+from evaluate import evaluate, same_value
+from gl2qgis.expressions import (
+    BinaryOp,
+    Case,
+    Field,
+    Function,
+    Interpolate,
+    Literal,
+    Match,
+    Step,
+    to_expression,
+    zoom,
+)
+from gl2qgis.optimizer import optimize
+
+FEATURES = [
+    {"rank": rank, "name": name}
+    for rank in (None, 0, 1, 2.5, -3)
+    for name in (None, "", "Main Street")
+]
+ZOOMS = [z / 2 for z in range(0, 45)]
+
+RANK = Field("rank")
+NAME = Field("name")
+
+# name -> (expression, expected optimized expression)
+CASES = {
+    # constant folding
+    "fold arithmetic": (
+        BinaryOp("+", Literal(1), BinaryOp("*", Literal(2), Literal(3))),
+        Literal(7),
+    ),
+    "fold comparison": (
+        BinaryOp("AND", BinaryOp("<", Literal(1), Literal(2)),
+                 BinaryOp(">", RANK, Literal(0))),
+        BinaryOp(">", RANK, Literal(0)),
+    ),
+    "fold string comparison": (
+        BinaryOp("OR", BinaryOp("=", Literal("a"), Literal("b")),
+                 BinaryOp("IS", NAME, Literal(None))),
+        BinaryOp("IS", NAME, Literal(None)),
+    ),
+    "no fold of division by zero": (
+        BinaryOp("/", Literal(1), Literal(0)),
+        BinaryOp("/", Literal(1), Literal(0)),
+    ),
+    # single branch CASE
+    "case with true branch": (
+        Case(((BinaryOp("<", Literal(1), Literal(2)), RANK),), Literal(0)),
+        RANK,
+    ),
+    "case with false branches": (
+        Case(((Literal(False), Literal(1)),
+              (BinaryOp(">", RANK, Literal(0)), Literal(2)),
+              (Literal(None), Literal(3))), Literal(4)),
+        Case(((BinaryOp(">", RANK, Literal(0)), Literal(2)),), Literal(4)),
+    ),
+    "case branch equal to default": (
+        Case(((BinaryOp(">", RANK, Literal(0)), Literal(2)),
+              (BinaryOp("IS", NAME, Literal(None)), Literal(4))), Literal(4)),
+        Case(((BinaryOp(">", RANK, Literal(0)), Literal(2)),), Literal(4)),
+    ),
+    "case without default": (
+        Case(((BinaryOp(">", RANK, Literal(0)), Literal(None)),)),
+        Literal(None),
+    ),
+    # zoom ranges with equal values
+    "interpolate equal stops": (
+        Interpolate(zoom(), ((5, Literal(2)), (10, Literal(2)),
+                             (15, Literal(2)))),
+        Literal(2),
+    ),
+    "interpolate constant segments": (
+        Interpolate(zoom(), ((2, Literal(1)), (5, Literal(1)),
+                             (8, Literal(1)), (12, Literal(4)),
+                             (16, Literal(4)), (20, Literal(4)))),
+        Interpolate(zoom(), ((8, Literal(1)), (12, Literal(4)))),
+    ),
+    "interpolate exponential constant segments": (
+        Interpolate(zoom(), ((4, Literal(0.5)), (10, Literal(3)),
+                             (14, Literal(3)), (18, Literal(3))), 1.4),
+        Interpolate(zoom(), ((4, Literal(0.5)), (10, Literal(3))), 1.4),
+    ),
+    "step equal values": (
+        Step(zoom(), Literal(1), ((6, Literal(1)), (9, Literal(2)),
+                                  (12, Literal(2)), (15, Literal(3)))),
+        Step(zoom(), Literal(1), ((9, Literal(2)), (15, Literal(3)))),
+    ),
+    "step all equal": (
+        Step(zoom(), Literal("a"), ((6, Literal("a")), (9, Literal("a")))),
+        Literal("a"),
+    ),
+    "match equal values": (
+        Match(NAME, (((Literal("Main Street"),), Literal(1)),
+                     ((Literal(""),), Literal(1)),
+                     ((Literal("x"),), Literal(0))), Literal(0)),
+        Match(NAME, (((Literal("Main Street"), Literal("")), Literal(1)),),
+              Literal(0)),
+    ),
+    # identity arithmetic
+    "times one": (BinaryOp("*", RANK, Literal(1)), RANK),
+    "one times": (BinaryOp("*", Literal(1), RANK), RANK),
+    "divided by one": (BinaryOp("/", RANK, Literal(1)), RANK),
+    "power of one": (BinaryOp("^", RANK, Literal(1)), RANK),
+    "plus zero": (BinaryOp("+", RANK, Literal(0)), RANK),
+    "zero plus": (BinaryOp("+", Literal(0), RANK), RANK),
+    "minus zero": (BinaryOp("-", RANK, Literal(0)), RANK),
+    "nested identities": (
+        BinaryOp("+", BinaryOp("*", BinaryOp("-", Literal(3), Literal(2)),
+                               RANK), BinaryOp("-", Literal(1), Literal(1))),
+        RANK,
+    ),
+    # field name known at conversion time
+    "attribute of literal": (Function("attribute", (Literal("rank"),)), RANK),
+    "attribute of concat": (
+        Function("attribute", (Function(
+            "concat", (Literal("na"), Literal("me"))),)),
+        NAME,
+    ),
+    # nested concat
+    "nested concat": (
+        Function("concat", (
+            Function("concat", (Literal("a"), NAME)),
+            Function("concat", (Literal(""), Function(
+                "concat", (Literal("-"), Literal("b"))))),
+            Literal("c"), RANK)),
+        Function("concat", (Literal("a"), NAME, Literal("-bc"), RANK)),
+    ),
+    "concat of literals": (
+        Function("concat", (Literal("a"), Function(
+            "concat", (Literal(""), Literal("b"))))),
+        Literal("ab"),
+    ),
+    "concat of nothing": (
+        Function("concat", (Literal(""), Function("concat", ()))),
+        Literal(""),
+    ),
+}
+
+
+@pytest.mark.parametrize("name", CASES)
+def test_rewrite(name):
+    expression, expected = CASES[name]
+    assert optimize(expression) == expected
+
+
+@pytest.mark.parametrize("name", CASES)
+def test_same_value(name):
+    expression = CASES[name][0]
+    optimized = optimize(expression)
+    for feature in FEATURES:
+        for zoom_level in ZOOMS:
+            before = evaluate(expression, feature, zoom_level)
+            after = evaluate(optimized, feature, zoom_level)
+            assert same_value(before, after), (
+                f"{to_expression(expression)} = {before!r}, "
+                f"{to_expression(optimized)} = {after!r} "
+                f"for {feature} at zoom {zoom_level}")
+
+
+@pytest.mark.skipif(not REAL_QGIS, reason="needs PyQGIS")
+@pytest.mark.parametrize("name", CASES)
+def test_same_value_in_qgis(name):
+    from qgis.PyQt.QtCore import QVariant
+    from qgis.core import (
+        QgsExpression,
+        QgsExpressionContext,
+        QgsExpressionContextScope,
+        QgsFeature,
+        QgsField,
+        QgsFields,
+    )
+
+    fields = QgsFields()
+    fields.append(QgsField("rank", QVariant.Double))
+    fields.append(QgsField("name", QVariant.String))
+    expression = CASES[name][0]
+    before = QgsExpression(to_expression(expression))
+    after = QgsExpression(to_expression(optimize(expression)))
+    context = QgsExpressionContext()
+    scope = QgsExpressionContextScope()
+    context.appendScope(scope)
+    for attributes in FEATURES:
+        feature = QgsFeature(fields)
+        for field, value in attributes.items():
+            feature.setAttribute(field, value)
+        context.setFeature(feature)
+        for zoom_level in ZOOMS:
+            scope.setVariable("vector_tile_zoom", zoom_level)
+            assert same_value(before.evaluate(context),
+                              after.evaluate(context))
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""
+ Fill pattern files are shared between symbols and referenced by saved
+ projects, so they are written once and never collected.
+"""
+
+import base64
+import os
+
+import pytest
+
+from gl2qgis import sprites
+
+PNG = b"\x89PNG\r\n\x1a\n pattern"
+SPRITE_PATH = sprites.BASE64_PREFIX + base64.b64encode(PNG).decode("ascii")
+
+
+@pytest.fixture(autouse=True)
+def new_session():
+    # pattern paths are remembered for the session, whatever the cache_dir
+    sprites._pattern_paths.clear()
+
+
+def test_pattern_file(tmp_path):
+    path = sprites.pattern_file(SPRITE_PATH, str(tmp_path))
+    assert os.path.dirname(path) == str(tmp_path)
+    with open(path, "rb") as f:
+        assert f.read() == PNG
+    assert sprites.pattern_file("/icons/park.png") == "/icons/park.png"
+    assert sprites.pattern_file("base64:@@", str(tmp_path)) == "base64:@@"
+
+
+def test_old_patterns_are_kept(tmp_path):
+    old = tmp_path / "0123.png"
+    old.write_bytes(PNG)
+    os.utime(old, (0, 0))
+    sprites.pattern_file(SPRITE_PATH, str(tmp_path))
+    assert old.exists()
+
+
+def test_pattern_expression(tmp_path):
+    expression = (f"CASE WHEN \"class\" IS 'park' THEN '{SPRITE_PATH}' "
+                  f"ELSE '' END")
+    rewritten = sprites.pattern_expression(expression, str(tmp_path))
+    assert sprites.BASE64_PREFIX not in rewritten
+    assert str(tmp_path) in rewritten
@@ -6,11 +6,14 @@ from qgis.PyQt.QtNetwork import QNetworkRequest, QNetworkReply
 from qgis.PyQt.QtCore import QUrl
 
 import ssl
-import json
-
-from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
 
 from .settings_manager import SettingsManager
+# requests are in a module without widgets, for the command line converter
+from .net import (  # noqa: F401
+    MapTilerApiException,
+    qgis_request_data,
+    qgis_request_json,
+)
 ssl._create_default_https_context = ssl._create_unverified_context
 
 
@@ -89,82 +92,5 @@ def load_color_ramp_from_file(fp: str) -> list:
     return min_ramp_value, max_ramp_value, ramp_lst
 
 
-class MapTilerApiException(Exception):
-    def __init__(self, message, content):
-        self.message = message
-        self.content = content
-        super().__init__(self.message)
-
-
-def _qgis_request(url: str):
-    smanager = SettingsManager()
-    auth_cfg_id = smanager.get_setting('auth_cfg_id')
-    parsed = urlsplit(url)
-    if "maptiler.com" in parsed.netloc:
-        # remove only the 'key' query parameter (keep other query items)
-        query_items = [(k, v) for k, v in parse_qsl(parsed.query)
-                       if k.lower() != 'key']
-        new_query = urlencode(query_items, doseq=True)
-        clean_url = urlunsplit(
-            (parsed.scheme, parsed.netloc, parsed.path, new_query,
-             parsed.fragment))
-        request = QNetworkRequest(QUrl(clean_url))
-        if auth_cfg_id:
-            reply = QgsNetworkAccessManager.instance().blockingGet(
-                request, auth_cfg_id)
-        else:
-            reply = QgsNetworkAccessManager.instance().blockingGet(request)
-    else:
-        request = QNetworkRequest(QUrl(url))
-        reply = QgsNetworkAccessManager.instance().blockingGet(request)
-
-    # Treat as success if HTTP status is 2xx, or there's non-empty content,
-    # even if Qt sets a non-fatal error flag (observed in Qt6 builds).
-    try:
-        try:
-            attr = QNetworkRequest.Attribute.HttpStatusCodeAttribute  # Qt6
-        except AttributeError:
-            attr = QNetworkRequest.HttpStatusCodeAttribute  # Qt5
-        status = reply.attribute(attr)
-        status_int = int(status) if status is not None else None
-        if status_int and 200 <= status_int < 300:
-            return reply
-    except Exception:
-        pass  # nosec B110
-
-    if not reply.error():
-        return reply
-
-    # fallback: accept reply if it has content
-    # (helps when Qt6 marks error but returns valid JSON)
-    raw = reply.content()
-    content_bytes = raw.data() if hasattr(raw, "data") else raw
-    if content_bytes:
-        return reply
-
-    # real error — raise with details
-    err = reply.errorString() or ""
-    content_text = content_bytes.decode(
-        "utf-8", errors="replace") if content_bytes else ""
-    raise MapTilerApiException(err, content_text)
-
-
-def qgis_request_json(url: str) -> dict:
-    reply = _qgis_request(url)
-    # attempt to decode JSON; if it fails raise MapTilerApiException with body
-    raw = reply.content()
-    data = raw.data() if hasattr(raw, "data") else raw
-    try:
-        return json.loads(data.decode("utf-8"))
-    except Exception as e:
-        content_text = data.decode("utf-8", errors="replace") if data else ""
-        raise MapTilerApiException(f"Invalid JSON response: {e}", content_text)
-
-
-def qgis_request_data(url: str) -> bytes:
-    reply_content = _qgis_request(url)
-    return reply_content.content().data()
-
-
 if __name__ == "__main__":
     validate_credentials()